@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "envt")
+"""Cache root, can be overridden with ENVT_CACHE_DIR"""
+DEFAULT_CACHE_SIZE_MB = 4096
+"""Size limit per cache in MB, can be overridden with ENVT_CACHE_SIZE_MB"""
+
+def cache_root():
+    return os.environ.get("ENVT_CACHE_DIR", DEFAULT_CACHE_DIR)
+
+def make_key(*parts):
+    """
+    Creates a cache key from arbitrary parts using their string representation
+    :param parts: key parts
+    :return: hex digest
+    """
+    return hashlib.blake2b(repr(parts).encode(), digest_size=20).hexdigest()
+
+def array_hash(*arrays):
+    """
+    Computes a content hash of arrays including their types and shapes
+    :param arrays: arrays
+    :return: hex digest
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(memoryview(array).cast("B"))
+    return digest.hexdigest()
+
+def source_hash(*modules):
+    """
+    Computes a hash of the source files of modules, such that cache entries can be invalidated once the code computing them changes
+    :param modules: imported modules
+    :return: hex digest
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    for module in modules:
+        with open(module.__file__, "rb") as file: digest.update(file.read())
+    return digest.hexdigest()
+
+def file_hash(path, block_size=1 << 24):
+    """
+    Computes a content hash of a file. Hashes are remembered per path, size and modification time,
+    such that large files are only read again once they changed.
+    :param path: file path
+    :param block_size: number of bytes read at once
+    :return: hex digest
+    """
+    stat = os.stat(path)
+    memo_key = f"{os.path.realpath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    memo_path = os.path.join(cache_root(), "file_hashes.json")
+    try:
+        with open(memo_path, "r") as file: memo = json.load(file)
+    except (OSError, ValueError):
+        memo = dict()
+    if memo_key in memo: return memo[memo_key]
+
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""): digest.update(block)
+    memo[memo_key] = digest.hexdigest()
+
+    os.makedirs(cache_root(), exist_ok=True)
+    tmp_path = f"{memo_path}.{uuid.uuid4().hex}"
+    with open(tmp_path, "w") as file: json.dump(memo, file)
+    os.replace(tmp_path, memo_path)
+    return memo[memo_key]
+
+class DiskCache:
+    """
+    Size-bounded on-disk cache of numpy arrays. Each entry is a directory of .npy files, which are memory-mapped on load.
+    Least recently used entries are evicted once the cache exceeds its size limit.
+    """
+    def __init__(self, name, max_bytes=None):
+        self.path = os.path.join(cache_root(), name)
+        """Directory of this cache"""
+        if max_bytes is None: max_bytes = int(os.environ.get("ENVT_CACHE_SIZE_MB", DEFAULT_CACHE_SIZE_MB)) * 1024 * 1024
+        self.max_bytes = max_bytes
+        """Size limit in bytes"""
+
+    def load(self, key):
+        """
+        Loads an entry. Arrays are memory-mapped copy-on-write, i.e. they can be modified without changing the cache.
+        :param key: entry key
+        :return: dict of arrays or None if entry does not exist
+        """
+        entry_path = os.path.join(self.path, key)
+        try:
+            names = [f for f in os.listdir(entry_path) if f.endswith(".npy")]
+            arrays = {name[:-4]: np.asarray(np.load(os.path.join(entry_path, name), mmap_mode="c")) for name in names}
+            os.utime(entry_path) # mark as recently used
+        except (OSError, ValueError):
+            return None
+        return arrays
+
+    def store(self, key, arrays):
+        """
+        Stores an entry atomically and evicts old entries if the size limit is exceeded
+        :param key: entry key
+        :param arrays: dict of arrays
+        :return:
+        """
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = os.path.join(self.path, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp_path)
+        for name, array in arrays.items(): np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+        try:
+            os.rename(tmp_path, os.path.join(self.path, key))
+        except OSError: # entry was created concurrently
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        self.evict()
+
+    def evict(self):
+        """
+        Removes least recently used entries until the cache fits into its size limit
+        :return:
+        """
+        entries = []
+        for key in os.listdir(self.path):
+            entry_path = os.path.join(self.path, key)
+            if key.startswith(".") or not os.path.isdir(entry_path): continue
+            size = sum(os.path.getsize(os.path.join(entry_path, f)) for f in os.listdir(entry_path))
+            entries.append((os.path.getmtime(entry_path), size, entry_path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if total <= self.max_bytes: break
+            shutil.rmtree(entry_path, ignore_errors=True)
+            total -= size
@@ -0,0 +1,130 @@
+import json
+import os
+import shutil
+import uuid
+import numpy as np
+from envt.cache_util.disk_cache import cache_root, make_key
+from envt.mesh_util.mesh import Mesh
+
+SIDECAR_ENV = "ENVT_SIDECAR_CACHE"
+"""Environment variable, setting it to 0 disables sidecar caches"""
+SIDECAR_SUFFIX = ".npycache"
+"""Suffix of the sidecar directory next to a mesh file"""
+SIDECAR_MARKER_DIR = "sidecar_reads"
+"""Directory below the cache root holding the read markers of mesh files without sidecar"""
+
+def sidecar_enabled():
+    return os.environ.get(SIDECAR_ENV, "1") != "0"
+
+def sidecar_path(path):
+    """
+    Gets the sidecar directory of a mesh file
+    :param path: mesh file path
+    :return: sidecar directory path
+    """
+    return f"{path}{SIDECAR_SUFFIX}"
+
+def file_signature(path):
+    """
+    Gets size and modification time of a file, a sidecar is valid as long as both match
+    :param path: file path
+    :return: dict of size and mtime_ns
+    """
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def load_sidecar(path):
+    """
+    Loads the mesh of a file from its sidecar. Arrays are memory-mapped copy-on-write.
+    :param path: mesh file path
+    :return: Mesh or None if there is no valid sidecar
+    """
+    cache_path = sidecar_path(path)
+    try:
+        with open(os.path.join(cache_path, "meta.json"), "r") as file: meta = json.load(file)
+        if meta["source"] != file_signature(path) or "point_data" not in meta: return None
+        def load(name): return np.asarray(np.load(os.path.join(cache_path, f"{name}.npy"), mmap_mode="c"))
+        mesh = Mesh(load("points"), load("connectivity"), load("offsets"), load("cell_types"))
+        mesh.point_data = {name: load(f"data_{i}") for i, name in enumerate(meta["point_data"])}
+    except (OSError, ValueError, KeyError):
+        return None
+    return mesh
+
+def store_sidecar(path, mesh:Mesh):
+    """
+    Stores the mesh of a file in its sidecar next to the file. Failures, e.g. due to missing write permissions, are ignored.
+    :param path: mesh file path
+    :param mesh: mesh of the file content
+    :return:
+    """
+    cache_path = sidecar_path(path)
+    tmp_path = os.path.join(os.path.dirname(os.path.abspath(path)), f".{os.path.basename(path)}.{uuid.uuid4().hex}")
+    try:
+        os.makedirs(tmp_path)
+        arrays = {"points": mesh.points, "connectivity": mesh.connectivity, "offsets": mesh.offsets, "cell_types": mesh.cell_types}
+        arrays.update({f"data_{i}": values for i, values in enumerate(mesh.point_data.values())})
+        for name, array in arrays.items(): np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(array))
+        with open(os.path.join(tmp_path, "meta.json"), "w") as file:
+            json.dump({"source": file_signature(path), "point_data": list(mesh.point_data.keys())}, file)
+        shutil.rmtree(cache_path, ignore_errors=True)
+        os.rename(tmp_path, cache_path)
+    except OSError: # read-only location or concurrently created sidecar
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+def read_marker_path(path):
+    """
+    Gets the read marker of a mesh file, markers are kept in the cache directory, not next to the file
+    :param path: mesh file path
+    :return: marker file path
+    """
+    return os.path.join(cache_root(), SIDECAR_MARKER_DIR, f"{make_key(os.path.realpath(path))}.json")
+
+def register_read(path, mesh:Mesh):
+    """
+    Records a read of a mesh file without valid sidecar. The first read only leaves a marker holding the file signature,
+    the sidecar is stored on the next read of the unchanged file, thus files which are read once never get a sidecar.
+    :param path: mesh file path
+    :param mesh: mesh of the file content
+    :return:
+    """
+    marker_path = read_marker_path(path)
+    try:
+        with open(marker_path, "r") as file: seen = json.load(file)["source"] == file_signature(path)
+    except (OSError, ValueError, KeyError):
+        seen = False
+    if seen:
+        store_sidecar(path, mesh)
+        try: os.remove(marker_path)
+        except OSError: pass
+        return
+    try:
+        os.makedirs(os.path.dirname(marker_path), exist_ok=True)
+        tmp_path = f"{marker_path}.{uuid.uuid4().hex}"
+        with open(tmp_path, "w") as file: json.dump({"source": file_signature(path)}, file)
+        os.replace(tmp_path, marker_path)
+    except OSError: # read-only cache directory
+        pass
+
+def remove_sidecar(path):
+    """
+    Removes the sidecar of a mesh file, called whenever the file is written
+    :param path: mesh file path
+    :return:
+    """
+    shutil.rmtree(sidecar_path(path), ignore_errors=True)
+
+def remove_sidecars(root):
+    """
+    Removes all sidecars below a directory
+    :param root: directory path
+    :return: tuple of (number of removed sidecars, freed bytes)
+    """
+    count, size = 0, 0
+    for dir_path, dir_names, _ in os.walk(root):
+        for name in [name for name in dir_names if name.endswith(SIDECAR_SUFFIX)]:
+            cache_path = os.path.join(dir_path, name)
+            for entry in os.scandir(cache_path): size += entry.stat().st_size if entry.is_file() else 0
+            shutil.rmtree(cache_path, ignore_errors=True)
+            dir_names.remove(name)
+            count += 1
+    return count, size
@@ -0,0 +1,99 @@
+import os
+import threading
+import numpy as np
+from pyproj import Proj, Transformer
+
+ENGINE_ENV = "ENVT_CONVERSION_ENGINE"
+"""Environment variable selecting the engine of WGS84 conversions, numpy (default) or pyproj"""
+
+WGS84_A = 6378137.0
+"""Semi-major axis of the WGS84 ellipsoid in meters"""
+WGS84_F = 1.0 / 298.257223563
+"""Flattening of the WGS84 ellipsoid"""
+WGS84_B = WGS84_A * (1.0 - WGS84_F)
+"""Semi-minor axis of the WGS84 ellipsoid in meters"""
+WGS84_E2 = WGS84_F * (2.0 - WGS84_F)
+"""First eccentricity squared"""
+WGS84_EP2 = WGS84_E2 / (1.0 - WGS84_E2)
+"""Second eccentricity squared"""
+
+_transformers = threading.local()
+"""Per-thread cache of pyproj Transformers, keyed by source and destination definition"""
+
+def numpy_engine():
+    """
+    Checks whether WGS84 conversions should use the closed-form numpy implementation, can be set via environment variable ENVT_CONVERSION_ENGINE
+    :return: True for numpy, False for pyproj
+    """
+    engine = os.environ.get(ENGINE_ENV, "numpy")
+    if engine not in ("numpy", "pyproj"): raise ValueError(f"Unknown conversion engine {engine}, expected numpy or pyproj")
+    return engine == "numpy"
+
+def get_transformer(src_proj:Proj, dst_proj:Proj) -> Transformer:
+    """
+    Gets a cached Transformer between two projections. Creating Transformers is expensive, thus they are reused for
+    the lifetime of the process. Transformers are cached per thread as they must not be shared between threads.
+    :param src_proj: source projection
+    :param dst_proj: destination projection
+    :return: Transformer
+    """
+    if not hasattr(_transformers, "cache"): _transformers.cache = {}
+    key = (src_proj.srs, dst_proj.srs)
+    transformer = _transformers.cache.get(key)
+    if transformer is None:
+        transformer = Transformer.from_proj(src_proj, dst_proj)
+        _transformers.cache[key] = transformer
+    return transformer
+
+def geodetic_to_geocentric(lon, lat, height):
+    """
+    Converts WGS84 geodetic coordinates to geocentric cartesian coordinates
+    :param lon: longitude in degrees
+    :param lat: latitude in degrees
+    :param height: ellipsoidal height in meters
+    :return: x, y, z in meters
+    """
+    lon, lat = np.radians(lon), np.radians(lat)
+    sin_lat, cos_lat = np.sin(lat), np.cos(lat)
+    n = WGS84_A / np.sqrt(1.0 - WGS84_E2 * sin_lat * sin_lat)
+    x = (n + height) * cos_lat * np.cos(lon)
+    y = (n + height) * cos_lat * np.sin(lon)
+    z = (n * (1.0 - WGS84_E2) + height) * sin_lat
+    return x, y, z
+
+def geocentric_to_geodetic(x, y, z):
+    """
+    Converts geocentric cartesian coordinates to WGS84 geodetic coordinates with the closed-form solution of
+    Zhu (1993), which is exact to floating point precision for points outside the vicinity of the earth center.
+    Latitude and height of points in the vicinity of the earth center are NaN.
+    :param x: x in meters
+    :param y: y in meters
+    :param z: z in meters
+    :return: longitude and latitude in degrees, ellipsoidal height in meters
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return _geocentric_to_geodetic(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64), np.asarray(z, dtype=np.float64))
+
+def _geocentric_to_geodetic(x, y, z):
+    a2, b2, e4 = WGS84_A * WGS84_A, WGS84_B * WGS84_B, WGS84_E2 * WGS84_E2
+    p2 = x * x + y * y
+    p = np.sqrt(p2)
+    z2 = z * z
+    f = 54.0 * b2 * z2
+    g = p2 + (1.0 - WGS84_E2) * z2 - WGS84_E2 * (a2 - b2)
+    c = e4 * f * p2 / (g * g * g)
+    s = np.cbrt(1.0 + c + np.sqrt(c * c + 2.0 * c))
+    k = s + 1.0 + 1.0 / s
+    big_p = f / (3.0 * k * k * g * g)
+    q = np.sqrt(1.0 + 2.0 * e4 * big_p)
+    r0 = -big_p * WGS84_E2 * p / (1.0 + q) + np.sqrt(np.maximum(0.5 * a2 * (1.0 + 1.0 / q) - big_p * (1.0 - WGS84_E2) * z2 / (q * (1.0 + q)) - 0.5 * big_p * p2, 0.0))
+    t = p - WGS84_E2 * r0
+    u = np.sqrt(t * t + z2)
+    v = np.sqrt(t * t + (1.0 - WGS84_E2) * z2)
+    z0 = b2 * z / (WGS84_A * v)
+    height = u * (1.0 - b2 / (WGS84_A * v))
+    lat = np.degrees(np.arctan2(z + WGS84_EP2 * z0, p))
+    lon = np.degrees(np.arctan2(y, x))
+    # the solution requires g > 0, which holds except within about 43 km of the earth center
+    near_center = ~(g > 0)
+    return lon, np.where(near_center, np.nan, lat), np.where(near_center, np.nan, height)
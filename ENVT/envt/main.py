@@ -3,16 +3,26 @@ from envt.tools.nc2vtk import *
 from envt.tools.evaluate import *
 from envt.tools.convert import *
 import envt.nc_util.nc_wrapper as ncw
+import envt.vtk_util.vtk_wrapper as vtkw
+from envt.mesh_util.mesh_store import MeshStore, STORE_SEPARATOR
+from envt.tools.manifest import read_manifest
+from envt.cache_util.sidecar import remove_sidecars
 import argparse
+import os
 
 def main():
     parser = argparse.ArgumentParser(description="NetCDF Tool for ESM data processing.")
+    parser.add_argument("--format", type=str, choices=vtkw.VTK_FORMATS, default=None,
+                        help=f"VTK output format, defaults to ${vtkw.VTK_FORMAT_ENV} or ascii.")
     subparsers = parser.add_subparsers(dest="mode", required=True, help="Execution mode (view, plot, vtk).")
 
     # View mode
     view_parser = subparsers.add_parser("view", help="View metadata or variable data.")
     view_parser.add_argument("file", type=str, help="Path to the NetCDF file.")
-    view_parser.add_argument("--data", choices=["lon", "lat", "clo", "cla"], help="View a specific variable.")
+    view_parser.add_argument("--data", type=str, help="View a specific variable (e.g., 'bggd.lon').")
+    view_parser.add_argument("--stats", action="store_true", help="Print streamed summary statistics of all or the selected variable.")
+    view_parser.add_argument("--bins", type=int, help="Number of histogram bins of --stats.", default=10)
+    view_parser.add_argument("--memory-budget", type=int, help="Size of data read at once by --stats in MB.", default=64)
 
     # Plot mode
     plot_parser = subparsers.add_parser("plot", help="Plot mesh points.")
@@ -31,27 +41,56 @@ def main():
     vtk_parser.add_argument("-f", "--filter", action="store_true", help="Filter out land cells")
     vtk_parser.add_argument("-ntf", "--notorcfix", action="store_true", help="Disable TORC_FIX.")
     vtk_parser.add_argument("-ntri", "--notriangulation", action="store_true", help="Disable triangulation.")
+    vtk_parser.add_argument("--no-cache", action="store_true", help="Disable the on-disk topology cache.")
+    vtk_parser.add_argument("-j", "--jobs", type=int, help="Number of worker processes for corner based meshes.", default=1)
+    vtk_parser.add_argument("--memory-budget", type=int, help="Process corner data out-of-core with this budget in MB.", default=None)
+    vtk_parser.add_argument("--compact", action="store_true", help="Store indices as int32 and report deviations from float64.")
+    vtk_parser.add_argument("--float32", action="store_true", help="Compact mode which also stores points and point data as float32.")
 
     # VTK Convert mode
     vtkc_parser = subparsers.add_parser("vtkc", help="Convert VTK unstructured grid.")
-    vtkc_parser.add_argument("file", type=str, help="Path to the VTK file.")
+    vtkc_parser.add_argument("file", type=str, nargs="*", help="Path to the VTK file. Several files or quoted glob patterns convert a batch into --output-dir.")
     vtkc_parser.add_argument("-cv23", "--conv23", action="store_true",
                              help="Convert 2D (lat/lon) file to 3D cartesian coordinates.")
     vtkc_parser.add_argument("-cv32", "--conv32", action="store_true",
                              help="Convert 3D cartesian coordinates file to 2D (lat/lon).")
     vtkc_parser.add_argument("-o", "--output", type=str, help="Output file path.", default=None)
     vtkc_parser.add_argument("-a", "--attach", action="store_true", help="Attaches Connectivity")
+    vtkc_parser.add_argument("--output-dir", type=str, help="Output directory of batches, file names are kept.", default=None)
+    vtkc_parser.add_argument("--manifest", type=str, help="Batch manifest, each line holds an input and optionally an output file.", default=None)
+    vtkc_parser.add_argument("-j", "--jobs", type=int, help="Number of worker processes of batches.", default=1)
+    vtkc_parser.add_argument("--compact", action="store_true", help="Store indices as int32 and report deviations from float64.")
+    vtkc_parser.add_argument("--float32", action="store_true", help="Compact mode which also stores points and point data as float32.")
 
     # VTK Evaluate mode
     vtke_parser = subparsers.add_parser("vtke", help="Evaluate VTK unstructured grid.")
     vtke_parser.add_argument("file", type=str, help="Path to the VTK file.")
-    vtke_parser.add_argument("-f", "--function", required=True, type=str, help="Function to evaluate.",
-                             default="sinusoid", choices=["sinusoid", "harmonic", "vortex", "gulfstream"])
+    vtke_functions = vtke_parser.add_mutually_exclusive_group(required=True)
+    vtke_functions.add_argument("-f", "--function", type=str, help="Function to evaluate, written into the output file.",
+                                choices=list(Evaluator.FUNCTIONS.keys()), default=None)
+    vtke_functions.add_argument("-fs", "--functions", type=str, nargs="+", default=None,
+                                help="Functions to evaluate, all selects all functions. Each function is written into <output>_<fun>.",
+                                choices=list(Evaluator.FUNCTIONS.keys()) + [Evaluator.ALL_FUNCTIONS])
     vtke_parser.add_argument("-o", "--output", type=str, help="Output file path.", default=None)
     vtke_parser.add_argument("-d", "--diff", action="store_true",
                              help="Computes difference of VTK data to analytical solution")
     vtke_parser.add_argument("-s", "--source", type=str, help="Source mesh path. Only used in diff mode", default=None)
     vtke_parser.add_argument("-ov", "--outvtk", type=str, help="Output VTK file.", default=None)
+    vtke_parser.add_argument("--cartesian", action="store_true",
+                             help="Input meshes are in 3D cartesian coordinates, outputs keep them.")
+    vtke_parser.add_argument("--combined", action="store_true",
+                             help="Write all functions as eval_<fun> into the output file instead of one file per function.")
+    vtke_parser.add_argument("--cache", action="store_true", help="Cache analytical solutions on disk.")
+    vtke_parser.add_argument("--compact", action="store_true", help="Store indices as int32 and report deviations from float64.")
+    vtke_parser.add_argument("--float32", action="store_true", help="Compact mode which also stores points and point data as float32.")
+
+    # VTK batch metrics mode
+    vtkm_parser = subparsers.add_parser("vtkm", help="Compute error metrics of many mapped VTK files.")
+    vtkm_parser.add_argument("manifest", type=str, help="Manifest, each line holds a mapped file, its source file, the function and optionally an error output VTK file.")
+    vtkm_parser.add_argument("-o", "--output", type=str, help="Output CSV table path.", default=None)
+    vtkm_parser.add_argument("--cartesian", action="store_true",
+                             help="Meshes are in 3D cartesian coordinates, error outputs keep them.")
+    vtkm_parser.add_argument("--cache", action="store_true", help="Cache analytical solutions on disk.")
 
     # VTK filtering mode
     vtkf_parser = subparsers.add_parser("vtkf", help="Filter VTK unstructured grid.")
@@ -65,13 +104,35 @@ def main():
     vtkf_parser.add_argument("-co", "--corner", action="store_true", help="Use corner coordinates (clo/cla).")
     vtkf_parser.add_argument("-f", "--fraction", type=str, help="Compute fractions based on provided SEA mesh file.", default=None)
     vtkf_parser.add_argument("-fv", "--fvar", type=str, help="Fraction SEA mesh file var.", default=None)
+    vtkf_parser.add_argument("--no-cache", action="store_true", help="Disable the on-disk topology cache.")
+    vtkf_parser.add_argument("--memory-budget", type=int, help="Process corner data out-of-core with this budget in MB.", default=None)
+    vtkf_parser.add_argument("--compact", action="store_true", help="Store indices as int32 and report deviations from float64.")
+    vtkf_parser.add_argument("--float32", action="store_true", help="Compact mode which also stores points and point data as float32.")
+
+    # Mesh store mode
+    store_parser = subparsers.add_parser("store", help="Import, export or list meshes of a mesh store.")
+    store_parser.add_argument("file", type=str, help="Path to the mesh store file.")
+    store_group = store_parser.add_mutually_exclusive_group(required=True)
+    store_group.add_argument("-i", "--import", dest="import_file", type=str, help="VTK file to import.", default=None)
+    store_group.add_argument("-e", "--export", type=str, help="Mesh to export as <mesh>[/<variant>].", default=None)
+    store_group.add_argument("-l", "--list", action="store_true", help="List stored meshes and variants.")
+    store_parser.add_argument("-m", "--mesh", type=str, help="Target mesh of import as <mesh>[/<variant>].", default=None)
+    store_parser.add_argument("-o", "--output", type=str, help="Output file path of export.", default=None)
+
+    # Sidecar cleanup mode
+    clean_parser = subparsers.add_parser("clean", help="Remove the sidecar caches of all mesh files below directories.")
+    clean_parser.add_argument("dirs", type=str, nargs="+", help="Directories to clean.")
 
     args = parser.parse_args()
+    if args.format is not None: os.environ[vtkw.VTK_FORMAT_ENV] = args.format
+    compact = vtkw.CompactMode(args.float32) if getattr(args, "compact", False) or getattr(args, "float32", False) else None
 
     if args.mode == "view":
         nc_file = ncw.NCFile(args.file)
-        if args.data is not None:
-            nc_file.print_var_data(args.file, args.data)
+        if args.stats:
+            nc_file.print_var_stats([args.data] if args.data is not None else None, args.memory_budget * 1024 * 1024, args.bins)
+        elif args.data is not None:
+            nc_file.print_var_data(args.data)
         else:
             nc_file.print_overview()
 
@@ -82,36 +143,70 @@ def main():
         nc_file.plot_var_centers(ncw.NCVars.get_entry(args.var), out_path, args.mask)
 
     elif args.mode == "vtk":
-        conv = NC2VTK(args.file, args.mask)
+        budget = args.memory_budget * 1024 * 1024 if args.memory_budget is not None else None
+        conv = NC2VTK(args.file, args.mask, not args.no_cache, budget, args.jobs, compact)
         out_path = "./output.vtk"
         if args.output is not None: out_path = args.output
         conv.nc2vtk(ncw.NCVars.get_entry(args.var), out_path, args.filter, args.corner, not args.notorcfix, not args.notriangulation)
 
     elif args.mode == "vtkc":
-        out_path = "./output.vtk"
-        if args.output is not None: out_path = args.output
-        conv = Converter(args.file, out_path)
-        if args.conv23:
-            conv.convert(Converter.Mode2DTO3D(), args.attach)
+        mode_class = Converter.Mode2DTO3D if args.conv23 else Converter.Mode3DTO2D
+        if len(args.file) == 1 and args.output_dir is None and args.manifest is None:
+            out_path = "./output.vtk"
+            if args.output is not None: out_path = args.output
+            conv = Converter(args.file[0], out_path, compact)
+            conv.convert(mode_class(), args.attach)
         else:
-            conv.convert(Converter.Mode3DTO2D(), args.attach)
+            if args.output is not None: parser.error("--output only applies to a single file, use --output-dir for batches")
+            if len(args.file) == 0 and args.manifest is None: parser.error("vtkc requires a file or --manifest")
+            Converter.convert_batch(mode_class, batch_files(args.file, args.manifest, args.output_dir), args.attach, compact, args.jobs)
 
     elif args.mode == "vtke":
         out_path = "./output.vtk"
         if args.output is not None: out_path = args.output
-        ev = Evaluator(args.file, out_path)
+        functions = [args.function] if args.function is not None else Evaluator.function_names(args.functions)
+        if args.diff and len(functions) > 1: parser.error("--diff requires a single function")
+        if args.combined and args.function is not None: parser.error("--combined requires -fs/--functions")
+        ev = Evaluator(args.file, out_path, compact, args.cache)
         if args.diff:
-            ev.evaluate_diff(args.source, args.function, args.outvtk, args.function == "gulfstream")
+            ev.evaluate_diff(args.source, functions[0], args.outvtk, functions[0] == "gulfstream", args.cartesian)
+        elif args.function is not None:
+            ev.evaluate(args.function, args.cartesian)
         else:
-            ev.evaluate(args.function)
+            ev.evaluate_functions(functions, args.cartesian, args.combined)
+
+    elif args.mode == "vtkm":
+        out_path = "./metrics.csv"
+        if args.output is not None: out_path = args.output
+        Evaluator.evaluate_diff_batch(read_manifest(args.manifest, 3, 4), out_path, args.cartesian, args.cache)
 
     elif args.mode == "vtkf":
         out_path = "./output.vtk"
         if args.output is not None: out_path = args.output
-        fil = Filter(args.file, ncw.NCVars.get_entry(args.var), args.nc_file, args.fraction, ncw.NCVars.get_entry(args.fvar))
+        budget = args.memory_budget * 1024 * 1024 if args.memory_budget is not None else None
+        fil = Filter(args.file, ncw.NCVars.get_entry(args.var), args.nc_file, args.fraction, ncw.NCVars.get_entry(args.fvar), not args.no_cache, budget, compact)
         if args.corner: fil.apply_corner(out_path, args.threshold, args.water, args.connect)
         else: fil.apply(out_path, args.threshold, args.water, args.connect)
 
+    elif args.mode == "store":
+        if args.list:
+            with MeshStore(args.file) as store:
+                for name in store.mesh_names(): print(f"{name}: {', '.join(store.variant_names(name))}")
+        elif args.import_file is not None:
+            if args.mesh is None: parser.error("--import requires --mesh")
+            vtkw.write_mesh(f"{args.file}{STORE_SEPARATOR}{args.mesh}", vtkw.VTKInputFile(args.import_file).mesh)
+        else:
+            out_path = "./output.vtk"
+            if args.output is not None: out_path = args.output
+            vtkw.write_mesh(out_path, vtkw.VTKInputFile(f"{args.file}{STORE_SEPARATOR}{args.export}").mesh)
+
+    elif args.mode == "clean":
+        for root in args.dirs:
+            count, size = remove_sidecars(root)
+            print(f"{root}: removed {count} sidecars, {size / 2**20:.1f} MB")
+
+    if compact is not None: compact.report()
+
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,70 @@
+import numpy as np
+
+TRIANGLE = 5
+"""VTK cell type id of triangles, ids are defined here to keep Mesh free of VTK"""
+QUAD = 9
+"""VTK cell type id of quads"""
+POLYGON = 7
+"""VTK cell type id of polygons"""
+
+class Mesh:
+    """
+    In-memory unstructured mesh shared by all tools. Cells are stored in CSR layout, i.e. the points of cell i are
+    connectivity[offsets[i]:offsets[i + 1]]. VTK objects are only created when reading or writing files,
+    see vtk_wrapper.vtk_to_mesh and vtk_wrapper.mesh_to_vtk.
+    """
+    __slots__ = ("points", "connectivity", "offsets", "cell_types", "point_data")
+
+    def __init__(self, points, connectivity=None, offsets=None, cell_types=None, point_data=None):
+        """
+        :param points: (N, 3) point coordinates
+        :param connectivity: flat cell connectivity, None for meshes without cells
+        :param offsets: CSR offsets of cells into connectivity
+        :param cell_types: VTK cell type of each cell
+        :param point_data: dict of point data arrays by name
+        """
+        self.points = points
+        """(N, 3) point coordinates"""
+        self.connectivity = connectivity if connectivity is not None else np.empty(0, dtype=np.int64)
+        """Flat cell connectivity"""
+        self.offsets = offsets if offsets is not None else np.zeros(1, dtype=np.int64)
+        """CSR offsets of cells into connectivity"""
+        self.cell_types = cell_types if cell_types is not None else np.empty(0, dtype=np.uint8)
+        """VTK cell type of each cell"""
+        self.point_data = point_data if point_data is not None else dict()
+        """Point data arrays by name"""
+
+    @staticmethod
+    def from_cells(points, cells, offsets=None, cell_type=TRIANGLE, point_data=None):
+        """
+        Creates a mesh with cells of a single type
+        :param points: (N, 3) point coordinates
+        :param cells: (M, k) array of point indices for cells of equal size (e.g. triangles),
+        or flat connectivity array if offsets are provided
+        :param offsets: CSR offsets of length M+1 for cells of varying size (e.g. polygons)
+        :param cell_type: VTK cell type of all cells
+        :param point_data: dict of point data arrays by name
+        :return: Mesh
+        """
+        cells = np.asarray(cells)
+        if offsets is None:
+            num_cells, cell_size = cells.shape
+            offsets = np.arange(0, (num_cells + 1) * cell_size, cell_size, dtype=np.int64)
+        num_cells = len(offsets) - 1
+        return Mesh(points, cells.ravel(), np.asarray(offsets), np.full(num_cells, cell_type, dtype=np.uint8), point_data)
+
+    @property
+    def num_points(self): return self.points.shape[0]
+
+    @property
+    def num_cells(self): return len(self.offsets) - 1
+
+    def with_points(self, points, attach:bool=True):
+        """
+        Creates a mesh with new point coordinates, which shares the point data and optionally the cells of this mesh
+        :param points: (N, 3) point coordinates
+        :param attach: should the cells be shared?
+        :return: Mesh
+        """
+        if attach: return Mesh(points, self.connectivity, self.offsets, self.cell_types, dict(self.point_data))
+        return Mesh(points, point_data=dict(self.point_data))
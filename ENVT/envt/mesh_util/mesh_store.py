@@ -0,0 +1,191 @@
+import hashlib
+import os
+import netCDF4 as nc
+import numpy as np
+from envt.mesh_util.mesh import Mesh
+
+STORE_SEPARATOR = "::"
+"""Separates store file and mesh in store paths, e.g. bench.nc::torc/sinusoid"""
+
+def is_store_path(path):
+    """
+    Checks whether a path refers to a mesh in a mesh store
+    :param path: file path or store path
+    :return: True for store paths
+    """
+    return STORE_SEPARATOR in str(path)
+
+def split_store_path(path):
+    """
+    Splits a store path of the form <file>::<mesh>[/<variant>]
+    :param path: store path
+    :return: tuple of (store file, mesh name, variant name or None)
+    """
+    store_file, _, name = str(path).partition(STORE_SEPARATOR)
+    mesh_name, _, variant = name.partition("/")
+    if len(store_file) == 0 or len(mesh_name) == 0: raise ValueError(f"Invalid store path {path}, expected <file>{STORE_SEPARATOR}<mesh>[/<variant>]")
+    return store_file, mesh_name, variant if len(variant) > 0 else None
+
+def geometry_hash(mesh:Mesh):
+    """
+    Computes a hash of points and cells of a mesh
+    :param mesh: mesh
+    :return: hex digest
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    for array in (mesh.points, mesh.connectivity, mesh.offsets, mesh.cell_types):
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+class MeshStore:
+    """
+    Mesh store based on NetCDF4. Each mesh is a group holding its geometry once, i.e. points, CSR cells and cell types,
+    and its point data. Variants of a mesh, e.g. evaluated test functions or mapping results, are subgroups which only
+    hold the point data arrays differing from the mesh itself. All arrays are chunked along points and compressed.
+    """
+    CHUNK_SIZE = 1 << 16
+    """Maximum number of entries per chunk along the first dimension"""
+    COMPRESSION_LEVEL = 4
+    """zlib compression level"""
+
+    def __init__(self, path, mode="r"):
+        """
+        :param path: store file path
+        :param mode: r for reading, a for reading and writing, the file is created if it does not exist
+        """
+        self.path = path
+        """Path to store file"""
+        if mode == "a" and not os.path.exists(path): mode = "w"
+        self.dataset = nc.Dataset(path, mode, format="NETCDF4")
+        """NetCDF4 dataset"""
+        self.dataset.set_auto_mask(False)
+
+    def __enter__(self): return self
+
+    def __exit__(self, *_): self.close()
+
+    def close(self): self.dataset.close()
+
+    def mesh_names(self):
+        """
+        Gets names of all stored meshes
+        :return: list of mesh names
+        """
+        return list(self.dataset.groups.keys())
+
+    def variant_names(self, name):
+        """
+        Gets names of all variants of a mesh
+        :param name: mesh name
+        :return: list of variant names
+        """
+        return list(self.dataset.groups[name].groups.keys())
+
+    @staticmethod
+    def _dimension(group, size):
+        """
+        Gets a dimension of the given size visible in a group, dimensions are created on demand and named by their size
+        :param group: group
+        :param size: dimension size
+        :return: dimension name
+        """
+        name = f"n{size}"
+        parent = group
+        while parent is not None:
+            if name in parent.dimensions: return name
+            parent = parent.parent
+        group.createDimension(name, size)
+        return name
+
+    @staticmethod
+    def _create_variable(group, name, values):
+        """
+        Creates or overwrites a chunked, compressed variable
+        :param group: target group
+        :param name: variable name
+        :param values: array
+        :return:
+        """
+        values = np.asarray(values)
+        if values.dtype == np.bool_: values = values.astype(np.uint8)
+        if name in group.variables:
+            variable = group.variables[name]
+            if variable.shape != values.shape or variable.dtype != values.dtype: raise ValueError(f"Variable {name} already exists with a different shape or type")
+            variable[...] = values
+            return
+
+        dims = [MeshStore._dimension(group, size) for size in values.shape]
+        chunks = [max(1, min(values.shape[0], MeshStore.CHUNK_SIZE))] + [max(1, size) for size in values.shape[1:]]
+        variable = group.createVariable(name, values.dtype, dims, compression="zlib", complevel=MeshStore.COMPRESSION_LEVEL,
+                                        shuffle=True, chunksizes=chunks)
+        variable[...] = values
+
+    def write(self, name, mesh:Mesh, variant=None):
+        """
+        Writes a mesh. If the mesh already exists, its geometry has to be identical and only point data is written.
+        Point data of variants is only stored if it differs from the point data of the mesh.
+        :param name: mesh name
+        :param mesh: mesh
+        :param variant: optional variant name
+        :return:
+        """
+        mesh_hash = geometry_hash(mesh)
+        if name in self.dataset.groups:
+            group = self.dataset.groups[name]
+            if group.geometry_hash != mesh_hash: raise ValueError(f"Geometry of mesh {name} in {self.path} differs from the written mesh")
+        else:
+            group = self.dataset.createGroup(name)
+            group.geometry_hash = mesh_hash
+            MeshStore._create_variable(group, "points", mesh.points)
+            if mesh.num_cells > 0:
+                MeshStore._create_variable(group, "connectivity", mesh.connectivity)
+                MeshStore._create_variable(group, "offsets", mesh.offsets)
+                MeshStore._create_variable(group, "cell_types", mesh.cell_types)
+
+        target = group
+        if variant is not None: target = group.groups[variant] if variant in group.groups else group.createGroup(variant)
+        for array_name, values in mesh.point_data.items():
+            if variant is not None and f"data.{array_name}" in group.variables:
+                if np.array_equal(group.variables[f"data.{array_name}"][...], values, equal_nan=True): continue
+            MeshStore._create_variable(target, f"data.{array_name}", values)
+
+    def read(self, name, variant=None):
+        """
+        Reads a mesh, point data of a variant overrides point data of the mesh
+        :param name: mesh name
+        :param variant: optional variant name
+        :return: Mesh
+        """
+        if name not in self.dataset.groups: raise KeyError(f"No mesh {name} in {self.path}")
+        group = self.dataset.groups[name]
+        if variant is not None and variant not in group.groups: raise KeyError(f"No variant {variant} of mesh {name} in {self.path}")
+        mesh = Mesh(group.variables["points"][...])
+        if "connectivity" in group.variables:
+            mesh.connectivity = group.variables["connectivity"][...]
+            mesh.offsets = group.variables["offsets"][...]
+            mesh.cell_types = group.variables["cell_types"][...]
+        for data_group in (group, group.groups[variant]) if variant is not None else (group,):
+            for variable_name, variable in data_group.variables.items():
+                if variable_name.startswith("data."): mesh.point_data[variable_name[5:]] = variable[...]
+        return mesh
+
+def read_store_mesh(path):
+    """
+    Reads a mesh from a store path
+    :param path: store path <file>::<mesh>[/<variant>]
+    :return: Mesh
+    """
+    store_file, name, variant = split_store_path(path)
+    with MeshStore(store_file) as store: return store.read(name, variant)
+
+def write_store_mesh(path, mesh:Mesh):
+    """
+    Writes a mesh to a store path, the store file is created if it does not exist
+    :param path: store path <file>::<mesh>[/<variant>]
+    :param mesh: mesh
+    :return:
+    """
+    store_file, name, variant = split_store_path(path)
+    with MeshStore(store_file, "a") as store: store.write(name, mesh, variant)
@@ -1,7 +1,46 @@
 import netCDF4 as nc
+import numpy as np
+import os
 from enum import Enum
 import matplotlib.pyplot as plt
 
+CHUNK_CACHE_ENV = "ENVT_NC_CHUNK_CACHE_MB"
+"""Environment variable setting the HDF5 chunk cache size per variable in MB"""
+DEFAULT_CHUNK_CACHE_MB = 64
+"""Default HDF5 chunk cache size per variable in MB"""
+
+_dataset_pool = dict()
+"""Open datasets of this process by real path"""
+_dataset_pool_pid = os.getpid()
+"""Process owning the pooled datasets, forked workers open their own datasets"""
+
+def open_dataset(path):
+    """
+    Opens a NC file for reading through the process-wide pool, i.e. each file is opened once per process.
+    Datasets return plain ndarrays instead of masked arrays.
+    :param path: path to NC file
+    :return: netCDF4 Dataset
+    """
+    global _dataset_pool, _dataset_pool_pid
+    if _dataset_pool_pid != os.getpid():
+        _dataset_pool = dict()
+        _dataset_pool_pid = os.getpid()
+    key = os.path.realpath(path)
+    if key not in _dataset_pool or not _dataset_pool[key].isopen():
+        ds = nc.Dataset(path, 'r')
+        ds.set_auto_mask(False)
+        _dataset_pool[key] = ds
+    return _dataset_pool[key]
+
+def close_datasets():
+    """
+    Closes all pooled datasets of this process
+    :return:
+    """
+    for ds in _dataset_pool.values():
+        if ds.isopen(): ds.close()
+    _dataset_pool.clear()
+
 class NCVars(Enum):
     """Known Variable Names, might need to extend this for other data"""
     BGGD = "bggd"
@@ -27,11 +66,17 @@ class NCVars(Enum):
 
 
 class NCFile:
-    """Represents an NC file for this specific use case, provides functionality to read fields"""
-    def __init__(self, path):
+    """
+    Represents an NC file for this specific use case, provides functionality to read fields.
+    The dataset is shared by all NCFile instances of the same path within a process.
+    """
+    def __init__(self, path, chunk_cache_mb=None):
         self.path = path
         """Path to file"""
-        ds = nc.Dataset(path, 'r')
+        if chunk_cache_mb is None: chunk_cache_mb = float(os.environ.get(CHUNK_CACHE_ENV, DEFAULT_CHUNK_CACHE_MB))
+        self.chunk_cache_bytes = int(chunk_cache_mb * 1024 * 1024)
+        """HDF5 chunk cache size per variable in bytes"""
+        ds = open_dataset(path)
         self.dataset = ds
         """Contains all data"""
         self.dimensions = ds.dimensions
@@ -41,55 +86,111 @@ class NCFile:
         self.attributes = ds.ncattrs()
         """?"""
 
-    def var_lon_data(self, var:NCVars):
+    def variable(self, name):
+        """
+        Gets a variable for lazy, sliceable access. Slicing only reads the selected hyperslab and returns plain ndarrays.
+        :param name: variable name
+        :return: netCDF4 Variable
+        """
+        variable = self.variables[name]
+        # chunk caches only exist for chunked variables of NETCDF4 files
+        if self.dataset.data_model.startswith("NETCDF4") and variable.chunking() not in (None, "contiguous"):
+            if variable.get_var_chunk_cache()[0] != self.chunk_cache_bytes: variable.set_var_chunk_cache(size=self.chunk_cache_bytes)
+        return variable
+
+    def var_lon_data(self, var:NCVars, index=Ellipsis):
         """
         Gets center longitude of variable
         :param var: variable
+        :param index: optional slice of the data
         :return: center data
         """
-        name = f"{var.value}.lon"
-        lon = self.variables[name][:]
-        return lon
+        return self.variable(f"{var.value}.lon")[index]
 
-    def var_lat_data(self, var:NCVars):
+    def var_lat_data(self, var:NCVars, index=Ellipsis):
         """
         Gets center latitude of variable
         :param var: variable
+        :param index: optional slice of the data
         :return: center data
         """
-        name = f"{var.value}.lat"
-        lat = self.variables[name][:]
-        return lat
+        return self.variable(f"{var.value}.lat")[index]
 
-    def var_clo_data(self, var:NCVars):
+    def var_clo_data(self, var:NCVars, index=Ellipsis):
         """
         Gets corner longitude of variable
         :param var: variable
+        :param index: optional slice of the data
         :return: corner data
         """
-        name = f"{var.value}.clo"
-        clo = self.variables[name][:]
-        return clo
+        return self.variable(f"{var.value}.clo")[index]
 
-    def var_cla_data(self, var:NCVars):
+    def var_cla_data(self, var:NCVars, index=Ellipsis):
         """
         Gets corner latitude of variable
         :param var: variable
+        :param index: optional slice of the data
         :return: corner data
         """
-        name = f"{var.value}.cla"
-        cla = self.variables[name][:]
-        return cla
+        return self.variable(f"{var.value}.cla")[index]
+
+    def var_corner_slabs(self, var:NCVars, max_cells):
+        """
+        Splits the cells of variable into contiguous hyperslabs of at most max_cells cells.
+        Cells are enumerated in the same order as flattening the full data.
+        :param var: variable
+        :param max_cells: maximum number of cells per hyperslab
+        :return: list of tuples (first cell index, hyperslab)
+        """
+        clo_var = self.variables[f"{var.value}.clo"]
+        num_rows = int(np.prod(clo_var.shape[1:-1]))
+        row_size = clo_var.shape[-1]
+        max_cells = max(1, int(max_cells))
+
+        # blocks of full rows, or blocks within single rows if rows are too large
+        rows_per_slab = max(1, max_cells // row_size)
+        cols_per_slab = min(row_size, max_cells) if rows_per_slab == 1 else row_size
+        slabs = []
+        for row in range(0, num_rows, rows_per_slab):
+            row_end = min(row + rows_per_slab, num_rows)
+            for col in range(0, row_size, cols_per_slab):
+                col_end = min(col + cols_per_slab, row_size)
+                if clo_var.ndim == 2: hyperslab = (slice(None), slice(col, col_end))
+                else: hyperslab = (slice(None), slice(row, row_end), slice(col, col_end))
+                slabs.append((row * row_size + col, hyperslab))
+        return slabs
+
+    def var_corner_slab(self, var:NCVars, hyperslab):
+        """
+        Reads corner longitude and latitude of variable within a hyperslab
+        :param var: variable
+        :param hyperslab: hyperslab as created by var_corner_slabs
+        :return: tuple (clo, cla), both of shape (corners, cells)
+        """
+        dims = self.variables[f"{var.value}.clo"].shape[0]
+        clo = self.var_clo_data(var, hyperslab).reshape((dims, -1))
+        cla = self.var_cla_data(var, hyperslab).reshape((dims, -1))
+        return clo, cla
+
+    def var_corner_chunks(self, var:NCVars, max_cells):
+        """
+        Reads corner longitude and latitude of variable in hyperslabs of at most max_cells cells.
+        :param var: variable
+        :param max_cells: maximum number of cells per chunk
+        :return: generator of tuples (first cell index, clo chunk, cla chunk), chunks have shape (corners, cells)
+        """
+        for start, hyperslab in self.var_corner_slabs(var, max_cells):
+            clo, cla = self.var_corner_slab(var, hyperslab)
+            yield start, clo, cla
 
-    def var_msk_data(self, var:NCVars):
+    def var_msk_data(self, var:NCVars, index=Ellipsis):
         """
         Gets mask data of cells. Warning: Only call this when file is mask file.
         :param var: variable
+        :param index: optional slice of the data
         :return: mask data
         """
-        name = f"{var.value}.msk"
-        msk = self.variables[name][:]
-        return msk
+        return self.variable(f"{var.value}.msk")[index]
 
     def print_overview(self):
         """
@@ -115,27 +216,136 @@ class NCFile:
         for attr_name in self.attributes:
             print(f"  {attr_name}: {getattr(self.dataset, attr_name)}")
 
+    def var_head(self, name, limit):
+        """
+        Reads the first entries of a variable in flattened order, only the hyperslab containing them is read
+        :param name: variable name
+        :param limit: number of entries
+        :return: flat array of at most limit entries
+        """
+        variable = self.variable(name)
+        shape = variable.shape
+        index = []
+        remaining = limit
+        for dim in range(len(shape)):
+            inner = int(np.prod(shape[dim + 1:]))
+            if inner >= remaining:
+                # all requested entries lie within the first entry of this dimension
+                index.append(slice(0, min(1, shape[dim])))
+                continue
+            index.append(slice(0, min(shape[dim], -(-remaining // inner))))
+            break
+        return np.asarray(variable[tuple(index)]).ravel()[:limit]
+
+    def var_chunks(self, name, max_bytes):
+        """
+        Reads a variable in hyperslabs of at most max_bytes bytes, unless a single entry of the last dimension is larger
+        :param name: variable name
+        :param max_bytes: maximum size of each hyperslab in bytes
+        :return: generator of flat arrays, in flattened order of the variable
+        """
+        variable = self.variable(name)
+        shape = variable.shape
+        if len(shape) == 0:
+            yield np.asarray(variable[...]).ravel()
+            return
+        max_entries = max(1, max_bytes // variable.dtype.itemsize)
+        # split dimension: all dimensions after it fit into one hyperslab
+        split = len(shape) - 1
+        while split > 0 and int(np.prod(shape[split:])) <= max_entries: split -= 1
+        inner = int(np.prod(shape[split + 1:]))
+        step = max(1, max_entries // max(1, inner))
+        for outer in np.ndindex(*shape[:split]):
+            for start in range(0, shape[split], step):
+                yield np.asarray(variable[outer + (slice(start, start + step),)]).ravel()
+
+    def var_stats(self, name, max_bytes=64 * 1024 * 1024, bins=10):
+        """
+        Computes summary statistics of a variable by streaming it in hyperslabs. NaN and fill values are excluded
+        from min, max, mean and histogram. The histogram requires a second pass over the data.
+        :param name: variable name
+        :param max_bytes: maximum size of each hyperslab in bytes
+        :param bins: number of histogram bins, 0 disables the histogram
+        :return: dict of statistics
+        """
+        variable = self.variable(name)
+        dtype = variable.dtype
+        stats = {"count": int(np.prod(variable.shape)), "valid": 0, "nan": 0, "fill": 0, "min": None, "max": None, "mean": None}
+        if not np.issubdtype(dtype, np.number): return stats
+        fill_value = getattr(variable, "_FillValue", nc.default_fillvals.get(dtype.str[1:]))
+
+        def split_values(chunk):
+            # returns valid values, number of NaN values and number of fill values
+            nan = np.isnan(chunk) if np.issubdtype(dtype, np.floating) else np.zeros(chunk.shape, dtype=bool)
+            fill = chunk == fill_value if fill_value is not None else np.zeros(chunk.shape, dtype=bool)
+            return chunk[~(nan | fill)], int(np.count_nonzero(nan)), int(np.count_nonzero(fill))
+
+        total = 0.0
+        for chunk in self.var_chunks(name, max_bytes):
+            values, num_nan, num_fill = split_values(chunk)
+            stats["nan"] += num_nan
+            stats["fill"] += num_fill
+            if values.size == 0: continue
+            stats["valid"] += values.size
+            total += float(np.sum(values, dtype=np.float64))
+            stats["min"] = values.min() if stats["min"] is None else min(stats["min"], values.min())
+            stats["max"] = values.max() if stats["max"] is None else max(stats["max"], values.max())
+        if stats["valid"] == 0: return stats
+        stats["mean"] = total / stats["valid"]
+
+        if bins > 0:
+            edges = np.linspace(float(stats["min"]), float(stats["max"]), bins + 1)
+            counts = np.zeros(bins, dtype=np.int64)
+            for chunk in self.var_chunks(name, max_bytes): counts += np.histogram(split_values(chunk)[0], bins=edges)[0]
+            stats["histogram"] = (counts, edges)
+        return stats
+
+    def print_var_stats(self, names=None, max_bytes=64 * 1024 * 1024, bins=10):
+        """
+        Prints summary statistics of variables, see var_stats
+        :param names: variable names, defaults to all variables
+        :param max_bytes: maximum size of each hyperslab in bytes
+        :param bins: number of histogram bins
+        :return:
+        """
+        if names is None: names = list(self.variables.keys())
+        for name in names:
+            if name not in self.variables:
+                print(f"Variable '{name}' not found in the file.")
+                continue
+            stats = self.var_stats(name, max_bytes, bins)
+            print(f"{name}: shape {self.variables[name].shape}, type {self.variables[name].dtype}")
+            print(f"  count: {stats['count']}, valid: {stats['valid']}, NaN: {stats['nan']}, fill: {stats['fill']}")
+            if stats["mean"] is None: continue
+            print(f"  min: {stats['min']}, max: {stats['max']}, mean: {stats['mean']}")
+            if "histogram" in stats:
+                counts, edges = stats["histogram"]
+                width = max(1, int(counts.max()))
+                for count, low, high in zip(counts, edges[:-1], edges[1:]):
+                    print(f"  [{low:14.6g}, {high:14.6g}] {count:12d} {'#' * int(round(40 * count / width))}")
+
     def print_var_data(self, var, limit=100):
         """
-        Prints variable data
+        Prints variable data, only the entries shown are read
         :param var: variable
         :param limit: max number of entries to print
         :return:
         """
         if var in self.variables:
-            data = self.variables[var][:]
+            variable = self.variables[var]
+            size = int(np.prod(variable.shape))
             print(f"Data for variable '{var}':")
-            print(f"Shape: {data.shape}")
-            print(f"Type: {data.dtype}")
+            print(f"Shape: {variable.shape}")
+            print(f"Type: {variable.dtype}")
 
             # If the data is large, show only a snippet
-            if data.size > limit >= 0:
+            if size > limit >= 0:
                 print("Data (snippet):")
-                print(data.ravel()[:100])  # Show the first 100 values
+                print(self.var_head(var, limit))
                 print("...")
             else:
                 print("Data:")
-                print(data)
+                print(self.variable(var)[...])
         else:
             print(f"Variable '{var}' not found in the file.")
 
@@ -1,9 +1,104 @@
+import glob
+import os
+import time
 import numpy as np
-import vtkmodules.util.numpy_support as vtk_np
-from pyproj import Proj, transform
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+from pyproj import Proj
 import envt.vtk_util.vtk_wrapper as vtkw
+import envt.geo_util.geodetic as geod
+from envt.mesh_util.mesh import Mesh
+from envt.tools.manifest import read_manifest
 from typing import Type, Union
-import warnings
+
+@lru_cache(maxsize=None)
+def wgs84_proj(proj) -> Proj:
+    """
+    Gets a shared WGS84 Proj, creating Proj objects on every conversion is expensive
+    :param proj: projection name, e.g. latlong or geocent
+    :return: Proj
+    """
+    return Proj(proj=proj, datum="WGS84")
+
+THREADS_ENV = "ENVT_CONVERSION_THREADS"
+"""Environment variable setting the number of conversion threads, defaults to the number of CPUs"""
+
+_executor = None
+"""Thread pool of chunked conversions, threads are kept alive so that cached Transformers are reused"""
+_executor_threads = 0
+"""Number of threads of the thread pool"""
+_executor_pid = os.getpid()
+"""Process owning the thread pool, forked workers create their own pool"""
+
+def conversion_executor():
+    """
+    Gets the process-wide thread pool of chunked conversions, can be sized via environment variable ENVT_CONVERSION_THREADS
+    :return: ThreadPoolExecutor or None for single-threaded conversion
+    """
+    global _executor, _executor_threads, _executor_pid
+    if _executor_pid != os.getpid():
+        _executor = None
+        _executor_pid = os.getpid()
+    threads = int(os.environ.get(THREADS_ENV, os.cpu_count() or 1))
+    if threads <= 1: return None
+    if _executor is None or _executor_threads != threads:
+        if _executor is not None: _executor.shutdown(wait=False)
+        _executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="envt-convert")
+        _executor_threads = threads
+    return _executor
+
+def batch_files(patterns, manifest=None, output_dir=None):
+    """
+    Gathers input and output files of a batch conversion
+    :param patterns: input files or glob patterns, outputs are placed in output_dir
+    :param manifest: optional manifest file, each line holds an input and optionally an output file, # starts a comment
+    :param output_dir: output directory of inputs without explicit output, keeps the file names
+    :return: list of (input file, output file)
+    """
+    inputs = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if any(c in pattern for c in "*?[") else [pattern]
+        if len(matches) == 0: raise ValueError(f"No files match {pattern}")
+        inputs += [(path, None) for path in matches]
+    if manifest is not None: inputs += [(infile, outfile) for infile, outfile in read_manifest(manifest, 1, 2)]
+
+    files = []
+    for infile, outfile in inputs:
+        if outfile is None:
+            if output_dir is None: raise ValueError(f"No output for {infile}, an output directory is required")
+            outfile = os.path.join(output_dir, os.path.basename(infile))
+        files.append((infile, outfile))
+    return files
+
+_batch_mode = None
+"""Conversion mode of a batch worker, created once per worker process"""
+
+def _init_batch_worker(mode_class, threads):
+    """
+    Initializes a batch worker process
+    :param mode_class: conversion mode class
+    :param threads: number of conversion threads of this worker, None keeps the current setting
+    :return:
+    """
+    global _batch_mode
+    _batch_mode = mode_class()
+    if threads is not None: os.environ[THREADS_ENV] = str(threads)
+
+def _convert_batch_file(infile, outfile, attach:bool, use_compact:bool, use_float32:bool):
+    """
+    Converts one file of a batch with the mode of this worker
+    :param infile: input file
+    :param outfile: output file
+    :param attach: should connectivity be attached?
+    :param use_compact: should outputs be compact?
+    :param use_float32: should compact outputs use float32?
+    :return: tuple of (seconds, deviations of compact mode or None)
+    """
+    start = time.perf_counter()
+    compact = vtkw.CompactMode(use_float32) if use_compact else None
+    Converter(infile, outfile, compact).convert(_batch_mode, attach)
+    return time.perf_counter() - start, compact.deviations if compact is not None else None
 
 class Converter(vtkw.VTKInputFile):
     """Provides coordinate conversion functionality for VTK files"""
@@ -22,23 +117,42 @@ class Converter(vtkw.VTKInputFile):
 
         def check_data(self, d0, d1, d2): pass
 
+        def transform(self, d0, d1, d2):
+            """
+            Transforms coordinates with a cached pyproj Transformer
+            :return: transformed data arrays
+            """
+            return geod.get_transformer(self.src_crs(), self.dst_crs()).transform(d0, d1, d2)
+
     class Mode2DTO3D(Mode):
         """Converter from 2D geodesic to 3D cartesian"""
         def __init__(self):
             super().__init__()
-            self.src_proj = Proj(proj="latlong", datum="WGS84")
-            self.dst_proj = Proj(proj="geocent", datum="WGS84")
+            self.src_proj = wgs84_proj("latlong")
+            self.dst_proj = wgs84_proj("geocent")
 
         def check_data(self, lon, lat, _):
             lon[lon > 180] -= 360
             lon[lon < -180] += 360
 
+        def transform(self, lon, lat, height):
+            if not geod.numpy_engine(): return super().transform(lon, lat, height)
+            return geod.geodetic_to_geocentric(lon, lat, height)
+
     class Mode3DTO2D(Mode):
         """Converter from 3D cartesian to 2D geodesic"""
         def __init__(self):
             super().__init__()
-            self.src_proj = Proj(proj="geocent", datum="WGS84")
-            self.dst_proj = Proj(proj="latlong", datum="WGS84")
+            self.src_proj = wgs84_proj("geocent")
+            self.dst_proj = wgs84_proj("latlong")
+
+        def transform(self, x, y, z):
+            if not geod.numpy_engine(): return super().transform(x, y, z)
+            lon, lat, height = geod.geocentric_to_geodetic(x, y, z)
+            # the closed form does not apply in the vicinity of the earth center, PROJ handles these points
+            invalid = np.isnan(lat) & ~(np.isnan(x) | np.isnan(y) | np.isnan(z))
+            if np.any(invalid): lon[invalid], lat[invalid], height[invalid] = super().transform(x[invalid], y[invalid], z[invalid])
+            return lon, lat, height
 
     class ModeManual(Mode):
         """Converter for manual targets"""
@@ -47,45 +161,87 @@ class Converter(vtkw.VTKInputFile):
             self.src_proj = src_proj
             self.dst_proj = dst_proj
 
-    def __init__(self, infile, outfile):
+    CHUNK_SIZE = 1 << 16
+    """Number of points per block of chunked conversions"""
+
+    def __init__(self, infile, outfile, compact:vtkw.CompactMode=None):
         super().__init__(infile)
         self.outfile = outfile
         """Output file name"""
+        self.compact = compact
+        """Optional compact mesh representation"""
+
+    @staticmethod
+    def convert_chunked(mode:Union[Mode2DTO3D, Mode3DTO2D, ModeManual], in_arrays, num_points, out=None, copy:bool=True):
+        """
+        Applies provided transformation block-wise. Blocks are transformed in the conversion thread pool, as numpy and
+        PROJ release the GIL, and written into the output buffer, thus no full-size temporaries are created.
+        :param mode: transformation mode
+        :param in_arrays: up to 3 data arrays of length num_points, missing dimensions are zero
+        :param num_points: number of points
+        :param out: optional preallocated (num_points, 3) float64 output buffer
+        :param copy: should blocks be copied prior to check_data? Otherwise check_data modifies the input arrays in place.
+        :return: converted data arrays (stacked)
+        """
+        if out is None: out = np.empty((num_points, 3), dtype=np.float64)
+        if out.shape != (num_points, 3): raise ValueError(f"Output buffer of shape {out.shape} does not match {num_points} points")
+
+        def convert_block(start):
+            end = min(start + Converter.CHUNK_SIZE, num_points)
+            block = [np.array(array[start:end], dtype=np.float64) if copy else array[start:end] for array in in_arrays]
+            block += [np.zeros(end - start) for _ in range(3 - len(block))]
+            mode.check_data(*block)
+            block = [np.asarray(array, dtype=np.float64) for array in block]
+            for dim, values in enumerate(mode.transform(*block)): out[start:end, dim] = values
+
+        starts = range(0, num_points, Converter.CHUNK_SIZE)
+        executor = conversion_executor() if len(starts) > 1 else None
+        if executor is None:
+            for start in starts: convert_block(start)
+        else:
+            list(executor.map(convert_block, starts))
+        return out
 
     @staticmethod
-    def convert_data_arrays(mode:Union[Mode2DTO3D, Mode3DTO2D, ModeManual], in_arr_d0, in_arr_d1, in_arr_d2):
+    def convert_data_arrays(mode:Union[Mode2DTO3D, Mode3DTO2D, ModeManual], in_arr_d0, in_arr_d1, in_arr_d2, out=None):
         """
-        Applies provided transformation on specified data arrays
+        Applies provided transformation on specified data arrays, check_data may modify them in place
         :param mode: transformation mode
         :param in_arr_d0: data array dimension 0
         :param in_arr_d1: data array dimension 1
         :param in_arr_d2: data array dimension 2
+        :param out: optional preallocated (N, 3) float64 output buffer
         :return: converted data arrays (stacked)
         """
-        mode.check_data(in_arr_d0, in_arr_d1, in_arr_d2)
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore", category=FutureWarning)
-            out_arr_d0, out_arr_d1, out_arr_d2 = transform(mode.src_crs(), mode.dst_crs(), in_arr_d0, in_arr_d1, in_arr_d2)
-        np_out_array = np.column_stack((out_arr_d0, out_arr_d1, out_arr_d2))
-        return np_out_array
+        return Converter.convert_chunked(mode, (in_arr_d0, in_arr_d1, in_arr_d2), len(in_arr_d0), out, copy=False)
 
     @staticmethod
-    def convert_data(mode:Union[Mode2DTO3D, Mode3DTO2D, ModeManual], input_array, num_points):
+    def convert_data(mode:Union[Mode2DTO3D, Mode3DTO2D, ModeManual], input_array, num_points, out=None):
         """
         Applies provided transformation on specified stacked data array. Will extend input data to 3 dimensions with zeros.
         Will always return 3-dimensional output.
         :param mode: transformation mode
-        :param input_array: stacked data array
+        :param input_array: stacked data array, check_data may modify it in place
         :param num_points: number of points in input_array
+        :param out: optional preallocated (num_points, 3) float64 output buffer
         :return: converted data arrays (stacked)
         """
-        zeros = np.zeros((num_points, 1))
-        in_arr_d0, in_arr_d1, in_arr_d2 = zeros, zeros, zeros
-        if input_array.shape[1] >= 1: in_arr_d0 = input_array[:, 0]
-        if input_array.shape[1] >= 2: in_arr_d1 = input_array[:, 1]
-        if input_array.shape[1] >= 3: in_arr_d2 = input_array[:, 2]
+        in_arrays = [input_array[:, dim] for dim in range(min(input_array.shape[1], 3))]
+        return Converter.convert_chunked(mode, in_arrays, num_points, out, copy=False)
 
-        return Converter.convert_data_arrays(mode, in_arr_d0, in_arr_d1, in_arr_d2)
+    @staticmethod
+    def convert_mesh(mode:Union[Mode2DTO3D, Mode3DTO2D, ModeManual], mesh:Mesh, attach:bool=True):
+        """
+        Applies provided transformation on the points of a mesh
+        :param mode: transformation mode
+        :param mesh: input mesh, stays unchanged
+        :param attach: should connectivity be attached?
+        :return: converted mesh sharing point data and cells with the input mesh
+        """
+        # conversion may modify the input coordinates in place, thus blocks are copied
+        in_arrays = [mesh.points[:, dim] for dim in range(mesh.points.shape[1])]
+        np_out_array = Converter.convert_chunked(mode, in_arrays, mesh.num_points, copy=True)
+        return mesh.with_points(np_out_array, attach)
 
     def convert(self, mode:Union[Mode2DTO3D, Mode3DTO2D, ModeManual], attach:bool):
         """
@@ -94,26 +250,49 @@ class Converter(vtkw.VTKInputFile):
         :param attach: should connectivity be attached?
         :return:
         """
-        np_point_array = np.array([self.input_points.GetPoint(i) for i in range(self.input_num_points)])
-        np_out_array = Converter.convert_data(mode, np_point_array, self.input_num_points)
-        out_points_data_array = vtk_np.numpy_to_vtk(np_out_array, deep=True)
-
-        output_points = vtkw.vtkPoints()
-        output_points.SetData(out_points_data_array)
+        output_mesh = Converter.convert_mesh(mode, self.mesh, attach)
+        vtkw.write_mesh(self.outfile, output_mesh, self.compact)
 
-        # Assign the transformed points to a new unstructured grid
-        output_unstructured_grid = vtkw.vtkUnstructuredGrid()
-        output_unstructured_grid.SetPoints(output_points)
-
-        # Copy the cells (topology) from the original grid to the new one
-        if self.input_point_data:
-            output_point_data = output_unstructured_grid.GetPointData()
-            for i in range(self.input_point_data.GetNumberOfArrays()):
-                array = self.input_point_data.GetArray(i)
-                output_point_data.AddArray(array)
-
-        if attach:
-            output_unstructured_grid.SetCells(vtkw.VTK_TRIANGLE, self.input_grid.GetCells())
+    @staticmethod
+    def convert_batch(mode_class:Type[Mode], files, attach:bool, compact:vtkw.CompactMode=None, jobs:int=1):
+        """
+        Converts many files with worker processes, each worker reuses its mode and thus its Transformers for all of its files.
+        Prints the time spent per file.
+        :param mode_class: conversion mode class, e.g. Converter.Mode3DTO2D
+        :param files: list of (input file, output file)
+        :param attach: should connectivity be attached?
+        :param compact: optional compact mesh representation, deviations of all files are merged into it
+        :param jobs: number of worker processes
+        :return: list of seconds per file
+        """
+        for _, outfile in files:
+            if os.path.dirname(outfile) != "": os.makedirs(os.path.dirname(outfile), exist_ok=True)
+        start = time.perf_counter()
+        file_args = ([infile for infile, _ in files], [outfile for _, outfile in files], repeat(attach), repeat(compact is not None),
+                     repeat(compact is not None and compact.use_float32))
+        if jobs > 1:
+            threads = max(1, (os.cpu_count() or 1) // jobs)
+            with ProcessPoolExecutor(max_workers=jobs, initializer=_init_batch_worker, initargs=(mode_class, threads)) as executor:
+                results = executor.map(_convert_batch_file, *file_args)
+                timings = Converter._report_batch(files, results, compact)
+        else:
+            _init_batch_worker(mode_class, None)
+            timings = Converter._report_batch(files, map(_convert_batch_file, *file_args), compact)
+        print(f"Converted {len(files)} files in {time.perf_counter() - start:.3f} s")
+        return timings
 
-        # Write the new 3D VTK unstructured grid to a file
-        vtkw.VTKOutputFile(self.outfile, output_unstructured_grid).write()
+    @staticmethod
+    def _report_batch(files, results, compact:vtkw.CompactMode=None):
+        """
+        Prints results of a batch conversion as they arrive
+        :param files: list of (input file, output file)
+        :param results: iterable of (seconds, deviations) in file order
+        :param compact: optional compact mesh representation to merge deviations into
+        :return: list of seconds per file
+        """
+        timings = []
+        for (infile, outfile), (seconds, deviations) in zip(files, results):
+            print(f"{infile} -> {outfile}: {seconds:.3f} s")
+            if compact is not None: compact.merge(deviations)
+            timings.append(seconds)
+        return timings
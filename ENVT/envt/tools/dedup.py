@@ -0,0 +1,39 @@
+import numpy as np
+
+def unique_rows(keys):
+    """
+    Determines unique rows of an integer key array in a single lexicographic sort
+    :param keys: integer key array of shape (N, D)
+    :return: tuple of (first_indices, inverse), first_indices are the first occurrences of the sorted unique rows
+    """
+    order = np.lexsort(keys.T[::-1])
+    sorted_keys = keys[order]
+    is_new = np.empty((len(keys),), dtype=bool)
+    is_new[:1] = True
+    np.any(sorted_keys[1:] != sorted_keys[:-1], axis=1, out=is_new[1:])
+    inverse = np.empty((len(keys),), dtype=np.intp)
+    inverse[order] = np.cumsum(is_new) - 1
+    return order[is_new], inverse
+
+def quantize_points(points, decimals):
+    """
+    Rounds points to the given number of decimals and returns them as integer keys, i.e. scaled by 10^decimals
+    :param points: coordinate array of shape (N, D)
+    :param decimals: number of decimals used for rounding
+    :return: int64 key array of shape (N, D)
+    """
+    scaled = np.multiply(points, 10.0 ** decimals)
+    np.rint(scaled, out=scaled)
+    return scaled.astype(np.int64)
+
+def deduplicate_points(points, decimals):
+    """
+    Rounds points to the given number of decimals and determines the unique points based on quantized integer keys.
+    Result is bit-identical to np.unique(np.round(points, decimals), axis=0, return_index=True, return_inverse=True)
+    :param points: coordinate array of shape (N, D)
+    :param decimals: number of decimals used for rounding
+    :return: tuple of (unique_points, first_indices, inverse)
+    """
+    keys = quantize_points(points, decimals)
+    first_indices, inverse = unique_rows(keys)
+    return keys[first_indices] / 10.0 ** decimals, first_indices, inverse
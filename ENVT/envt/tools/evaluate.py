@@ -1,20 +1,39 @@
+import csv
+import os
+import time
 import numpy as np
 
 import envt.vtk_util.vtk_wrapper as vtkw
+import envt.geo_util.geodetic as geod
+from envt.cache_util.disk_cache import DiskCache, array_hash, make_key, source_hash
+from envt.mesh_util.mesh_store import is_store_path, split_store_path
+from envt.mesh_util.mesh import Mesh
 from envt.vtk_util.eval_functions import *
+import envt.vtk_util.eval_functions as evf
 import envt.tools.convert as conv
-import vtkmodules.util.numpy_support as vtk_np
 import json
 
 class Evaluator(vtkw.VTKInputFile):
     """Evaluates points of this VTK file for a given test function"""
 
     FUNCTIONS = {"sinusoid" : fun_sinusoid, "harmonic" : fun_harmonic, "vortex" : fun_vortex, "gulfstream" : fun_gulfstream}
+    KERNELS = {"sinusoid" : kernel_sinusoid, "harmonic" : kernel_harmonic, "vortex" : kernel_vortex, "gulfstream" : kernel_gulfstream}
+    """Chunk kernels of FUNCTIONS, see evaluate_functions"""
+    ALL_FUNCTIONS = "all"
+    """Function name selecting all FUNCTIONS"""
+    ANALYTIC_CACHE = "analytic"
+    """Name of the on-disk cache of analytical solutions"""
+    ANALYTIC_CACHE_VERSION = 1
+    """Version of analytical solutions, increase it to invalidate cached entries on changes outside the hashed modules"""
 
-    def __init__(self, infile, outfile):
+    def __init__(self, infile, outfile, compact:vtkw.CompactMode=None, use_cache:bool=False):
         super().__init__(infile)
         self.outfile = outfile
         """Output file path"""
+        self.compact = compact
+        """Optional compact mesh representation"""
+        self.use_cache = use_cache
+        """Should analytical solutions be cached on disk?"""
 
     @staticmethod
     def integrate_2d(points, evals, areas):
@@ -29,82 +48,168 @@ class Evaluator(vtkw.VTKInputFile):
         integral = np.sum(evals * areas)
         return integral
 
-    def evaluate(self, fun_name):
+    @staticmethod
+    def geodesic_points(points, cartesian:bool=False):
         """
-        Evaluates this VTK file for the given test function and writes result to file
+        Gets points in 2D geodesic coordinates as expected by the test functions
+        :param points: mesh points
+        :param cartesian: are the points in 3D cartesian coordinates? Otherwise they are returned unchanged.
+        :return: points with lon and lat in the first two columns
+        """
+        if not cartesian: return points
+        return conv.Converter.convert_data(conv.Converter.Mode3DTO2D(), points, points.shape[0])
+
+    @staticmethod
+    def evaluate_mesh(mesh:Mesh, fun_name, cartesian:bool=False, use_cache:bool=False):
+        """
+        Evaluates the points of a mesh for the given test function and attaches the result as point data "eval"
+        :param mesh: mesh with points in 2D geodesic or, if cartesian is set, 3D cartesian coordinates
         :param fun_name: test function name
-        :return:
+        :param cartesian: are the points in 3D cartesian coordinates? Mesh points stay unchanged.
+        :param use_cache: should the on-disk cache of analytical solutions be used?
+        :return: mesh
         """
-        np_points = vtk_np.vtk_to_numpy(self.input_points.GetData())
-        np_points_eval = Evaluator.FUNCTIONS[fun_name](np_points)
-        output_point_data = vtk_np.numpy_to_vtk(np_points_eval, deep=True)
-        output_point_data.SetName("eval")
-        self.input_point_data.AddArray(output_point_data)
+        mesh.point_data["eval"] = Evaluator.evaluate_points(mesh.points, [fun_name], cartesian, use_cache)[fun_name]
+        return mesh
 
-        vtkw.VTKOutputFile(self.outfile, self.input_grid).write()
+    @staticmethod
+    def function_names(names):
+        """
+        Expands a list of function names, "all" selects all functions
+        :param names: function names
+        :return: list of unique function names
+        """
+        if Evaluator.ALL_FUNCTIONS in names: return list(Evaluator.FUNCTIONS.keys())
+        return list(dict.fromkeys(names))
 
-    def evaluate_diff(self, source_mesh_file, fun_name, out_vtk, use_gulfstream_filter=False):
+    @staticmethod
+    def analytic_code_hash(cartesian:bool):
         """
-        Evaluates the error of this VTK file with respect to another source mesh file after mapping.
-        Results and errors are written to files.
-        :param source_mesh_file: Respective source mesh file
-        :param fun_name: Used function name
-        :param out_vtk: output VTK file path
-        :param use_gulfstream_filter: should we apply special filtering for the gulfstream case?
-        :return:
+        Hashes the code computing analytical solutions, i.e. the sources of the test functions and, for cartesian points,
+        of the geodetic conversion and its engine, such that cached entries are invalidated once the code changes
+        :param cartesian: are the points in 3D cartesian coordinates?
+        :return: hash
         """
-        np_points = vtk_np.vtk_to_numpy(self.input_points.GetData())
-        mesh_points_tgt = np_points
-        ana_point_data_tgt = Evaluator.FUNCTIONS[fun_name](np_points)
-
-        map_point_data = None
-        map_point_area = None
-        map_point_mask = None
-        map_point_frac = None
-        if self.input_point_data:
-            for i in range(self.input_point_data.GetNumberOfArrays()):
-                array = self.input_point_data.GetArray(i)
-                if array.GetName() == "eval":
-                    map_point_data = vtk_np.vtk_to_numpy(array)
-                if array.GetName() == "area":
-                    map_point_area = vtk_np.vtk_to_numpy(array)
-                if array.GetName() == "mask":
-                    map_point_mask = vtk_np.vtk_to_numpy(array)
-                if array.GetName() == "frac":
-                    map_point_frac = vtk_np.vtk_to_numpy(array)
+        if not cartesian: return make_key(Evaluator.ANALYTIC_CACHE_VERSION, source_hash(evf))
+        return make_key(Evaluator.ANALYTIC_CACHE_VERSION, source_hash(evf, geod, conv), geod.numpy_engine())
 
-        if map_point_data is None or map_point_area is None or map_point_mask is None or map_point_frac is None:
-            print("No eval/area/mask data in mapped VTK file")
+    @staticmethod
+    def analytic_key(points_hash, code_hash, fun_name):
+        """
+        Creates the cache key of an analytical solution
+        :param points_hash: hash of the evaluation points, see array_hash
+        :param code_hash: hash of the code computing the solution, see analytic_code_hash
+        :param fun_name: test function name
+        :return: cache key
+        """
+        return make_key("analytic", points_hash, code_hash, fun_name)
+
+    @staticmethod
+    def evaluate_points(points, fun_names, cartesian:bool=False, use_cache:bool=False, geodesic=None):
+        """
+        Evaluates points chunk-wise for several test functions, which share their trigonometric terms. Optionally, analytical solutions
+        are memoized in an on-disk cache keyed by the points and the function, entries are memory-mapped on load and
+        least recently used entries are evicted once the cache exceeds its size limit.
+        :param points: points in 2D geodesic or, if cartesian is set, 3D cartesian coordinates
+        :param fun_names: test function names
+        :param cartesian: are the points in 3D cartesian coordinates?
+        :param use_cache: should the on-disk cache of analytical solutions be used?
+        :param geodesic: optional geodesic coordinates of the points, otherwise converted from points if needed
+        :return: dict of function values by function name
+        """
+        evaluations = dict()
+        if use_cache:
+            cache = DiskCache(Evaluator.ANALYTIC_CACHE)
+            points_hash = array_hash(points)
+            code_hash = Evaluator.analytic_code_hash(cartesian)
+            keys = {fun_name: Evaluator.analytic_key(points_hash, code_hash, fun_name) for fun_name in fun_names}
+            for fun_name, key in keys.items():
+                entry = cache.load(key)
+                # partially written entries count as misses
+                values = entry.get("values") if entry is not None else None
+                if values is not None: evaluations[fun_name] = values
+
+        missing = [fun_name for fun_name in fun_names if fun_name not in evaluations]
+        if len(missing) > 0:
+            if geodesic is None: geodesic = Evaluator.geodesic_points(points, cartesian)
+            values = evaluate_functions(geodesic, [Evaluator.KERNELS[fun_name] for fun_name in missing])
+            for fun_name, fun_values in zip(missing, values):
+                evaluations[fun_name] = fun_values
+                if use_cache: cache.store(keys[fun_name], {"values": fun_values})
+        return {fun_name: evaluations[fun_name] for fun_name in fun_names}
+
+    @staticmethod
+    def function_output_path(path, fun_name):
+        """
+        Gets the output path of one of several evaluated functions, e.g. out.vtk becomes out_vortex.vtk. For store paths,
+        the function is appended to the variant or becomes the variant.
+        :param path: output path
+        :param fun_name: test function name
+        :return: output path of function
+        """
+        if is_store_path(path): return f"{path}_{fun_name}" if split_store_path(path)[2] is not None else f"{path}/{fun_name}"
+        root, ext = os.path.splitext(path)
+        return f"{root}_{fun_name}{ext}"
+
+    def evaluate_functions(self, fun_names, cartesian:bool=False, combined:bool=False):
+        """
+        Evaluates this VTK file for several test functions, the file is only read once. Output paths do not depend on the
+        number of functions, a single function is written into its function_output_path as well.
+        :param fun_names: test function names
+        :param cartesian: is this VTK file in 3D cartesian coordinates? Outputs keep the coordinates of the input.
+        :param combined: should all functions be written into one file as point data "eval_<fun>"? Otherwise, each
+        function is written as point data "eval" into its own file, see function_output_path.
+        :return:
+        """
+        evaluations = Evaluator.evaluate_points(self.points, fun_names, cartesian, self.use_cache)
+        if combined:
+            for fun_name, values in evaluations.items(): self.mesh.point_data[f"eval_{fun_name}"] = values
+            vtkw.write_mesh(self.outfile, self.mesh, self.compact)
             return
+        for fun_name, values in evaluations.items():
+            self.mesh.point_data["eval"] = values
+            vtkw.write_mesh(Evaluator.function_output_path(self.outfile, fun_name), self.mesh, self.compact)
 
-        source_mesh = vtkw.VTKInputFile(source_mesh_file)
-        source_point_area = None
-        source_point_mask = None
-        source_point_frac = None
-        for i in range(source_mesh.input_point_data.GetNumberOfArrays()):
-            array = source_mesh.input_point_data.GetArray(i)
-            if array.GetName() == "area":
-                source_point_area = vtk_np.vtk_to_numpy(array)
-            if array.GetName() == "mask":
-                source_point_mask = vtk_np.vtk_to_numpy(array)
-            if array.GetName() == "frac":
-                source_point_frac = vtk_np.vtk_to_numpy(array)
-        if source_point_area is None or source_point_mask is None or source_point_frac is None:
-            print("No area/mask data in source VTK file")
+    def evaluate(self, fun_name, cartesian:bool=False):
+        """
+        Evaluates this VTK file for the given test function and writes result to file
+        :param fun_name: test function name
+        :param cartesian: is this VTK file in 3D cartesian coordinates? The output keeps the coordinates of the input.
+        :return:
+        """
+        Evaluator.evaluate_mesh(self.mesh, fun_name, cartesian, self.use_cache)
+        vtkw.write_mesh(self.outfile, self.mesh, self.compact)
 
-        np_points = vtk_np.vtk_to_numpy(source_mesh.input_points.GetData())
-        ana_points_data_src = Evaluator.FUNCTIONS[fun_name](np_points)
-        mesh_points_src = np_points
+    @staticmethod
+    def compute_metrics(fun_name, points_tgt, map_data, map_weights, points_src, src_weights, use_gulfstream_filter=False, cart_points_tgt=None,
+                        ana_tgt=None, ana_src=None):
+        """
+        Computes error metrics of mapped data with respect to the analytical solution
+        :param fun_name: Used function name
+        :param points_tgt: target mesh points
+        :param map_data: mapped data on target mesh
+        :param map_weights: integration weights of target mesh (area * frac)
+        :param points_src: source mesh points
+        :param src_weights: integration weights of source mesh (area * frac)
+        :param use_gulfstream_filter: should we apply special filtering for the gulfstream case?
+        :param cart_points_tgt: optional target mesh points in 3D cartesian coordinates, otherwise converted from points_tgt if needed
+        :param ana_tgt: optional analytical solution at the target mesh points, otherwise evaluated at points_tgt
+        :param ana_src: optional analytical solution at the source mesh points, otherwise evaluated at points_src
+        :return: tuple of (metrics, misfit per target point)
+        """
+        ana_point_data_tgt = ana_tgt if ana_tgt is not None else Evaluator.FUNCTIONS[fun_name](points_tgt)
+        ana_points_data_src = ana_src if ana_src is not None else Evaluator.FUNCTIONS[fun_name](points_src)
 
         offset = 1e-20
-        misfit = np.zeros_like(map_point_data)
+        misfit = np.zeros_like(map_data)
         non_zero_mask = np.logical_not(np.isclose(ana_point_data_tgt, 0, atol=1e-3))
-        #misfit = (np.abs((map_point_data + offset) - (ana_point_data_tgt + offset)) / np.abs(ana_point_data_tgt + offset)) - offset
-        misfit[non_zero_mask] = np.abs(map_point_data[non_zero_mask] - ana_point_data_tgt[non_zero_mask]) / np.abs(ana_point_data_tgt[non_zero_mask])
+        #misfit = (np.abs((map_data + offset) - (ana_point_data_tgt + offset)) / np.abs(ana_point_data_tgt + offset)) - offset
+        misfit[non_zero_mask] = np.abs(map_data[non_zero_mask] - ana_point_data_tgt[non_zero_mask]) / np.abs(ana_point_data_tgt[non_zero_mask])
 
         if use_gulfstream_filter:
             gulfstream_weight = np.ones_like(misfit)
-            points_3d = conv.Converter.convert_data(conv.Converter.Mode2DTO3D(), mesh_points_tgt[:, 0:2], mesh_points_tgt.shape[0])
+            points_3d = cart_points_tgt
+            if points_3d is None: points_3d = conv.Converter.convert_data(conv.Converter.Mode2DTO3D(), points_tgt[:, 0:2], points_tgt.shape[0])
             last_pos = points_3d[-1]
             dist_to_center = np.linalg.norm(points_3d - last_pos, axis=1) # dist to filter center
             max_dist = 2.5e+6
@@ -115,12 +220,12 @@ class Evaluator(vtkw.VTKInputFile):
         mean_misfit = np.mean(misfit)
         max_misfit = np.max(misfit)
         rms_misfit = np.sqrt(np.mean(misfit * misfit))
-        l_min = (np.min(ana_point_data_tgt) - np.min(map_point_data)) / np.max(np.abs(ana_point_data_tgt))
-        l_max = (np.max(map_point_data) - np.max(ana_point_data_tgt)) / np.max(np.abs(ana_point_data_tgt))
+        l_min = (np.min(ana_point_data_tgt) - np.min(map_data)) / np.max(np.abs(ana_point_data_tgt))
+        l_max = (np.max(map_data) - np.max(ana_point_data_tgt)) / np.max(np.abs(ana_point_data_tgt))
 
-        int_map = Evaluator.integrate_2d(mesh_points_tgt, map_point_data, map_point_area * map_point_frac)
-        int_ana_src = Evaluator.integrate_2d(mesh_points_src, ana_points_data_src, source_point_area * source_point_frac)
-        int_ana_tgt = Evaluator.integrate_2d(mesh_points_tgt, ana_point_data_tgt, map_point_area * map_point_frac)
+        int_map = Evaluator.integrate_2d(points_tgt, map_data, map_weights)
+        int_ana_src = Evaluator.integrate_2d(points_src, ana_points_data_src, src_weights)
+        int_ana_tgt = Evaluator.integrate_2d(points_tgt, ana_point_data_tgt, map_weights)
         glob_cons_src = np.abs(int_map - int_ana_src) / np.abs(int_ana_src)
         glob_cons_tgt = np.abs(int_map - int_ana_tgt) / np.abs(int_ana_tgt)
 
@@ -133,11 +238,108 @@ class Evaluator(vtkw.VTKInputFile):
             "glob_cons_src": glob_cons_src,
             "glob_cons_tgt": glob_cons_tgt
         }
+        return metrics, misfit
+
+    def evaluate_diff(self, source_mesh_file, fun_name, out_vtk, use_gulfstream_filter=False, cartesian:bool=False):
+        """
+        Evaluates the error of this VTK file with respect to another source mesh file after mapping.
+        Results and errors are written to files. In compact float32 mode, metrics are computed in float64 and
+        additionally from float32 inputs to report their deviation.
+        :param source_mesh_file: Respective source mesh file
+        :param fun_name: Used function name
+        :param out_vtk: output VTK file path
+        :param use_gulfstream_filter: should we apply special filtering for the gulfstream case?
+        :param cartesian: are this and the source VTK file in 3D cartesian coordinates? The error output keeps the coordinates of this file.
+        :return:
+        """
+        mesh_points_tgt = Evaluator.geodesic_points(self.points, cartesian)
+        map_point_data = self.point_data.get("eval")
+        map_point_area = self.point_data.get("area")
+        map_point_mask = self.point_data.get("mask")
+        map_point_frac = self.point_data.get("frac")
+
+        if map_point_data is None or map_point_area is None or map_point_mask is None or map_point_frac is None:
+            print("No eval/area/mask data in mapped VTK file")
+            return
+
+        source_mesh = vtkw.VTKInputFile(source_mesh_file)
+        source_point_area = source_mesh.point_data.get("area")
+        source_point_mask = source_mesh.point_data.get("mask")
+        source_point_frac = source_mesh.point_data.get("frac")
+        if source_point_area is None or source_point_mask is None or source_point_frac is None:
+            print("No area/mask data in source VTK file")
+
+        mesh_points_src = Evaluator.geodesic_points(source_mesh.points, cartesian)
+        cart_points_tgt = self.points if cartesian else None
+        metric_inputs = (mesh_points_tgt, map_point_data, map_point_area * map_point_frac, mesh_points_src, source_point_area * source_point_frac)
+        if self.compact is not None and self.compact.use_float32:
+            compact_metrics, _ = Evaluator.compute_metrics(fun_name, *[np.array(a, dtype=np.float32) for a in metric_inputs], use_gulfstream_filter, cart_points_tgt)
+            metric_inputs = [np.asarray(a, dtype=np.float64) for a in metric_inputs]
+        ana_tgt = Evaluator.evaluate_points(self.points, [fun_name], cartesian, self.use_cache, mesh_points_tgt)[fun_name]
+        ana_src = Evaluator.evaluate_points(source_mesh.points, [fun_name], cartesian, self.use_cache, mesh_points_src)[fun_name]
+        metrics, misfit = Evaluator.compute_metrics(fun_name, *metric_inputs, use_gulfstream_filter, cart_points_tgt, ana_tgt, ana_src)
+        if self.compact is not None and self.compact.use_float32:
+            for name, value in metrics.items(): self.compact.record(name, value, compact_metrics[name])
 
         with open(self.outfile, 'w') as file:
             json.dump(metrics, file, indent=4)
 
-        misfit_point_data = vtk_np.numpy_to_vtk(misfit, deep=True)
-        misfit_point_data.SetName("error")
-        self.input_point_data.AddArray(misfit_point_data)
-        vtkw.VTKOutputFile(out_vtk, self.input_grid).write()
+        self.mesh.point_data["error"] = misfit
+        vtkw.write_mesh(out_vtk, self.mesh, self.compact)
+
+    @staticmethod
+    def evaluate_diff_batch(jobs, table_path, cartesian:bool=False, use_cache:bool=False):
+        """
+        Evaluates the errors of many mapped VTK files in one process, see evaluate_diff. Source meshes, their integration
+        weights and analytical solutions are kept in memory across jobs. Metrics of all jobs are written into one CSV table.
+        :param jobs: list of (mapped VTK file, source VTK file, function name, output VTK file of errors or None)
+        :param table_path: output CSV file path, one row per job
+        :param cartesian: are all VTK files in 3D cartesian coordinates? Error outputs keep the coordinates.
+        :param use_cache: should the on-disk cache of analytical solutions be used?
+        :return: list of metrics per job
+        """
+        source_functions = dict()
+        for _, source_file, fun_name, out_vtk in jobs:
+            if fun_name not in Evaluator.FUNCTIONS: raise ValueError(f"Unknown function {fun_name}")
+            source_functions.setdefault(source_file, []).append(fun_name)
+            if out_vtk is not None and os.path.dirname(out_vtk) != "": os.makedirs(os.path.dirname(out_vtk), exist_ok=True)
+
+        # geodesic points, integration weights and analytical solutions by function of each source file
+        sources = dict()
+        results = []
+        start = time.perf_counter()
+        for mapped_file, source_file, fun_name, out_vtk in jobs:
+            job_start = time.perf_counter()
+            if source_file not in sources:
+                source_mesh = vtkw.VTKInputFile(source_file)
+                source_area, source_frac = source_mesh.point_data.get("area"), source_mesh.point_data.get("frac")
+                if source_area is None or source_frac is None: raise ValueError(f"No area/frac data in source VTK file {source_file}")
+                source_points = Evaluator.geodesic_points(source_mesh.points, cartesian)
+                source_solutions = Evaluator.evaluate_points(source_mesh.points, list(dict.fromkeys(source_functions[source_file])), cartesian, use_cache,
+                                                             source_points)
+                sources[source_file] = (source_points, source_area * source_frac, source_solutions)
+            source_points, source_weights, source_solutions = sources[source_file]
+
+            mapped = vtkw.VTKInputFile(mapped_file)
+            map_data, map_area, map_frac = (mapped.point_data.get(name) for name in ("eval", "area", "frac"))
+            if map_data is None or map_area is None or map_frac is None: raise ValueError(f"No eval/area/frac data in mapped VTK file {mapped_file}")
+            mapped_points = Evaluator.geodesic_points(mapped.points, cartesian)
+            ana_tgt = Evaluator.evaluate_points(mapped.points, [fun_name], cartesian, use_cache, mapped_points)[fun_name]
+            metrics, misfit = Evaluator.compute_metrics(fun_name, mapped_points, map_data, map_area * map_frac,
+                                                        source_points, source_weights, fun_name == "gulfstream",
+                                                        mapped.points if cartesian else None, ana_tgt, source_solutions[fun_name])
+            if out_vtk is not None:
+                mapped.mesh.point_data["error"] = misfit
+                vtkw.write_mesh(out_vtk, mapped.mesh)
+            results.append(metrics)
+            print(f"{mapped_file} ({fun_name}): {time.perf_counter() - job_start:.3f} s")
+
+        if os.path.dirname(table_path) != "": os.makedirs(os.path.dirname(table_path), exist_ok=True)
+        with open(table_path, "w", newline="") as file:
+            writer = csv.writer(file)
+            metric_names = list(results[0].keys()) if len(results) > 0 else []
+            writer.writerow(["mapped", "source", "function"] + metric_names)
+            for (mapped_file, source_file, fun_name, _), metrics in zip(jobs, results):
+                writer.writerow([mapped_file, source_file, fun_name] + [float(metrics[name]) for name in metric_names])
+        print(f"Computed metrics of {len(jobs)} files with {len(sources)} source meshes in {time.perf_counter() - start:.3f} s")
+        return results
@@ -1,12 +1,14 @@
 from typing import Union
 
 import envt.vtk_util.vtk_wrapper as vtkw
+from envt.mesh_util.mesh import Mesh
 import envt.nc_util.nc_wrapper as ncw
 from envt.tools.nc2vtk import NC2VTK
 from envt.tools.convert import Converter as cv
-from envt.tools.triangulation import triangulate_polygon as triangulate, triangulate_convex_shape, check_order, check_distances, compute_tri_area, compute_plane_basis, project_onto_plane
+from envt.tools.dedup import deduplicate_points
+from envt.tools.incidence import PointCellIncidence
+from envt.tools.triangulation import triangulate_polygons, triangulate_convex_shape, check_order, check_distances, compute_tri_areas, compute_plane_basis, project_onto_plane
 import numpy as np
-import vtkmodules.util.numpy_support as vtk_np
 from collections import defaultdict
 from scipy.spatial import KDTree
 from shapely.geometry import Polygon
@@ -18,24 +20,22 @@ class Filter:
     and attaches connectivity information for center based mesh if needed.
     """
 
-    def __init__(self, input_file, var:ncw.NCVars, nc_file_path, frac_file, frac_var:Union[ncw.NCVars, None]):
+    def __init__(self, input_file, var:ncw.NCVars, nc_file_path, frac_file, frac_var:Union[ncw.NCVars, None], use_cache:bool=True, memory_budget=None, compact:vtkw.CompactMode=None):
         self.vtk_file = vtkw.VTKInputFile(input_file)
         """Mask VTK file"""
         self.nc_input = ncw.NCFile(nc_file_path)
         """NC File Original Data"""
-        self.clo = self.nc_input.var_clo_data(var)
-        """ Corner data mask full longitude"""
-        self.cla = self.nc_input.var_cla_data(var)
-        """ Corner data mask full latitude"""
-        msk_lon, msk_lat, msk_entries, msk_corner_indices = NC2VTK.process_corner_data(self.clo, self.cla)
+        msk_lon, msk_lat, msk_entries, msk_corner_indices = NC2VTK.read_corner_data(self.nc_input, var, use_cache, memory_budget)
         self.msk_lon = msk_lon
         """ Unique corner data longitude"""
         self.msk_lat = msk_lat
         """ Unique corner data latitude"""
         self.msk_num_entries = msk_entries
         """ Number of unique corner points"""
-        self.msk_corner_indices = msk_corner_indices
+        self.msk_corner_indices = msk_corner_indices if compact is None else compact.indices(msk_corner_indices)
         """ Mapping of cells to unique corner points based on indices"""
+        self.compact = compact
+        """ Optional compact mesh representation"""
 
         self.lon = self.nc_input.var_lon_data(var).flatten()
         """ Center data longitude"""
@@ -46,7 +46,7 @@ class Filter:
         self.frac_data = None
         """ Data for computing fractions """
         if frac_file is not None and frac_var is not None:
-            self.frac_data = Filter(frac_file, frac_var, nc_file_path, None, None)
+            self.frac_data = Filter(frac_file, frac_var, nc_file_path, None, None, use_cache, memory_budget, compact)
 
     def check_center(self, cell_neighbours, cell_idx_i, points):
         """
@@ -154,13 +154,7 @@ class Filter:
         N, M = corner_indices.shape  # N = corners per cell, M = number of cells
 
         # Step 1: Create a point-to-cells mapping
-        point_to_cells = defaultdict(set)
-        for cell_idx in range(M):
-            # ignore cell if it has less than 3 corners
-            #if len(np.unique(corner_indices[:, cell_idx])) < 3: continue
-
-            for point_idx in corner_indices[:, cell_idx]:
-                point_to_cells[point_idx].add(cell_idx)
+        point_to_cells = PointCellIncidence(corner_indices).point_sets()
 
         # Step 2: Compute connectivity by checking shared points
         cell_connections = defaultdict(set)
@@ -168,7 +162,7 @@ class Filter:
             #if len(np.unique(corner_indices[:, cell_idx])) < 3: continue
             # Get all other cells that share at least one point with the current cell
             connected_cells = set()
-            for point_idx in corner_indices[:, cell_idx]:
+            for point_idx in corner_indices[:, cell_idx].tolist():
                 connected_cells.update(point_to_cells[point_idx])
 
             # Remove self from connections
@@ -178,12 +172,7 @@ class Filter:
         return cell_connections
 
     def gather_cell_mask(self):
-        np_mask_data = None
-        for i in range(self.vtk_file.input_point_data.GetNumberOfArrays()):
-            array = self.vtk_file.input_point_data.GetArray(i)
-            if array.GetName() == "mask":
-                np_mask_data = vtk_np.vtk_to_numpy(array)
-                break
+        np_mask_data = self.vtk_file.point_data.get("mask")
         if np_mask_data is None:
             print("WARNING: No mask data available")
             return None
@@ -279,52 +268,36 @@ class Filter:
         # load center points and apply filter
         np_points = cv.convert_data_arrays(cv.Mode2DTO3D(), self.lon, self.lat, np.zeros((len(self.lon),)))
         np_points = np_points[valid_points]
-        np_points = np.round(np_points, decimals=5)
-        np_points, unique_points = np.unique(np_points, return_index=True, axis=0)
+        np_points, unique_points, _ = deduplicate_points(np_points, decimals=5)
         self.lon = self.lon[valid_points][unique_points]
         self.lat = self.lat[valid_points][unique_points]
 
         # compute cell sizes for integral quantities
         np_msk_points = cv.convert_data_arrays(cv.Mode2DTO3D(), self.msk_lon, self.msk_lat, np.zeros(len(self.msk_lon),))
         np_cell_sizes = np.zeros_like(np_cell_mask)
-        for i in range(np_cell_mask.shape[0]):
-            if not valid_points[i]: continue
-            indices = self.msk_corner_indices[:, i]
-            indices = np.unique(indices)
-            if len(indices) < 3: continue
+        valid_cell_ids = np.flatnonzero(valid_points)
+        tri_indices, tri_cells = triangulate_polygons(np_msk_points, self.msk_corner_indices[:, valid_cell_ids])
+        tri_areas = compute_tri_areas(np_msk_points[tri_indices])
+        np_cell_sizes[valid_cell_ids] = np.bincount(tri_cells, weights=tri_areas, minlength=len(valid_cell_ids))
 
-            points = np_msk_points[indices]
-            tri_points, tri_indices = triangulate(points, indices)
-
-            for idx_tri in range(tri_indices.shape[0]): np_cell_sizes[i] += compute_tri_area(tri_points[idx_tri])
-
-        point_data_integral = vtk_np.numpy_to_vtk(np_cell_sizes[valid_points][unique_points], deep=True)
-        point_data_integral.SetName("area")
-        if override_out_mask is None: point_data_msk = vtk_np.numpy_to_vtk(np_cell_mask[valid_points][unique_points], deep=True)
-        else: point_data_msk = vtk_np.numpy_to_vtk(override_out_mask[valid_points][unique_points], deep=True)
-        point_data_msk.SetName("mask")
+        out_mesh = Mesh(np_points)
+        out_mesh.point_data["area"] = np_cell_sizes[valid_points][unique_points]
+        if override_out_mask is None: out_mesh.point_data["mask"] = np_cell_mask[valid_points][unique_points]
+        else: out_mesh.point_data["mask"] = override_out_mask[valid_points][unique_points]
 
         # compute new cells based on centers
         if create_conn:
             cell_connections = self.compute_cell_connectivity(valid_points, unique_points)
             tris = self.compute_cell_center_tris_alt2(cell_connections, np_points)
 
-            vtk_cells = vtkw.vtkCellArray()
-            for tri in tris:
-                i, j, k = tri
-                vtk_tri = vtkw.vtkTriangle()
-                vtk_tri.GetPointIds().SetId(0, i)
-                vtk_tri.GetPointIds().SetId(1, j)
-                vtk_tri.GetPointIds().SetId(2, k)
-                vtk_cells.InsertNextCell(vtk_tri)
+            out_mesh = Mesh.from_cells(np_points, np.array(list(tris), dtype=np.int64).reshape((-1, 3)), point_data=out_mesh.point_data)
 
         # compute fractions
         if self.frac_data is not None:
             frac_mask = self.frac_data.gather_cell_mask()
             frac_valid_points = Filter.get_valid_cells(denotes_water, threshold, frac_mask)
             frac_points = cv.convert_data_arrays(cv.Mode2DTO3D(), self.frac_data.lon, self.frac_data.lat, np.zeros((len(self.frac_data.lon),)))
-            frac_points = np.round(frac_points[frac_valid_points], decimals=5)
-            frac_points, frac_unique_points = np.unique(frac_points, return_index=True, axis=0)
+            frac_points, frac_unique_points, _ = deduplicate_points(frac_points[frac_valid_points], decimals=5)
             self.frac_data.lon = self.frac_data.lon[frac_valid_points][frac_unique_points]
             self.frac_data.lat = self.frac_data.lat[frac_valid_points][frac_unique_points]
             frac_msk_points = cv.convert_data_arrays(cv.Mode2DTO3D(), self.frac_data.msk_lon, self.frac_data.msk_lat, np.zeros(len(self.frac_data.msk_lon), ))
@@ -337,18 +310,9 @@ class Filter:
                                                  np_points,
                                                  self.msk_corner_indices[:, valid_points][:, unique_points],
                                                  np_cell_sizes[valid_points][unique_points])
-            point_data_frac = vtk_np.numpy_to_vtk(fractions, deep=True)
-            point_data_frac.SetName("frac")
-
-        out_grid = vtkw.vtkUnstructuredGrid()
-        out_points = vtkw.vtkPoints()
-        out_points.SetData(vtk_np.numpy_to_vtk(np_points))
-        out_grid.SetPoints(out_points)
-        if create_conn: out_grid.SetCells(vtkw.VTK_TRIANGLE, vtk_cells)
-        out_grid.GetPointData().AddArray(point_data_integral)
-        out_grid.GetPointData().AddArray(point_data_msk)
-        if self.frac_data is not None: out_grid.GetPointData().AddArray(point_data_frac)
-        vtkw.VTKOutputFile(output_file, out_grid).write()
+            out_mesh.point_data["frac"] = fractions
+
+        vtkw.write_mesh(output_file, out_mesh, self.compact)
 
     def apply_corner(self, output_file, threshold=0.001, denotes_water=False, create_conn=False):
         # load mask data
@@ -360,6 +324,9 @@ class Filter:
         mask = np.ones_like(valid_cells)
         mask[valid_cells] = 0
 
-        lon, lat, num_entries, corner_indices = NC2VTK.process_corner_data(self.clo, self.cla, mask, True)
-        grid = NC2VTK.generate_corner_u_grid(lon, lat, num_entries, corner_indices, self.var, mask, True, True)
-        vtkw.VTKOutputFile(output_file, grid).write()
+        clo = self.nc_input.var_clo_data(self.var)
+        cla = self.nc_input.var_cla_data(self.var)
+        lon, lat, num_entries, corner_indices = NC2VTK.process_corner_data(clo, cla, mask, True)
+        if self.compact is not None: corner_indices = self.compact.indices(corner_indices)
+        mesh = NC2VTK.generate_corner_mesh(lon, lat, num_entries, corner_indices, self.var, mask, True, True)
+        vtkw.write_mesh(output_file, mesh, self.compact)
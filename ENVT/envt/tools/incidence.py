@@ -0,0 +1,58 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+class PointCellIncidence:
+    """
+    Sparse point-to-cell incidence of a cell based mesh. Each cell is counted once per point,
+    even if the point appears multiple times in the corners of the cell.
+    """
+    def __init__(self, corner_indices, num_points=None):
+        num_corners, num_cells = corner_indices.shape
+        if num_points is None: num_points = int(corner_indices.max()) + 1 if corner_indices.size > 0 else 0
+        cell_ids = np.tile(np.arange(num_cells), num_corners)
+        data = np.ones((corner_indices.size,))
+        matrix = csr_matrix((data, (corner_indices.ravel(), cell_ids)), shape=(num_points, num_cells))
+        matrix.sum_duplicates()
+        matrix.data[:] = 1.0
+        self.matrix = matrix
+        """Binary CSR matrix of shape (points, cells)"""
+        self.cells_per_point = np.diff(matrix.indptr)
+        """Number of distinct cells sharing each point"""
+        self.points_per_cell = np.bincount(matrix.indices, minlength=num_cells)
+        """Number of distinct points of each cell"""
+
+    def cells_of_point(self, point_idx):
+        """
+        Gets all cells sharing a point
+        :param point_idx: point index
+        :return: sorted cell indices
+        """
+        return self.matrix.indices[self.matrix.indptr[point_idx]:self.matrix.indptr[point_idx + 1]]
+
+    def point_sets(self):
+        """
+        Gets the cells of all points as python sets, cells are inserted in ascending order
+        :return: list of cell index sets, one per point
+        """
+        indptr = self.matrix.indptr
+        indices = self.matrix.indices.tolist()
+        return [set(indices[indptr[i]:indptr[i + 1]]) for i in range(len(indptr) - 1)]
+
+    def points_touched_by(self, cell_selection):
+        """
+        Determines which points belong to at least one of the selected cells
+        :param cell_selection: boolean array over all cells
+        :return: boolean array over all points
+        """
+        return (self.matrix @ cell_selection.astype(np.float64)) > 0
+
+    def point_mean(self, cell_values):
+        """
+        Computes the mean of cell values over all cells sharing a point with one sparse mat-vec
+        :param cell_values: one value per cell
+        :return: one mean per point, NaN for points without cells
+        """
+        sums = self.matrix @ np.asarray(cell_values, dtype=np.float64)
+        means = np.full(sums.shape, np.nan)
+        np.divide(sums, self.cells_per_point, out=means, where=self.cells_per_point > 0)
+        return means
@@ -0,0 +1,20 @@
+import shlex
+
+def read_manifest(path, min_columns, max_columns):
+    """
+    Reads a manifest of batch jobs. Each line holds one job as whitespace separated columns, quoting as in shells is
+    supported and # starts a comment. Missing optional columns are None.
+    :param path: manifest file path
+    :param min_columns: number of required columns
+    :param max_columns: maximum number of columns
+    :return: list of jobs, each a list of max_columns entries
+    """
+    jobs = []
+    with open(path, "r") as file:
+        for line_number, line in enumerate(file, 1):
+            entry = shlex.split(line, comments=True)
+            if len(entry) == 0: continue
+            if not min_columns <= len(entry) <= max_columns:
+                raise ValueError(f"Invalid manifest line {line_number} in {path}, expected {min_columns} to {max_columns} columns")
+            jobs.append(entry + [None] * (max_columns - len(entry)))
+    return jobs
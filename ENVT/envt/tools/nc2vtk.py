@@ -1,19 +1,40 @@
-from collections import defaultdict
-
 import envt.nc_util.nc_wrapper as ncw
+from envt.cache_util.disk_cache import DiskCache, make_key, file_hash
 import envt.vtk_util.vtk_wrapper as vtkw
-from envt.tools.convert import Converter as cv
-from envt.tools.triangulation import triangulate_polygon as triangulate, compute_plane_basis, compute_normal, sort_counterclockwise
+from envt.mesh_util.mesh import Mesh, TRIANGLE, POLYGON
+from envt.tools.convert import Converter as cv, THREADS_ENV as CONVERSION_THREADS_ENV
+from envt.tools.dedup import deduplicate_points, quantize_points, unique_rows
+from envt.tools.incidence import PointCellIncidence
+from envt.tools.triangulation import triangulate_polygon as triangulate, triangulate_polygons, sort_polygons_counterclockwise
 import numpy as np
-import vtkmodules.util.numpy_support as vtk_np
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
 class NC2VTK:
     """Converts NC file data into VTK file format using unstructured arrays"""
-    def __init__(self, nc_file_path, msk_file_path):
+
+    CORNER_DECIMALS = 8
+    """Number of decimals corner coordinates are rounded to before determining unique points"""
+    CHUNK_BYTES_PER_CORNER = 128
+    """Estimated peak bytes per cell corner while processing a chunk of corner data"""
+    MERGE_BYTES_PER_KEY = 96
+    """Estimated peak bytes per point key of a merge window"""
+
+    def __init__(self, nc_file_path, msk_file_path, use_cache:bool=True, memory_budget=None, jobs:int=1, compact:vtkw.CompactMode=None):
         self.nc_input = ncw.NCFile(nc_file_path)
         """NC input data"""
         self.msk_input = ncw.NCFile(msk_file_path) if msk_file_path is not None else None
         """Mask input data"""
+        self.use_cache = use_cache
+        """Should processed corner data be read through the topology cache?"""
+        self.memory_budget = memory_budget
+        """Memory budget in bytes for out-of-core corner processing, None processes all corners at once"""
+        self.jobs = jobs
+        """Number of worker processes for corner based meshes"""
+        self.compact = compact
+        """Optional compact mesh representation"""
 
     def nc2vtk(self, var:ncw.NCVars, output_path, use_filter:bool, use_corner:bool, use_torc_fix:bool=True, use_triangulate:bool=True):
         """
@@ -26,15 +47,27 @@ class NC2VTK:
         :param use_triangulate: enables mesh triangulation
         :return:
         """
-        grid = self._nc2vtk_corner(var, use_filter, use_torc_fix, use_triangulate) if use_corner else self._nc2vtk_center(var, use_filter)
-        vtkw.VTKOutputFile(output_path, grid).write()
+        mesh = self.create_mesh(var, use_filter, use_corner, use_torc_fix, use_triangulate)
+        vtkw.write_mesh(output_path, mesh, self.compact)
+
+    def create_mesh(self, var:ncw.NCVars, use_filter:bool, use_corner:bool, use_torc_fix:bool=True, use_triangulate:bool=True):
+        """
+        Converts NC data into an in-memory mesh, same as nc2vtk without writing a file
+        :param var: active variable
+        :param use_filter: should we already filter out points? (only possible for SEA meshes)
+        :param use_corner: should the target mesh use corner data? (alternative is center)
+        :param use_torc_fix: do we want to apply the empirical torc mesh fix
+        :param use_triangulate: enables mesh triangulation
+        :return: Mesh
+        """
+        return self._nc2vtk_corner(var, use_filter, use_torc_fix, use_triangulate) if use_corner else self._nc2vtk_center(var, use_filter)
 
     def _nc2vtk_center(self, var:ncw.NCVars, use_filter:bool):
         """
         Extracts center based mesh
         :param var: active variable
         :param use_filter: should we already filter out points? (only possible for SEA meshes)
-        :return:
+        :return: Mesh
         """
         lon = self.nc_input.var_lon_data(var).flatten()
         lat = self.nc_input.var_lat_data(var).flatten()
@@ -44,19 +77,10 @@ class NC2VTK:
             lat = lat[msk == 0]
 
         cart_points = cv.convert_data_arrays(cv.Mode2DTO3D(), lon, lat, np.zeros((len(lon),)))
-        cart_points_data_array = vtk_np.numpy_to_vtk(cart_points, deep=True)
-
-        vtk_points = vtkw.vtkPoints()
-        vtk_points.SetData(cart_points_data_array)
-        unstructured_grid = vtkw.vtkUnstructuredGrid()
-        unstructured_grid.SetPoints(vtk_points)
-
-        if msk is not None:
-            vtk_point_data = vtk_np.numpy_to_vtk(np.ones_like(lon) if use_filter else msk, deep=True)
-            vtk_point_data.SetName("mask")
-            unstructured_grid.GetPointData().AddArray(vtk_point_data)
 
-        return unstructured_grid
+        mesh = Mesh(cart_points)
+        if msk is not None: mesh.point_data["mask"] = np.ones_like(lon) if use_filter else msk
+        return mesh
 
     @staticmethod
     def process_corner_data(clo, cla, msk=None, use_filter=False):
@@ -69,147 +93,294 @@ class NC2VTK:
         :return: tuple of (lon, lat, num_entries, corner_indices)
         """
         dims = clo.shape[0]
-        clo = np.array([clo[i, :, :].flatten() for i in range(dims)])
-        cla = np.array([cla[i, :, :].flatten() for i in range(dims)])
-        clo_cla_points = np.array([np.column_stack((clo[i, :], cla[i, :])) for i in range(dims)])
-        if use_filter and msk is not None: clo_cla_points = clo_cla_points[:, msk == 0, :]
-        clo_cla_points[np.isclose(clo_cla_points, 0)] = 0.0
-        clo_cla_points = np.round(clo_cla_points, decimals=8)
-        unique_points = np.unique(clo_cla_points.reshape((-1, 2)), axis=0)
+        clo = np.asarray(clo).reshape((dims, -1))
+        cla = np.asarray(cla).reshape((dims, -1))
+        unique_points, corner_indices = NC2VTK.process_corner_chunk(clo, cla, msk if use_filter else None)
 
         lon = unique_points[:, 0]
         lat = unique_points[:, 1]
-        num_entries = clo_cla_points.shape[1]
-        coord_2_unique_idx = {tuple(point): idx for idx, point in enumerate(unique_points)}
+        return lon, lat, corner_indices.shape[1], corner_indices
+
+    @staticmethod
+    def process_corner_chunk(clo, cla, msk=None):
+        """
+        Snaps and deduplicates the corner data of a chunk of cells, same as process_corner_data
+        :param clo: clo chunk of shape (corners, cells)
+        :param cla: cla chunk of shape (corners, cells)
+        :param msk: mask of the chunk cells, if provided only cells with mask 0 are kept
+        :return: tuple of (unique points of the chunk, chunk local corner indices)
+        """
+        clo_cla_points = np.stack((clo, cla), axis=-1)
+        if msk is not None: clo_cla_points = clo_cla_points[:, msk == 0, :]
+        clo_cla_points[np.isclose(clo_cla_points, 0)] = 0.0
+        unique_points, _, inverse = deduplicate_points(clo_cla_points.reshape((-1, 2)), decimals=NC2VTK.CORNER_DECIMALS)
+        return unique_points, inverse.reshape((clo.shape[0], clo_cla_points.shape[1]))
+
+    @staticmethod
+    def merge_corner_chunks(chunk_keys, mappings, window):
+        """
+        Merges the sorted unique point keys of many chunks into one global numbering by a k-way merge. Each round reads
+        a window of at most window keys per chunk and finalizes all keys up to the smallest last key of the windows which
+        do not reach the end of their chunk, as no later key of any chunk can precede it. The result equals deduplicating
+        all chunks at once.
+        :param chunk_keys: list of sorted unique int64 point keys of shape (N, 2) per chunk, e.g. memory-mapped
+        :param mappings: list of output arrays per chunk, receive the global index of each chunk local point
+        :param window: maximum number of keys per chunk and round
+        :return: sorted unique point keys
+        """
+        positions = [0] * len(chunk_keys)
+        unique_keys = [np.zeros((0, 2), dtype=np.int64)]
+        num_unique = 0
+        while True:
+            windows = [np.asarray(keys[position:position + window]) for keys, position in zip(chunk_keys, positions)]
+            bounds = [tuple(keys[-1]) for keys, position, all_keys in zip(windows, positions, chunk_keys) if position + len(keys) < len(all_keys)]
+            counts = [len(keys) for keys in windows]
+            if len(bounds) > 0:
+                lon_key, lat_key = min(bounds)
+                counts = [int(np.count_nonzero((keys[:, 0] < lon_key) | ((keys[:, 0] == lon_key) & (keys[:, 1] <= lat_key)))) for keys in windows]
+            if sum(counts) == 0: break
+
+            first_indices, inverse = unique_rows(np.concatenate([keys[:count] for keys, count in zip(windows, counts)]))
+            offset = 0
+            for i, count in enumerate(counts):
+                mappings[i][positions[i]:positions[i] + count] = num_unique + inverse[offset:offset + count]
+                positions[i] += count
+                offset += count
+            unique_keys.append(np.concatenate([keys[:count] for keys, count in zip(windows, counts)])[first_indices])
+            num_unique += len(first_indices)
+        return np.concatenate(unique_keys)
+
+    @staticmethod
+    def process_corner_data_chunked(nc_input:ncw.NCFile, var:ncw.NCVars, memory_budget, msk=None, use_filter=False):
+        """
+        Out-of-core variant of process_corner_data. Corner data is read in hyperslabs, each chunk is deduplicated on its own
+        and its sorted unique point keys are spilled to a temporary directory. The keys are then merged by a k-way merge,
+        which reads one window per chunk bounded by the memory budget. Result is identical to process_corner_data.
+        The unique points and the corner indices of the result are always held in memory.
+        :param nc_input: NC input data
+        :param var: active variable
+        :param memory_budget: memory budget of the chunk buffers and merge windows in bytes
+        :param msk: mask data array
+        :param use_filter: should we apply the mask?
+        :return: tuple of (lon, lat, num_entries, corner_indices)
+        """
+        clo_shape = nc_input.variables[f"{var.value}.clo"].shape
+        dims = clo_shape[0]
+        use_msk = use_filter and msk is not None
+        num_entries = int(np.count_nonzero(msk == 0)) if use_msk else int(np.prod(clo_shape[1:]))
+        max_cells = memory_budget // (dims * NC2VTK.CHUNK_BYTES_PER_CORNER)
+
+        # chunk local indices are written into the final buffer and remapped after the merge
+        corner_indices = np.empty((dims, num_entries), dtype=np.intp)
+        chunk_ranges = []
+        entry = 0
+        with tempfile.TemporaryDirectory(prefix="envt-corners-") as tmp_dir:
+            for start, clo, cla in nc_input.var_corner_chunks(var, max_cells):
+                unique_points, chunk_indices = NC2VTK.process_corner_chunk(clo, cla, msk[start:start + clo.shape[1]] if use_msk else None)
+                chunk_entries = chunk_indices.shape[1]
+                corner_indices[:, entry:entry + chunk_entries] = chunk_indices
+                np.save(os.path.join(tmp_dir, f"keys_{len(chunk_ranges)}.npy"), quantize_points(unique_points, NC2VTK.CORNER_DECIMALS))
+                chunk_ranges.append((entry, chunk_entries))
+                entry += chunk_entries
+
+            chunk_keys = [np.load(os.path.join(tmp_dir, f"keys_{i}.npy"), mmap_mode="r") for i in range(len(chunk_ranges))]
+            mappings = [np.lib.format.open_memmap(os.path.join(tmp_dir, f"mapping_{i}.npy"), mode="w+", dtype=np.intp, shape=(len(keys),))
+                        for i, keys in enumerate(chunk_keys)]
+            window = max(1, memory_budget // (max(1, len(chunk_keys)) * NC2VTK.MERGE_BYTES_PER_KEY))
+            unique_keys = NC2VTK.merge_corner_chunks(chunk_keys, mappings, window)
+            for (entry, chunk_entries), mapping in zip(chunk_ranges, mappings):
+                chunk = corner_indices[:, entry:entry + chunk_entries]
+                chunk[...] = np.asarray(mapping)[chunk]
+            del chunk_keys, mappings
+
+        unique_points = unique_keys / 10.0 ** NC2VTK.CORNER_DECIMALS
+        return unique_points[:, 0], unique_points[:, 1], num_entries, corner_indices
 
-        corner_coords = clo_cla_points
-        corner_indices = np.array([[coord_2_unique_idx[tuple(point)] for point in corner_coords[i, :, :]] for i in range(dims)])
+    @staticmethod
+    def read_corner_data(nc_input:ncw.NCFile, var:ncw.NCVars, use_cache:bool=True, memory_budget=None):
+        """
+        Reads and processes the unfiltered corner data of a variable. Results are read through the on-disk topology cache,
+        which is keyed on the NC file content, the variable and the rounding parameters.
+        :param nc_input: NC input data
+        :param var: active variable
+        :param use_cache: should the topology cache be used?
+        :param memory_budget: if set, corner data is processed out-of-core with this budget in bytes
+        :return: tuple of (lon, lat, num_entries, corner_indices)
+        """
+        if use_cache:
+            cache = DiskCache("topology")
+            key = make_key("corner", file_hash(nc_input.path), var.value, NC2VTK.CORNER_DECIMALS)
+            entry = cache.load(key)
+            if entry is not None:
+                return entry["lon"], entry["lat"], entry["corner_indices"].shape[1], entry["corner_indices"]
+
+        if memory_budget is not None: lon, lat, num_entries, corner_indices = NC2VTK.process_corner_data_chunked(nc_input, var, memory_budget)
+        else: lon, lat, num_entries, corner_indices = NC2VTK.process_corner_data(nc_input.var_clo_data(var), nc_input.var_cla_data(var))
+        if use_cache: cache.store(key, {"lon": lon, "lat": lat, "corner_indices": corner_indices})
         return lon, lat, num_entries, corner_indices
 
     @staticmethod
-    def generate_corner_u_grid(lon, lat, num_entries, corner_indices, var, msk, use_filter, create_conn, use_torc_fix:bool=True, use_triangulation:bool=True):
+    def compute_corner_connectivity(cart_points, corner_indices, var, use_torc_fix:bool=True, use_triangulation:bool=True):
+        """
+        Creates the cells of a corner based mesh, the south pole cap of the torc fix is not included
+        :param cart_points: cartesian mesh points
+        :param corner_indices: corner indices of shape (corners per cell, number of cells)
+        :param var: active variable
+        :param use_torc_fix: do we want to apply the empirical torc mesh fix
+        :param use_triangulation: enables mesh triangulation
+        :return: tuple of (cells, offsets, override_zero). Cells are triangle indices of shape (triangles, 3) with offsets None
+                 or polygon connectivity with CSR offsets. override_zero holds the points of removed torc triangles.
+        """
+        override_zero = np.zeros((0,), dtype=corner_indices.dtype)
+        if not use_triangulation:
+            # sort points based on rotation around normal, then setup polygons
+            _, offsets, connectivity = sort_polygons_counterclockwise(cart_points, corner_indices)
+            return connectivity, offsets, override_zero
+
+        tri_indices, _ = triangulate_polygons(cart_points, corner_indices)
+
+        # filter out bad cells from torc mesh, i.e. all triangles with an edge longer than the threshold
+        if var == ncw.NCVars.TORC and use_torc_fix:
+            TORC_THRESHOLD = 1e+6
+            tri_points = cart_points[tri_indices]
+            edge_lengths = np.linalg.norm(tri_points - np.roll(tri_points, -1, axis=1), axis=2)
+            bad_tris = np.any(edge_lengths > TORC_THRESHOLD, axis=1)
+            override_zero = np.unique(tri_indices[bad_tris])
+            tri_indices = tri_indices[~bad_tris]
+        return tri_indices, None, override_zero
+
+    @staticmethod
+    def generate_corner_mesh(lon, lat, num_entries, corner_indices, var, msk, use_filter, create_conn, use_torc_fix:bool=True, use_triangulation:bool=True, connectivity=None):
         cart_points = cv.convert_data_arrays(cv.Mode2DTO3D(), lon, lat, np.zeros((len(lon),)))
 
         if var == ncw.NCVars.TORC and use_torc_fix:
             # we want to add one point at the South Pole here
-            tmp = np.zeros((len(cart_points) + 1, 3))
-            tmp[0:-1, :] = cart_points
-            tmp[-1, :] = np.average(cart_points[cart_points[:, 2] <= -6215000], axis=0)
-            cart_points = tmp
+            south_pole = np.average(cart_points[cart_points[:, 2] <= -6215000], axis=0)
+            cart_points = np.vstack((cart_points, south_pole))
 
-        cart_points_data_array = vtk_np.numpy_to_vtk(cart_points, deep=True)
-        vtk_points = vtkw.vtkPoints()
-        vtk_points.SetData(cart_points_data_array)
-
-        if create_conn: vtk_cells = vtkw.vtkCellArray()
-        if msk is not None:
+        # filtered meshes only contain water cells, all points are marked as valid in this case
+        propagate_msk = msk is not None and not use_filter
+        if propagate_msk:
             nfilter_msk = np.zeros((len(lon),))
-            override_zero = list()
-
-            point_to_cells = defaultdict(set)
-            for cell_idx in range(num_entries):
-                for point_idx in corner_indices[:, cell_idx]:
-                    point_to_cells[point_idx].add(cell_idx)
-
-        for i in range(num_entries):
-            # first filter out duplicates, some cells are malformed
-            indices = corner_indices[:, i]
-            indices = np.unique(indices)
-            if len(indices) < 3: continue
-
-            # mark cell vertices as valid
-            if msk is not None and msk[i] == 0:
-                for point_idx in indices:
-                    other_cells = point_to_cells[point_idx]
-                    mean_msk = np.mean(msk[np.array(list(other_cells))])
-                    nfilter_msk[point_idx] = 1.0 - mean_msk # we flip the meaning of 0 and 1
-                #nfilter_msk[indices] = 1.0
-
-            # create mesh connectivity
-            if create_conn:
-                points = cart_points[indices]
-
-                if use_triangulation:
-                    _, tri_indices = triangulate(points, indices) # first triangulate
-                    for idx_tri in range(tri_indices.shape[0]): # now handle each tri
-                        # filter out bad cells from torc mesh
-                        if var == ncw.NCVars.TORC and use_torc_fix:
-                            TORC_THRESHOLD = 1e+6
-                            p1 = cart_points[tri_indices[idx_tri][0]]
-                            p2 = cart_points[tri_indices[idx_tri][1]]
-                            p3 = cart_points[tri_indices[idx_tri][2]]
-                            l1 = np.linalg.norm(p1 - p2)
-                            l2 = np.linalg.norm(p2 - p3)
-                            l3 = np.linalg.norm(p3 - p1)
-                            if l1 > TORC_THRESHOLD or l2 > TORC_THRESHOLD or l3 > TORC_THRESHOLD:
-                                if msk is not None:
-                                    override_zero.append(tri_indices[idx_tri][0])
-                                    override_zero.append(tri_indices[idx_tri][1])
-                                    override_zero.append(tri_indices[idx_tri][2])
-                                continue
-
-                        tri = vtkw.vtkTriangle()
-                        tri.GetPointIds().SetId(0, tri_indices[idx_tri][0])
-                        tri.GetPointIds().SetId(1, tri_indices[idx_tri][1])
-                        tri.GetPointIds().SetId(2, tri_indices[idx_tri][2])
-                        vtk_cells.InsertNextCell(tri)
-                else:
-                    # first sort points based on rotation around normal, then setup polygon
-                    e1, e2 = compute_plane_basis(points)
-                    normal = compute_normal(points, e1, e2)
-                    _, sorted_indices = sort_counterclockwise(points, indices, normal)
-
-                    poly = vtkw.vtkPolygon()
-                    poly.GetPointIds().SetNumberOfIds(len(sorted_indices))
-                    for i, idx in enumerate(sorted_indices):
-                        poly.GetPointIds().SetId(i, idx)
-                    vtk_cells.InsertNextCell(poly)
+            incidence = PointCellIncidence(corner_indices, len(lon))
+
+            # mark vertices of water cells as valid, some cells are malformed and have less than 3 unique corners
+            water_cells = (incidence.points_per_cell >= 3) & (np.asarray(msk) == 0)
+            water_points = incidence.points_touched_by(water_cells)
+            nfilter_msk[water_points] = 1.0 - incidence.point_mean(msk)[water_points] # we flip the meaning of 0 and 1
+
+        # create mesh connectivity, may already be computed by worker processes
+        if create_conn:
+            if connectivity is None: connectivity = NC2VTK.compute_corner_connectivity(cart_points, corner_indices, var, use_torc_fix, use_triangulation)
+            cells, offsets, override_zero = connectivity
 
         # general torc fix that fills in the hole in the south-pole
         if var == ncw.NCVars.TORC and use_torc_fix and create_conn and use_triangulation:
-            total_indices = np.arange(len(cart_points))
-            low_indices = total_indices[cart_points[:, 2] <= -6215000]
-            _, tris = triangulate(cart_points[low_indices], low_indices)
-            for idx_tri in range(tris.shape[0]):
-                tri = vtkw.vtkTriangle()
-                tri.GetPointIds().SetId(0, tris[idx_tri][0])
-                tri.GetPointIds().SetId(1, tris[idx_tri][1])
-                tri.GetPointIds().SetId(2, tris[idx_tri][2])
-                vtk_cells.InsertNextCell(tri)
-
-            if msk is not None:
-                tmp = np.zeros((len(cart_points),))
-                tmp[0:-1] = nfilter_msk
-                nfilter_msk = tmp
-                nfilter_msk[low_indices] = 0.0
+            low_indices = np.flatnonzero(cart_points[:, 2] <= -6215000)
+            _, cap_tri_indices = triangulate(cart_points[low_indices], low_indices)
+            cells = np.concatenate((cells, cap_tri_indices))
 
-                nfilter_msk[np.array(list(set(override_zero)))] = 0.0
+            if propagate_msk:
+                nfilter_msk = np.append(nfilter_msk, 0.0)
+                nfilter_msk[low_indices] = 0.0
+                nfilter_msk[override_zero] = 0.0
 
-        unstructured_grid = vtkw.vtkUnstructuredGrid()
-        unstructured_grid.SetPoints(vtk_points)
-        if create_conn: unstructured_grid.SetCells(vtkw.VTK_TRIANGLE if use_triangulation else vtkw.VTK_POLYGON, vtk_cells)
+        mesh = Mesh.from_cells(cart_points, cells, offsets, TRIANGLE if use_triangulation else POLYGON) if create_conn else Mesh(cart_points)
 
         if msk is not None:
-            if use_filter:
-                vtk_point_data = vtk_np.numpy_to_vtk(np.ones((cart_points.shape[0],)).astype(np.float32), deep=True)
-                vtk_point_data.SetName("mask")  # Set the name of the point data
-                unstructured_grid.GetPointData().AddArray(vtk_point_data)
-            else:
-                vtk_point_data = vtk_np.numpy_to_vtk(nfilter_msk, deep=True)
-                vtk_point_data.SetName("mask")  # Set the name of the point data
-                unstructured_grid.GetPointData().AddArray(vtk_point_data)
+            if use_filter: mesh.point_data["mask"] = np.ones((cart_points.shape[0],)).astype(np.float32)
+            else: mesh.point_data["mask"] = nfilter_msk
 
-        return unstructured_grid
+        return mesh
 
     def _nc2vtk_corner(self, var:ncw.NCVars, use_filter:bool, use_torc_fix:bool=True, use_triangulation:bool=True):
         """
         Extracts coner based mesh
         :param var: active variable
         :param use_filter: should we already filter out points? (only possible for SEA meshes)
-        :return:
+        :return: Mesh
         """
-        clo = self.nc_input.var_clo_data(var)
-        cla = self.nc_input.var_cla_data(var)
         msk = self.msk_input.var_msk_data(var).flatten() if self.msk_input is not None else None
-        lon, lat, num_entries, corner_indices = NC2VTK.process_corner_data(clo, cla, msk, use_filter)
-        return NC2VTK.generate_corner_u_grid(lon, lat, num_entries, corner_indices, var, msk, use_filter, True, use_torc_fix, use_triangulation)
+        if self.jobs > 1:
+            return self._nc2vtk_corner_parallel(var, msk, use_filter, use_torc_fix, use_triangulation)
+        if use_filter and msk is not None and self.memory_budget is not None:
+            lon, lat, num_entries, corner_indices = NC2VTK.process_corner_data_chunked(self.nc_input, var, self.memory_budget, msk, use_filter)
+        elif use_filter and msk is not None:
+            clo = self.nc_input.var_clo_data(var)
+            cla = self.nc_input.var_cla_data(var)
+            lon, lat, num_entries, corner_indices = NC2VTK.process_corner_data(clo, cla, msk, use_filter)
+        else:
+            lon, lat, num_entries, corner_indices = NC2VTK.read_corner_data(self.nc_input, var, self.use_cache, self.memory_budget)
+        if self.compact is not None: corner_indices = self.compact.indices(corner_indices)
+        return NC2VTK.generate_corner_mesh(lon, lat, num_entries, corner_indices, var, msk, use_filter, True, use_torc_fix, use_triangulation)
+
+    def _nc2vtk_corner_parallel(self, var:ncw.NCVars, msk, use_filter:bool, use_torc_fix:bool=True, use_triangulation:bool=True):
+        """
+        Multi-process variant of _nc2vtk_corner. Cells are split into contiguous ranges, which are deduplicated, triangulated and
+        filtered by worker processes. Local point sets are then merged into one global numbering, the result is identical to the serial one.
+        The topology cache is not used, as each worker only processes its own range.
+        :param var: active variable
+        :param msk: mask data array
+        :param use_filter: should we already filter out points? (only possible for SEA meshes)
+        :param use_torc_fix: do we want to apply the empirical torc mesh fix
+        :param use_triangulation: enables mesh triangulation
+        :return:
+        """
+        clo_shape = self.nc_input.variables[f"{var.value}.clo"].shape
+        num_cells = int(np.prod(clo_shape[1:]))
+        max_cells = -(-num_cells // self.jobs)
+        if self.memory_budget is not None: max_cells = min(max_cells, self.memory_budget // (clo_shape[0] * NC2VTK.CHUNK_BYTES_PER_CORNER))
+        slabs = self.nc_input.var_corner_slabs(var, max_cells)
+        bounds = [start for start, _ in slabs] + [num_cells]
+        use_msk = use_filter and msk is not None
+        slab_msks = [msk[start:end] if use_msk else None for start, end in zip(bounds[:-1], bounds[1:])]
+
+        threads = max(1, (os.cpu_count() or 1) // self.jobs)
+        with ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_extract_worker, initargs=(threads,)) as executor:
+            results = list(executor.map(_extract_cell_range, repeat(self.nc_input.path), repeat(var), [hyperslab for _, hyperslab in slabs],
+                                        slab_msks, repeat(use_torc_fix), repeat(use_triangulation)))
+
+        # translate local point indices of each range into the global numbering, ranges are in cell order
+        chunk_keys = [quantize_points(points, NC2VTK.CORNER_DECIMALS) for points, _, _ in results]
+        mappings = [np.empty((len(keys),), dtype=np.intp) for keys in chunk_keys]
+        window = max([len(keys) for keys in chunk_keys] + [1])
+        if self.memory_budget is not None: window = max(1, self.memory_budget // (max(1, len(chunk_keys)) * NC2VTK.MERGE_BYTES_PER_KEY))
+        unique_points = NC2VTK.merge_corner_chunks(chunk_keys, mappings, window) / 10.0 ** NC2VTK.CORNER_DECIMALS
+        corner_indices = np.concatenate([mapping[indices] for mapping, (_, indices, _) in zip(mappings, results)], axis=1)
+        if self.compact is not None: corner_indices = self.compact.indices(corner_indices)
+        cells = np.concatenate([mapping[conn[0]] for mapping, (_, _, conn) in zip(mappings, results)])
+        override_zero = np.unique(np.concatenate([mapping[conn[2]] for mapping, (_, _, conn) in zip(mappings, results)]))
+        offsets = None
+        if not use_triangulation:
+            offsets = np.zeros((1,), dtype=np.int64)
+            for _, _, conn in results: offsets = np.concatenate((offsets, conn[1][1:] + offsets[-1]))
+
+        lon = unique_points[:, 0]
+        lat = unique_points[:, 1]
+        return NC2VTK.generate_corner_mesh(lon, lat, corner_indices.shape[1], corner_indices, var, msk, use_filter, True,
+                                           use_torc_fix, use_triangulation, (cells, offsets, override_zero))
+
+def _init_extract_worker(threads):
+    """
+    Initializes a worker process of the multi-process corner mesh extraction
+    :param threads: number of conversion threads of this worker
+    :return:
+    """
+    os.environ[CONVERSION_THREADS_ENV] = str(threads)
+
+def _extract_cell_range(nc_file_path, var:ncw.NCVars, hyperslab, msk, use_torc_fix:bool, use_triangulation:bool):
+    """
+    Worker of the multi-process corner mesh extraction. Reads one range of cells, deduplicates its corners and creates its cells.
+    :param nc_file_path: NC file path
+    :param var: active variable
+    :param hyperslab: hyperslab of the cell range
+    :param msk: mask of the cells in range, if provided only cells with mask 0 are kept
+    :param use_torc_fix: do we want to apply the empirical torc mesh fix
+    :param use_triangulation: enables mesh triangulation
+    :return: tuple of (unique points, local corner indices, local connectivity as returned by compute_corner_connectivity)
+    """
+    clo, cla = ncw.NCFile(nc_file_path).var_corner_slab(var, hyperslab)
+    unique_points, corner_indices = NC2VTK.process_corner_chunk(clo, cla, msk)
+    # conversion modifies longitudes in place, the unique points have to stay untouched for the merge
+    cart_points = cv.convert_data_arrays(cv.Mode2DTO3D(), unique_points[:, 0].copy(), unique_points[:, 1].copy(), np.zeros((len(unique_points),)))
+    return unique_points, corner_indices, NC2VTK.compute_corner_connectivity(cart_points, corner_indices, var, use_torc_fix, use_triangulation)
@@ -22,14 +22,11 @@ def compute_tri_area(points):
 def sort_counterclockwise(points, indices, normal):
     """Sort points in counterclockwise order using the normal vector."""
     center = np.mean(points, axis=0)  # Compute centroid
-    ref_vector = points[0] - center   # Reference vector
+    vec = points - center
+    ref_vector = vec[0]   # Reference vector
+    angles = np.arctan2(np.cross(ref_vector, vec) @ normal, vec @ ref_vector)
 
-    def angle_from_ref(p):
-        vec = p - center
-        angle = np.arctan2(np.dot(normal, np.cross(ref_vector, vec)), np.dot(ref_vector, vec))
-        return angle
-
-    sorting = np.argsort([angle_from_ref(p) for p in points])
+    sorting = np.argsort(angles)
     return points[sorting], indices[sorting]
 
 def check_order(points):
@@ -64,7 +61,8 @@ def compute_plane_basis(points):
 
 def project_onto_plane(points, origin, e1, e2):
     """Project 3D points onto a 2D local coordinate system (e1, e2)."""
-    return np.array([[np.dot(p - origin, e1), np.dot(p - origin, e2)] for p in points])
+    vec = points - origin
+    return np.column_stack((vec @ e1, vec @ e2))
 
 def triangulate_polygon(points, indices):
     """Triangulate the polygon by projecting it onto a local 2D coordinate system."""
@@ -84,6 +82,130 @@ def triangulate_polygon(points, indices):
 
     return sorted_points[tri.simplices], sorted_indices[tri.simplices]
 
+def group_cells_by_size(corner_indices):
+    """
+    Removes duplicate corners of all cells and groups the cells by their number of unique corners.
+    Corners of each cell are sorted by index, as done by np.unique.
+    :param corner_indices: corner indices of shape (corners per cell, number of cells)
+    :return: dict mapping number of unique corners to tuple of (cell ids, unique corner indices of shape (cells, corners))
+    """
+    sorted_indices = np.sort(corner_indices.T, axis=1)
+    is_unique = np.ones(sorted_indices.shape, dtype=bool)
+    is_unique[:, 1:] = sorted_indices[:, 1:] != sorted_indices[:, :-1]
+    num_unique = np.count_nonzero(is_unique, axis=1)
+
+    groups = dict()
+    for size in np.unique(num_unique):
+        cell_ids = np.flatnonzero(num_unique == size)
+        groups[int(size)] = (cell_ids, sorted_indices[cell_ids][is_unique[cell_ids]].reshape((-1, size)))
+    return groups
+
+def sort_counterclockwise_batched(points, indices):
+    """
+    Sorts the points of many polygons of equal size in counterclockwise order, same as sort_counterclockwise.
+    Also checks in the local 2D coordinate system of each polygon whether it is strictly convex.
+    :param points: polygon points of shape (polygons, corners, 3)
+    :param indices: polygon point indices of shape (polygons, corners)
+    :return: tuple of (sorted points, sorted indices, convex flags)
+    """
+    e1 = points[:, 1] - points[:, 0]
+    e1 /= np.linalg.norm(e1, axis=1)[:, None]
+    e2 = points[:, 2] - points[:, 0]
+    e2 -= np.einsum("ij,ij->i", e2, e1)[:, None] * e1
+    e2 /= np.linalg.norm(e2, axis=1)[:, None]
+    normal = np.cross(e1, e2)
+    normal /= np.linalg.norm(normal, axis=1)[:, None]
+
+    center = np.mean(points, axis=1)
+    vec = points - center[:, None, :]
+    ref_vector = vec[:, 0:1, :]
+    angles = np.arctan2(np.einsum("ij,ikj->ik", normal, np.cross(ref_vector, vec)), np.einsum("ikj,ikj->ik", ref_vector, vec))
+    sorting = np.argsort(angles, axis=1)
+    sorted_points = np.take_along_axis(points, sorting[:, :, None], axis=1)
+    sorted_indices = np.take_along_axis(indices, sorting, axis=1)
+
+    # strictly convex if all turns between consecutive edges go in the same direction as the sorting
+    edges = np.roll(sorted_points, -1, axis=1) - sorted_points
+    edges_2d = np.stack((np.einsum("ikj,ij->ik", edges, e1), np.einsum("ikj,ij->ik", edges, e2)), axis=-1)
+    next_edges_2d = np.roll(edges_2d, -1, axis=1)
+    turns = edges_2d[:, :, 0] * next_edges_2d[:, :, 1] - edges_2d[:, :, 1] * next_edges_2d[:, :, 0]
+    lengths = np.linalg.norm(edges_2d, axis=2)
+    scale = lengths * np.roll(lengths, -1, axis=1)
+    is_convex = np.all(turns > 1e-12 * scale, axis=1)
+    # near-coincident corners, e.g. at the poles, would be fanned into zero-area triangles
+    is_convex &= np.all(lengths > 1e-9 * np.max(lengths, axis=1)[:, None], axis=1)
+    return sorted_points, sorted_indices, is_convex
+
+def triangulate_polygons(points, corner_indices):
+    """
+    Triangulates all cells at once. Cells are grouped by their number of unique corners, sorted counterclockwise
+    and split into fan triangles. Only cells which are not strictly convex fall back to triangulate_polygon.
+    Cells with less than 3 unique corners are skipped.
+    :param points: all mesh points
+    :param corner_indices: corner indices of shape (corners per cell, number of cells)
+    :return: tuple of (triangle indices of shape (triangles, 3), cell id of each triangle), ordered by cell id
+    """
+    tri_indices = [np.zeros((0, 3), dtype=corner_indices.dtype)]
+    tri_cells = [np.zeros((0,), dtype=np.intp)]
+    for size, (cell_ids, indices) in group_cells_by_size(corner_indices).items():
+        if size < 3: continue
+        if size == 3:
+            tri_indices.append(indices)
+            tri_cells.append(cell_ids)
+            continue
+
+        _, sorted_indices, is_convex = sort_counterclockwise_batched(points[indices], indices)
+        fan = np.stack((np.broadcast_to(sorted_indices[is_convex, 0:1], (np.count_nonzero(is_convex), size - 2)),
+                        sorted_indices[is_convex, 1:-1], sorted_indices[is_convex, 2:]), axis=-1)
+        tri_indices.append(fan.reshape((-1, 3)))
+        tri_cells.append(np.repeat(cell_ids[is_convex], size - 2))
+
+        for cell_id, cell_indices in zip(cell_ids[~is_convex], indices[~is_convex]):
+            _, cell_tris = triangulate_polygon(points[cell_indices], cell_indices)
+            tri_indices.append(cell_tris)
+            tri_cells.append(np.full((cell_tris.shape[0],), cell_id, dtype=np.intp))
+
+    tri_indices = np.concatenate(tri_indices)
+    tri_cells = np.concatenate(tri_cells)
+    sorting = np.argsort(tri_cells, kind="stable")
+    return tri_indices[sorting], tri_cells[sorting]
+
+def sort_polygons_counterclockwise(points, corner_indices):
+    """
+    Sorts the unique corners of all cells counterclockwise, cells with less than 3 unique corners are skipped.
+    :param points: all mesh points
+    :param corner_indices: corner indices of shape (corners per cell, number of cells)
+    :return: tuple of (cell ids, CSR offsets, connectivity), ordered by cell id
+    """
+    groups = [(cell_ids, sort_counterclockwise_batched(points[indices], indices)[1])
+              for size, (cell_ids, indices) in group_cells_by_size(corner_indices).items() if size >= 3]
+    cell_ids = np.concatenate([ids for ids, _ in groups] + [np.zeros((0,), dtype=np.intp)])
+    sizes = np.concatenate([np.full(ids.shape, polys.shape[1]) for ids, polys in groups] + [np.zeros((0,), dtype=np.intp)])
+    sorting = np.argsort(cell_ids, kind="stable")
+
+    # scatter polygons of each group to their position in cell order
+    offsets = np.zeros((len(cell_ids) + 1,), dtype=np.int64)
+    np.cumsum(sizes[sorting], out=offsets[1:])
+    position = np.empty_like(sorting)
+    position[sorting] = np.arange(len(sorting))
+    connectivity = np.empty((offsets[-1],), dtype=corner_indices.dtype)
+    start = 0
+    for ids, polys in groups:
+        targets = offsets[position[start:start + len(ids)]][:, None] + np.arange(polys.shape[1])
+        connectivity[targets] = polys
+        start += len(ids)
+    return cell_ids[sorting], offsets, connectivity
+
+def compute_tri_areas(tri_points):
+    """
+    Computes the areas of many triangles
+    :param tri_points: triangle points of shape (triangles, 3, 3)
+    :return: triangle areas
+    """
+    v = tri_points[:, 1] - tri_points[:, 0]
+    w = tri_points[:, 2] - tri_points[:, 0]
+    return 0.5 * np.linalg.norm(np.cross(v, w), axis=1)
+
 def compute_orthonormal_basis(normal):
     """Compute two perpendicular basis vectors given a normal vector."""
     n1, n2, n3 = normal
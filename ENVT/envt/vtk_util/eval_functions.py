@@ -1,80 +1,199 @@
+import os
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, partial
 
-def fun_sinusoid(points):
+THREADS_ENV = "ENVT_EVAL_THREADS"
+"""Environment variable setting the number of evaluation threads, defaults to the number of CPUs"""
+CHUNK_SIZE = 1 << 16
+"""Number of points per chunk of evaluations"""
+
+_executor = None
+"""Thread pool of chunked evaluations"""
+_executor_threads = 0
+"""Number of threads of the thread pool"""
+_executor_pid = os.getpid()
+"""Process owning the thread pool, forked workers create their own pool"""
+
+def eval_executor():
     """
-    Slowly varying standard sinusoid over the globe
-    :param points: evaluation points
-    :return: function at points
+    Gets the process-wide thread pool of chunked evaluations, can be sized via environment variable ENVT_EVAL_THREADS
+    :return: ThreadPoolExecutor or None for single-threaded evaluation
+    """
+    global _executor, _executor_threads, _executor_pid
+    if _executor_pid != os.getpid():
+        _executor = None
+        _executor_pid = os.getpid()
+    threads = int(os.environ.get(THREADS_ENV, os.cpu_count() or 1))
+    if threads <= 1: return None
+    if _executor is None or _executor_threads != threads:
+        if _executor is not None: _executor.shutdown(wait=False)
+        _executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="envt-eval")
+        _executor_threads = threads
+    return _executor
+
+class TrigCache:
+    """
+    Geodesic coordinates of a chunk of evaluation points and their trigonometric terms, which are computed on first use.
+    Test functions evaluated on the same TrigCache share these terms.
+    """
+    CONV = np.pi / 180.0
+    """Degrees to radians"""
+
+    def __init__(self, points, dtype=np.float64):
+        """
+        :param points: evaluation points with lon and lat in degrees in the first two columns, which are never modified
+        :param dtype: floating point type of all terms
+        """
+        self.lon = np.asarray(points[:, 0], dtype=dtype)
+        """Longitude in degrees"""
+        self.lat = np.asarray(points[:, 1], dtype=dtype)
+        """Latitude in degrees"""
+
+    @cached_property
+    def lon_rad(self): return self.lon * TrigCache.CONV
+
+    @cached_property
+    def lat_rad(self): return self.lat * TrigCache.CONV
+
+    @cached_property
+    def cos_lon(self): return np.cos(self.lon_rad)
+
+    @cached_property
+    def cos_lat(self): return np.cos(self.lat_rad)
+
+    @cached_property
+    def sin_lat(self): return np.sin(self.lat_rad)
+
+    @cached_property
+    def angle(self):
+        """Great circle angle to lon = lat = 0"""
+        angle = self.cos_lon * self.cos_lat
+        return np.arccos(angle, out=angle)
+
+def evaluate_functions(points, kernels, dtype=None):
+    """
+    Evaluates test functions chunk-wise. Chunks are evaluated in the evaluation thread pool, as numpy releases the GIL.
+    The kernels of a chunk share its TrigCache and write into preallocated outputs, thus only chunk-sized
+    temporaries are created.
+    :param points: evaluation points with lon and lat in degrees in the first two columns
+    :param kernels: kernels of the test functions, kernel(trig, out) evaluates the TrigCache of a chunk into its output buffer
+    :param dtype: floating point type of the evaluation, defaults to float32 for float32 points and float64 otherwise
+    :return: list of function values per kernel
+    """
+    points = np.asarray(points)
+    if dtype is None: dtype = np.float32 if points.dtype == np.float32 else np.float64
+    num_points = points.shape[0]
+    outs = [np.empty(num_points, dtype=dtype) for _ in kernels]
+
+    def evaluate_chunk(start):
+        end = min(start + CHUNK_SIZE, num_points)
+        trig = TrigCache(points[start:end], dtype)
+        for kernel, out in zip(kernels, outs): kernel(trig, out[start:end])
+
+    starts = range(0, num_points, CHUNK_SIZE)
+    executor = eval_executor() if len(starts) > 1 else None
+    if executor is None:
+        for start in starts: evaluate_chunk(start)
+    else:
+        list(executor.map(evaluate_chunk, starts))
+    return outs
+
+def kernel_sinusoid(trig:TrigCache, out):
+    """
+    Kernel of fun_sinusoid, evaluates the TrigCache of a chunk into its output buffer
+    :param trig: TrigCache of a chunk
+    :param out: output buffer of the chunk
+    :return:
     """
-    xcoord = points[:, 0]
-    ycoord = points[:, 1]
-    conv = np.pi / 180.0
     length = 1.2 * np.pi
     coef = 2.
     coefmult = 1.
-    evaluated = coefmult * (coef - np.cos(np.pi*(np.arccos(np.cos(xcoord * conv) * np.cos(ycoord * conv))/length)))
-    return evaluated
+    np.divide(trig.angle, length, out=out)
+    out *= np.pi
+    np.cos(out, out=out)
+    np.subtract(coef, out, out=out)
+    out *= coefmult
 
-def fun_harmonic(points):
+def kernel_harmonic(trig:TrigCache, out):
     """
-    More rapidly varying function with 16 maximums and 16 minimums in
-    northern and southern bands
-    :param points: evaluation points
-    :return: function at points
+    Kernel of fun_harmonic, evaluates the TrigCache of a chunk into its output buffer
+    :param trig: TrigCache of a chunk
+    :param out: output buffer of the chunk
+    :return:
     """
-    xcoord = points[:, 0]
-    ycoord = points[:, 1]
-    conv = np.pi / 180.0
-    evaluated = 2.0 + np.sin(2.0 * ycoord * conv) ** 16.0 * np.cos(16.0 * xcoord * conv)
-    return evaluated
+    np.multiply(trig.lat_rad, 2.0, out=out)
+    np.sin(out, out=out)
+    # 16th power by repeated squaring
+    for _ in range(4): np.square(out, out=out)
+    cos_lon = np.multiply(trig.lon_rad, 16.0)
+    np.cos(cos_lon, out=cos_lon)
+    out *= cos_lon
+    out += 2.0
 
-def fun_vortex(points):
+def kernel_vortex(trig:TrigCache, out):
     """
-    Slowly varying function with two added vortices, one in the Atlantic and
-    one over Indonesia
-    :param points: evaluation points
-    :return: function at points
+    Kernel of fun_vortex, evaluates the TrigCache of a chunk into its output buffer
+    :param trig: TrigCache of a chunk
+    :param out: output buffer of the chunk
+    :return:
     """
-    xcoord = points[:, 0]
-    ycoord = points[:, 1]
-    conv = np.pi / 180.0
     lon0 = 5.5
     lat0 = 0.2
     R0 = 3.0
     D = 5.0
     T = 6.0
-    sinC = np.sin(lat0)
-    cosC = np.cos(lat0)
-
-    cosT = np.cos(ycoord * conv)
-    sinT = np.sin(ycoord * conv)
-    trm = cosT * np.cos(xcoord * conv - lon0)
-    X = sinC * trm - cosC * sinT
-    Y = cosT * np.sin(xcoord * conv - lon0)
-    Z = sinC * sinT + cosC * trm
-    lon = np.arctan2(Y, X)
-    lon[lon < 0.0] += 2.0 * np.pi
-    lat = np.arcsin(Z)
-
-    rho = R0 * np.cos(lat)
-    vt = 3.0 * np.sqrt(3.0)/2.0/np.cosh(rho)/np.cosh(rho)*np.tanh(rho)
-    omega = np.zeros_like(rho)
-    rho_idx = rho != 0.0
-    omega[rho_idx] = vt[rho_idx] / rho[rho_idx]
-
-    evaluated = 2.0 * (1.0 + np.tanh(rho / D * np.sin(lon - omega * T)))
-    return evaluated
-
-def fun_gulfstream(points, offset=1):
-    """
-    Slowly varying standard sinusoid with a mimicked Gulf Stream.
-    :param points: evaluation points
+    sinC = float(np.sin(lat0))
+    cosC = float(np.cos(lat0))
+    vt0 = float(3.0 * np.sqrt(3.0) / 2.0)
+
+    cosT = trig.cos_lat
+    sinT = trig.sin_lat
+    lon = np.subtract(trig.lon_rad, lon0)
+    trm = np.cos(lon)
+    trm *= cosT
+    np.sin(lon, out=lon)
+    lon *= cosT
+    X = np.multiply(trm, sinC)
+    tmp = np.multiply(sinT, cosC)
+    X -= tmp
+    rho = np.multiply(sinT, sinC)
+    np.multiply(trm, cosC, out=tmp)
+    rho += tmp
+    # rotated longitude from Y and X, rho from the rotated latitude arcsin(Z)
+    np.arctan2(lon, X, out=lon)
+    np.add(lon, 2.0 * np.pi, out=lon, where=lon < 0.0)
+    np.arcsin(rho, out=rho)
+    np.cos(rho, out=rho)
+    rho *= R0
+
+    # omega = vt / rho with vt = 3 sqrt(3) / 2 / cosh(rho)^2 * tanh(rho), zero at rho = 0
+    np.cosh(rho, out=trm)
+    np.divide(vt0, trm, out=X)
+    X /= trm
+    np.tanh(rho, out=tmp)
+    X *= tmp
+    trm.fill(0.0)
+    np.divide(X, rho, out=trm, where=rho != 0.0)
+
+    trm *= T
+    lon -= trm
+    np.sin(lon, out=lon)
+    np.divide(rho, D, out=out)
+    out *= lon
+    np.tanh(out, out=out)
+    out += 1.0
+    out *= 2.0
+
+def kernel_gulfstream(trig:TrigCache, out, offset=1):
+    """
+    Kernel of fun_gulfstream, evaluates the TrigCache of a chunk into its output buffer
+    :param trig: TrigCache of a chunk
+    :param out: output buffer of the chunk
     :param offset: offsets output to avoid 0 values
-    :return: function at points
+    :return:
     """
-    xcoord = points[:, 0]
-    ycoord = points[:, 1]
-    conv = np.pi / 180.0
+    conv = TrigCache.CONV
     length = 1.2 * np.pi
     coef = 1.0
     ori_lon = -80.0
@@ -83,19 +202,88 @@ def fun_gulfstream(points, offset=1):
     end_lat = 50.0
     dmp_lon = -25.5
     dmp_lat = 55.5
-    dr0 = np.sqrt(((end_lon-ori_lon)*conv)**2 + ((end_lat-ori_lat)*conv)**2)
-    dr1 = np.sqrt(((dmp_lon-ori_lon)*conv)**2 + ((dmp_lat-ori_lat)*conv)**2)
-
-    evaluated = (coef - np.cos(np.pi*(np.arccos(np.cos(ycoord*conv)*np.cos(xcoord*conv))/length)))
-    per_lon = xcoord
-    per_lon[per_lon > 180.0] -= 360.0
-    per_lon[per_lon < -180.0] += 360.0
-    dx = (per_lon - ori_lon) * conv
-    dy = (ycoord - ori_lat) * conv
-    dr = np.sqrt(dx*dx + dy*dy)
-    dth = np.arctan2(dy, dx)
-    dc = 1.3 * coef * np.ones_like(dr)
+    dr0 = float(np.sqrt(((end_lon-ori_lon)*conv)**2 + ((end_lat-ori_lat)*conv)**2))
+    dr1 = float(np.sqrt(((dmp_lon-ori_lon)*conv)**2 + ((dmp_lat-ori_lat)*conv)**2))
+
+    np.divide(trig.angle, length, out=out)
+    out *= np.pi
+    np.cos(out, out=out)
+    np.subtract(coef, out, out=out)
+
+    # longitudes are wrapped on a copy, the evaluation points are shared with other functions
+    dx = trig.lon.copy()
+    np.subtract(dx, 360.0, out=dx, where=dx > 180.0)
+    np.add(dx, 360.0, out=dx, where=dx < -180.0)
+    dx -= ori_lon
+    dx *= conv
+    dy = np.subtract(trig.lat, ori_lat)
+    dy *= conv
+    dr = np.multiply(dx, dx)
+    tmp = np.multiply(dy, dy)
+    dr += tmp
+    np.sqrt(dr, out=dr)
+    dth = np.arctan2(dy, dx, out=dy)
+
+    dc = np.full_like(dr, 1.3 * coef)
     dc[dr > dr0] = 0.0
-    dc[dr > dr1] *= np.cos(np.pi*0.5*(dr[dr > dr1]-dr1)/(dr0-dr1))
-    evaluated += (np.maximum(1000.0*np.sin(0.4*(0.5*dr+dth) + 0.007*np.cos(50.0*dth) + 0.37*np.pi), 999.0) - 999.0) * dc
-    return evaluated + offset
\ No newline at end of file
+    damped = dr > dr1
+    np.subtract(dr, dr1, out=tmp, where=damped)
+    np.multiply(tmp, np.pi * 0.5, out=tmp, where=damped)
+    np.divide(tmp, dr0 - dr1, out=tmp, where=damped)
+    np.cos(tmp, out=tmp, where=damped)
+    np.multiply(dc, tmp, out=dc, where=damped)
+
+    stream = np.multiply(dr, 0.5, out=dr)
+    stream += dth
+    stream *= 0.4
+    np.multiply(dth, 50.0, out=tmp)
+    np.cos(tmp, out=tmp)
+    tmp *= 0.007
+    stream += tmp
+    stream += 0.37 * np.pi
+    np.sin(stream, out=stream)
+    stream *= 1000.0
+    np.maximum(stream, 999.0, out=stream)
+    stream -= 999.0
+    stream *= dc
+    out += stream
+    out += offset
+
+def fun_sinusoid(points, dtype=None):
+    """
+    Slowly varying standard sinusoid over the globe
+    :param points: evaluation points with lon and lat in degrees in the first two columns, which are never modified
+    :param dtype: floating point type of the evaluation, see evaluate_functions
+    :return: function at points
+    """
+    return evaluate_functions(points, [kernel_sinusoid], dtype)[0]
+
+def fun_harmonic(points, dtype=None):
+    """
+    More rapidly varying function with 16 maximums and 16 minimums in
+    northern and southern bands
+    :param points: evaluation points with lon and lat in degrees in the first two columns, which are never modified
+    :param dtype: floating point type of the evaluation, see evaluate_functions
+    :return: function at points
+    """
+    return evaluate_functions(points, [kernel_harmonic], dtype)[0]
+
+def fun_vortex(points, dtype=None):
+    """
+    Slowly varying function with two added vortices, one in the Atlantic and
+    one over Indonesia
+    :param points: evaluation points with lon and lat in degrees in the first two columns, which are never modified
+    :param dtype: floating point type of the evaluation, see evaluate_functions
+    :return: function at points
+    """
+    return evaluate_functions(points, [kernel_vortex], dtype)[0]
+
+def fun_gulfstream(points, offset=1, dtype=None):
+    """
+    Slowly varying standard sinusoid with a mimicked Gulf Stream
+    :param points: evaluation points with lon and lat in degrees in the first two columns, which are never modified
+    :param offset: offsets output to avoid 0 values
+    :param dtype: floating point type of the evaluation, see evaluate_functions
+    :return: function at points
+    """
+    return evaluate_functions(points, [partial(kernel_gulfstream, offset=offset)], dtype)[0]
@@ -1,5 +1,11 @@
 import vtk
 import vtkmodules.util.numpy_support as vtk_np
+import numpy as np
+import os
+import re
+from envt.mesh_util.mesh import Mesh
+from envt.mesh_util.mesh_store import is_store_path, read_store_mesh, write_store_mesh
+from envt.cache_util.sidecar import sidecar_enabled, load_sidecar, register_read, remove_sidecar
 
 VTK_QUAD = vtk.VTK_QUAD
 VTK_POLYGON = vtk.VTK_POLYGON
@@ -7,6 +13,8 @@ VTK_TRIANGLE = vtk.VTK_TRIANGLE
 
 def vtkUnstructuredGridReader(): return vtk.vtkUnstructuredGridReader()
 def vtkUnstructuredGridWriter(): return vtk.vtkUnstructuredGridWriter()
+def vtkXMLUnstructuredGridReader(): return vtk.vtkXMLUnstructuredGridReader()
+def vtkXMLUnstructuredGridWriter(): return vtk.vtkXMLUnstructuredGridWriter()
 def vtkPoints(): return vtk.vtkPoints()
 def vtkUnstructuredGrid(): return vtk.vtkUnstructuredGrid()
 def vtkCellArray(): return vtk.vtkCellArray()
@@ -15,39 +23,482 @@ def vtkQuad(): return vtk.vtkQuad()
 def vtkPolygon(): return vtk.vtkPolygon()
 def vtkTriangle():return vtk.vtkTriangle()
 
+VTK_ID_DTYPE = np.dtype(vtk_np.get_numpy_array_type(vtk_np.VTK_ID_TYPE))
+
+VTK_FORMATS = ["ascii", "binary", "vtu", "vtu-lz4"]
+"""Output formats: legacy ASCII, legacy binary, XML with appended raw data compressed by zlib or lz4"""
+VTK_FORMAT_ENV = "ENVT_VTK_FORMAT"
+"""Environment variable selecting the default output format"""
+FAST_READER_ENV = "ENVT_FAST_READER"
+"""Environment variable, setting it to 0 disables the numpy reader for legacy ASCII files"""
+
+def output_format():
+    """
+    Gets the default output format, can be set via environment variable ENVT_VTK_FORMAT
+    :return: output format
+    """
+    file_format = os.environ.get(VTK_FORMAT_ENV, "ascii")
+    if file_format not in VTK_FORMATS: raise ValueError(f"Unknown VTK output format {file_format}, options are {VTK_FORMATS}")
+    return file_format
+
+def is_xml_file(filename):
+    """
+    Checks whether a VTK file is in XML format, independent of its file extension
+    :param filename: path to VTK file
+    :return: True for XML files, False for legacy files
+    """
+    with open(filename, "rb") as file:
+        head = file.read(256).lstrip()
+    return head.startswith(b"<?xml") or head.startswith(b"<VTKFile")
+
+def is_legacy_ascii_file(filename):
+    """
+    Checks whether a VTK file is in legacy ASCII format, independent of its file extension
+    :param filename: path to VTK file
+    :return: True for legacy ASCII files, False otherwise
+    """
+    with open(filename, "rb") as file:
+        head = [file.readline() for _ in range(3)]
+    return head[0].startswith(b"# vtk DataFile") and head[2].strip().upper() == b"ASCII"
+
+class CompactMode:
+    """
+    Opt-in compact mesh representation. Indices are stored as int32 and optionally points and point data as float32.
+    Every compacted array records its maximum absolute deviation from the float64 representation, see report.
+    """
+    def __init__(self, use_float32:bool=False):
+        self.use_float32 = use_float32
+        """Should points and point data be stored as float32?"""
+        self.deviations = dict()
+        """Maximum absolute deviation from the float64 representation per quantity"""
+
+    def record(self, name, reference, value):
+        """
+        Records the maximum absolute deviation of a value from its float64 reference
+        :param name: quantity name
+        :param reference: float64 reference
+        :param value: compact value
+        :return:
+        """
+        deviation = np.abs(np.asarray(value, dtype=np.float64) - np.asarray(reference, dtype=np.float64))
+        self.deviations[name] = max(self.deviations.get(name, 0.0), float(np.max(deviation, initial=0.0)))
+
+    def merge(self, deviations):
+        """
+        Merges deviations recorded by another CompactMode, e.g. of a worker process
+        :param deviations: maximum absolute deviation per quantity
+        :return:
+        """
+        for name, deviation in deviations.items(): self.deviations[name] = max(self.deviations.get(name, 0.0), deviation)
+
+    def indices(self, indices):
+        """
+        Converts index array to int32
+        :param indices: index array
+        :return: int32 index array
+        """
+        indices = np.asarray(indices)
+        if indices.size > 0 and indices.max() > np.iinfo(np.int32).max: raise ValueError("Indices exceed int32 range, compact mode is not applicable")
+        return indices.astype(np.int32, copy=False)
+
+    def values(self, name, values):
+        """
+        Converts floating point array to the compact precision
+        :param name: quantity name used in report
+        :param values: floating point array
+        :return: float32 array if enabled, else unchanged array
+        """
+        if not self.use_float32 or not np.issubdtype(np.asarray(values).dtype, np.floating): return values
+        compact_values = np.asarray(values, dtype=np.float32)
+        self.record(name, values, compact_values)
+        return compact_values
+
+    def report(self):
+        """
+        Prints maximum deviations from the float64 representation
+        :return:
+        """
+        print(f"Compact mode: int32 indices, {'float32' if self.use_float32 else 'float64'} points and point data")
+        for name, deviation in self.deviations.items():
+            print(f"  max deviation {name}: {deviation:.6e}")
+
+def numpy_to_vtk_points(points, compact:CompactMode=None):
+    """
+    Creates vtkPoints from (N, 3) numpy array
+    :param points: point coordinates
+    :param compact: optional compact mode
+    :return: vtkPoints
+    """
+    if compact is not None: points = compact.values("points", points)
+    vtk_points = vtkPoints()
+    vtk_points.SetData(vtk_np.numpy_to_vtk(points, deep=True))
+    return vtk_points
+
+def numpy_to_vtk_data(values, name, compact:CompactMode=None):
+    """
+    Creates named VTK data array from numpy array
+    :param values: data values
+    :param name: array name
+    :param compact: optional compact mode
+    :return: VTK data array
+    """
+    if compact is not None: values = compact.values(name, values)
+    data_array = vtk_np.numpy_to_vtk(values, deep=True)
+    data_array.SetName(name)
+    return data_array
+
+def numpy_to_vtk_cells(cells, offsets=None, compact:CompactMode=None):
+    """
+    Builds a vtkCellArray in one call from numpy index data. Index arrays are passed to VTK without copying
+    if they already are contiguous and of vtkIdType.
+    :param cells: (N, k) array of point indices for cells of equal size (e.g. triangles),
+    or flat connectivity array if offsets are provided
+    :param offsets: CSR offsets of length N+1 for cells of varying size (e.g. polygons)
+    :param compact: optional compact mode, cells are stored with 32 bit indices
+    :return: vtkCellArray
+    """
+    id_dtype = VTK_ID_DTYPE if compact is None else np.dtype(np.int32)
+    if offsets is None:
+        cells = np.asarray(cells)
+        num_cells, cell_size = cells.shape
+        offsets = np.arange(0, (num_cells + 1) * cell_size, cell_size, dtype=id_dtype)
+    if compact is not None:
+        cells = compact.indices(cells)
+        offsets = compact.indices(offsets)
+    connectivity = np.ascontiguousarray(cells, dtype=id_dtype).ravel()
+    offsets = np.ascontiguousarray(offsets, dtype=id_dtype)
+
+    cell_array = vtkCellArray()
+    if compact is None: cell_array.SetData(vtk_np.numpy_to_vtkIdTypeArray(offsets), vtk_np.numpy_to_vtkIdTypeArray(connectivity))
+    else: cell_array.SetData(vtk_np.numpy_to_vtk(offsets, array_type=vtk.VTK_TYPE_INT32), vtk_np.numpy_to_vtk(connectivity, array_type=vtk.VTK_TYPE_INT32))
+    return cell_array
+
+def vtk_to_numpy_cells(cell_array):
+    """
+    Extracts numpy index data of a vtkCellArray without copying
+    :param cell_array: vtkCellArray
+    :return: tuple of (connectivity, CSR offsets)
+    """
+    return vtk_np.vtk_to_numpy(cell_array.GetConnectivityArray()), vtk_np.vtk_to_numpy(cell_array.GetOffsetsArray())
+
+def vtk_to_numpy_cell_types(grid):
+    """
+    Extracts numpy cell types of a vtkUnstructuredGrid without copying
+    :param grid: vtkUnstructuredGrid
+    :return: VTK cell type of each cell
+    """
+    if (vtk.vtkVersion.GetVTKMajorVersion(), vtk.vtkVersion.GetVTKMinorVersion()) >= (9, 6): cell_types = grid.GetCellTypes()
+    else: cell_types = grid.GetCellTypesArray()
+    return vtk_np.vtk_to_numpy(cell_types)
+
+def mesh_to_vtk(mesh:Mesh, compact:CompactMode=None):
+    """
+    Creates a VTK grid from a mesh, only used when writing files
+    :param mesh: mesh
+    :param compact: optional compact mode
+    :return: vtkUnstructuredGrid
+    """
+    grid = vtkUnstructuredGrid()
+    grid.SetPoints(numpy_to_vtk_points(mesh.points, compact))
+    if mesh.num_cells > 0:
+        cell_types = vtk_np.numpy_to_vtk(np.asarray(mesh.cell_types, dtype=np.uint8), deep=True, array_type=vtk.VTK_UNSIGNED_CHAR)
+        grid.SetCells(cell_types, numpy_to_vtk_cells(mesh.connectivity, mesh.offsets, compact))
+    for name, values in mesh.point_data.items():
+        grid.GetPointData().AddArray(numpy_to_vtk_data(values, name, compact))
+    return grid
+
+def vtk_to_mesh(grid):
+    """
+    Creates a mesh of numpy views of a VTK grid, the grid has to outlive the mesh
+    :param grid: vtkUnstructuredGrid
+    :return: Mesh
+    """
+    point_data = grid.GetPointData()
+    mesh = Mesh(vtk_np.vtk_to_numpy(grid.GetPoints().GetData()),
+                point_data={point_data.GetArrayName(i): vtk_np.vtk_to_numpy(point_data.GetArray(i)) for i in range(point_data.GetNumberOfArrays())})
+    if grid.GetNumberOfCells() > 0:
+        mesh.connectivity, mesh.offsets = vtk_to_numpy_cells(grid.GetCells())
+        mesh.cell_types = vtk_to_numpy_cell_types(grid)
+    return mesh
+
+LEGACY_DTYPES = {
+    "bit": np.uint8, "unsigned_char": np.uint8, "char": np.int8, "unsigned_short": np.uint16, "short": np.int16,
+    "unsigned_int": np.uint32, "int": np.int32, "unsigned_long": np.uint64, "long": np.int64,
+    "float": np.float32, "double": np.float64, "vtkIdType": VTK_ID_DTYPE,
+    "vtktypeint8": np.int8, "vtktypeuint8": np.uint8, "vtktypeint16": np.int16, "vtktypeuint16": np.uint16,
+    "vtktypeint32": np.int32, "vtktypeuint32": np.uint32, "vtktypeint64": np.int64, "vtktypeuint64": np.uint64,
+}
+"""Numpy types of the data type names used in legacy VTK files"""
+
+class LegacyASCIIReader:
+    """
+    Reads legacy ASCII VTK unstructured grids into numpy arrays. Section headers are located first, afterward
+    each section is converted in bulk by numpy. Supports POINTS, CELLS (with or without OFFSETS/CONNECTIVITY),
+    CELL_TYPES and SCALARS, VECTORS, NORMALS and FIELD arrays of POINT_DATA and CELL_DATA.
+    Raises ValueError for anything else, in which case vtkUnstructuredGridReader should be used.
+    """
+    HEADER_PATTERN = re.compile(rb"\n[ \t]*((?!(?:[Nn][Aa][Nn]|[Ii][Nn][Ff])\b)[A-Za-z_][^\n]*)")
+    """Matches all lines starting with a letter, except for lines starting with nan or inf values"""
+
+    def __init__(self, filename):
+        self.infile = filename
+        """Path to VTK file"""
+        self.points = None
+        """(N, 3) point coordinates"""
+        self.connectivity = np.empty(0, dtype=VTK_ID_DTYPE)
+        """Flat cell connectivity"""
+        self.offsets = np.zeros(1, dtype=VTK_ID_DTYPE)
+        """CSR offsets of cells into connectivity"""
+        self.cell_types = np.empty(0, dtype=np.uint8)
+        """VTK cell type of each cell"""
+        self.point_data = list()
+        """List of (name, values, attribute) for point data arrays, attribute is None, SCALARS, VECTORS or NORMALS"""
+        self.cell_data = list()
+        """List of (name, values, attribute) for cell data arrays"""
+        self.read()
+
+    @staticmethod
+    def parse_values(data, begin, end, dtype, count):
+        """
+        Converts whitespace separated text to numpy array
+        :param data: file content
+        :param begin: start of text
+        :param end: end of text
+        :param dtype: numpy type of values
+        :param count: expected number of values
+        :return: numpy array
+        """
+        dtype = np.dtype(dtype)
+        parse_dtype = np.float64 if dtype.kind == "f" else np.int64
+        values = np.fromstring(data[begin:end], dtype=parse_dtype, sep=" ")
+        if values.size != count: raise ValueError(f"Expected {count} values, found {values.size} in {data[begin:begin + 64]!r}")
+        return values.astype(dtype, copy=False)
+
+    @staticmethod
+    def data_type(name):
+        """
+        Gets numpy type of legacy type name
+        :param name: legacy type name
+        :return: numpy type
+        """
+        if name not in LEGACY_DTYPES: raise ValueError(f"Unsupported data type {name}")
+        return LEGACY_DTYPES[name]
+
+    def read(self):
+        """
+        Reads the file
+        :return:
+        """
+        with open(self.infile, "rb") as file:
+            data = file.read()
+
+        # version, title, format and dataset lines
+        line_ends = [-1]
+        for _ in range(4):
+            line_ends.append(data.find(b"\n", line_ends[-1] + 1))
+            if line_ends[-1] < 0: raise ValueError(f"{self.infile} is not a legacy ASCII VTK file")
+        lines = [data[begin + 1:end] for begin, end in zip(line_ends[:-1], line_ends[1:])]
+        if not lines[0].startswith(b"# vtk DataFile") or lines[2].strip().upper() != b"ASCII":
+            raise ValueError(f"{self.infile} is not a legacy ASCII VTK file")
+        if lines[3].split() != [b"DATASET", b"UNSTRUCTURED_GRID"]: raise ValueError(f"Unsupported dataset {lines[3]!r}")
+        body = line_ends[-1]
+
+        headers = [(match.group(1).split(), match.start(1), match.end(1)) for match in LegacyASCIIReader.HEADER_PATTERN.finditer(data, body)]
+        headers.append(([], len(data), len(data)))
+        headers = [([token.decode() for token in tokens], start, end) for tokens, start, end in headers]
+
+        num_cells = 0
+        attributes = None
+        num_tuples = 0
+        field_arrays = 0
+        index = 0
+        while index < len(headers) - 1:
+            tokens, _, end = headers[index]
+            block_end = headers[index + 1][1]
+            keyword = tokens[0]
+            index += 1
+
+            if field_arrays > 0:
+                # FIELD array: name components tuples type
+                if len(tokens) != 4: raise ValueError(f"Unsupported field array header {tokens}")
+                name, num_components, num_array_tuples = tokens[0], int(tokens[1]), int(tokens[2])
+                values = self.parse_values(data, end, block_end, self.data_type(tokens[3]), num_components * num_array_tuples)
+                attributes.append((name, values.reshape(num_array_tuples, num_components) if num_components > 1 else values, None))
+                field_arrays -= 1
+            elif keyword == "POINTS":
+                num_points = int(tokens[1])
+                self.points = self.parse_values(data, end, block_end, self.data_type(tokens[2]), 3 * num_points).reshape(num_points, 3)
+            elif keyword == "CELLS":
+                num_cells = int(tokens[1])
+                if index < len(headers) - 1 and headers[index][0][0] == "OFFSETS":
+                    # since version 5.1: OFFSETS and CONNECTIVITY sections, num_cells counts offsets
+                    num_cells -= 1
+                    size = int(tokens[2])
+                    tokens, _, end = headers[index]
+                    self.offsets = self.parse_values(data, end, headers[index + 1][1], VTK_ID_DTYPE, num_cells + 1)
+                    tokens, _, end = headers[index + 1]
+                    if tokens[:1] != ["CONNECTIVITY"]: raise ValueError(f"Expected CONNECTIVITY, found {tokens}")
+                    self.connectivity = self.parse_values(data, end, headers[index + 2][1], VTK_ID_DTYPE, size)
+                    index += 2
+                else:
+                    # legacy layout: each cell is prefixed by its number of points
+                    size = int(tokens[2])
+                    cells = self.parse_values(data, end, block_end, VTK_ID_DTYPE, size)
+                    cell_size = cells[0] if size > 0 else 0
+                    if num_cells * (cell_size + 1) != size: raise ValueError("Cells of varying size are not supported")
+                    cells = cells.reshape(num_cells, cell_size + 1)
+                    if np.any(cells[:, 0] != cell_size): raise ValueError("Cells of varying size are not supported")
+                    self.connectivity = np.ascontiguousarray(cells[:, 1:]).ravel()
+                    self.offsets = np.arange(0, (num_cells + 1) * cell_size, cell_size, dtype=VTK_ID_DTYPE) if cell_size > 0 else np.zeros(num_cells + 1, dtype=VTK_ID_DTYPE)
+            elif keyword == "CELL_TYPES":
+                self.cell_types = self.parse_values(data, end, block_end, np.uint8, int(tokens[1]))
+            elif keyword == "POINT_DATA":
+                attributes = self.point_data
+                num_tuples = int(tokens[1])
+            elif keyword == "CELL_DATA":
+                attributes = self.cell_data
+                num_tuples = int(tokens[1])
+            elif keyword == "FIELD" and attributes is not None:
+                field_arrays = int(tokens[2])
+            elif keyword == "SCALARS" and attributes is not None:
+                num_components = int(tokens[3]) if len(tokens) > 3 else 1
+                lookup_tokens, _, end = headers[index]
+                if lookup_tokens[:1] != ["LOOKUP_TABLE"] or len(lookup_tokens) != 2: raise ValueError(f"Unsupported lookup table {lookup_tokens}")
+                values = self.parse_values(data, end, headers[index + 1][1], self.data_type(tokens[2]), num_tuples * num_components)
+                attributes.append((tokens[1], values.reshape(-1, num_components) if num_components > 1 else values, "SCALARS"))
+                index += 1
+            elif keyword in ("VECTORS", "NORMALS") and attributes is not None:
+                values = self.parse_values(data, end, block_end, self.data_type(tokens[2]), 3 * num_tuples)
+                attributes.append((tokens[1], values.reshape(-1, 3), keyword))
+            else:
+                raise ValueError(f"Unsupported section {keyword}")
+
+        if self.points is None: raise ValueError(f"{self.infile} contains no points")
+        if self.cell_types.size != num_cells: raise ValueError("Number of cell types does not match number of cells")
+
+    def to_mesh(self):
+        """
+        Creates a mesh from the parsed arrays without any VTK objects, cell data is dropped
+        :return: Mesh
+        """
+        return Mesh(self.points, self.connectivity, self.offsets, self.cell_types, {name: values for name, values, _ in self.point_data})
+
+    def to_grid(self):
+        """
+        Creates a VTK grid from the parsed arrays
+        :return: vtkUnstructuredGrid
+        """
+        grid = vtkUnstructuredGrid()
+        grid.SetPoints(numpy_to_vtk_points(self.points))
+        if self.cell_types.size > 0:
+            cell_types = vtk_np.numpy_to_vtk(self.cell_types, deep=True, array_type=vtk.VTK_UNSIGNED_CHAR)
+            grid.SetCells(cell_types, numpy_to_vtk_cells(self.connectivity, self.offsets))
+        for attributes, grid_data in ((self.point_data, grid.GetPointData()), (self.cell_data, grid.GetCellData())):
+            for name, values, attribute in attributes:
+                data_array = numpy_to_vtk_data(values, name)
+                if attribute == "SCALARS": grid_data.SetScalars(data_array)
+                elif attribute == "VECTORS": grid_data.SetVectors(data_array)
+                elif attribute == "NORMALS": grid_data.SetNormals(data_array)
+                else: grid_data.AddArray(data_array)
+        return grid
+
 class VTKInputFile:
     """
     Represents an input VTK file, automatically loads file and extracts relevant aspects
     """
-    def __init__(self, filename):
+    def __init__(self, filename, fast_reader:bool=None):
+        """
+        :param filename: path to VTK file or store path <file>::<mesh>[/<variant>]
+        :param fast_reader: should legacy ASCII files be parsed by LegacyASCIIReader? Defaults to $ENVT_FAST_READER or True.
+        Files not supported by it are read by the VTK reader.
+        """
         self.infile = filename
         """Path to VTK file"""
-        reader = vtkUnstructuredGridReader()
-        reader.SetFileName(filename)
-        reader.Update()
-        self.input_grid = reader.GetOutput()
-        """VTK Grid"""
-        # Extract points from the grid
-        self.input_points = self.input_grid.GetPoints()
+        if fast_reader is None: fast_reader = os.environ.get(FAST_READER_ENV, "1") != "0"
+        self.legacy_reader = None
+        """Numpy reader of legacy ASCII files, None if the file was read by the VTK reader"""
+        self._input_grid = None
+        if is_store_path(filename): self.mesh = read_store_mesh(filename)
+        else: self.mesh = load_sidecar(filename) if sidecar_enabled() else None
+        if self.mesh is None:
+            if fast_reader and is_legacy_ascii_file(filename):
+                try: self.legacy_reader = LegacyASCIIReader(filename)
+                except ValueError: self.legacy_reader = None
+            if self.legacy_reader is None:
+                reader = vtkXMLUnstructuredGridReader() if is_xml_file(filename) else vtkUnstructuredGridReader()
+                reader.SetFileName(filename)
+                reader.Update()
+                self._input_grid = reader.GetOutput()
+            self.mesh = self.legacy_reader.to_mesh() if self.legacy_reader is not None else vtk_to_mesh(self._input_grid)
+            if sidecar_enabled(): register_read(filename, self.mesh)
+        """Mesh of the file content"""
+        self.points = self.mesh.points
+        """(N, 3) numpy view of grid points"""
+        self.point_data = dict(self.mesh.point_data)
+        """Numpy views of point data arrays of the file by name"""
+        self.cells = (self.mesh.connectivity, self.mesh.offsets) if self.mesh.num_cells > 0 else None
+        """Numpy views of cells as tuple of (connectivity, CSR offsets), None if the file has no cells"""
+        self.input_num_points = self.mesh.num_points
+        """Number of Points"""
+
+    @property
+    def input_grid(self):
+        """VTK Grid, files read by the numpy reader, from mesh stores or from sidecars create it on first access"""
+        if self._input_grid is None: self._input_grid = self.legacy_reader.to_grid() if self.legacy_reader is not None else mesh_to_vtk(self.mesh)
+        return self._input_grid
+
+    @property
+    def input_points(self):
         """Grid Points"""
-        self.input_point_data = self.input_grid.GetPointData()
+        return self.input_grid.GetPoints()
+
+    @property
+    def input_point_data(self):
         """Point Data Arrays"""
-        self.input_num_points = self.input_points.GetNumberOfPoints()
-        """Number of Points"""
+        return self.input_grid.GetPointData()
 
 class VTKOutputFile:
     """
     Represents an output VTK file, writes file on calling write
     """
-    def __init__(self, filename, grid):
+    def __init__(self, filename, grid, file_format=None):
         self.outfile = filename
         """Path to VTK file"""
         self.grid = grid
         """VTK Grid"""
+        self.file_format = file_format if file_format is not None else output_format()
+        """Output format, one of VTK_FORMATS"""
+        if self.file_format not in VTK_FORMATS: raise ValueError(f"Unknown VTK output format {self.file_format}, options are {VTK_FORMATS}")
 
     def write(self):
-        writer = vtkUnstructuredGridWriter()
+        if self.file_format in ("ascii", "binary"):
+            writer = vtkUnstructuredGridWriter()
+            if self.file_format == "ascii": writer.SetFileTypeToASCII()
+            else: writer.SetFileTypeToBinary()
+        else:
+            writer = vtkXMLUnstructuredGridWriter()
+            writer.SetDataModeToAppended()
+            writer.EncodeAppendedDataOff()
+            if self.file_format == "vtu": writer.SetCompressorTypeToZLib()
+            else: writer.SetCompressorTypeToLZ4()
         writer.SetFileName(self.outfile)
         writer.SetInputData(self.grid)
-        writer.SetFileTypeToASCII()
-        writer.Write()
\ No newline at end of file
+        writer.Write()
+        remove_sidecar(self.outfile)
+
+def write_mesh(filename, mesh:Mesh, compact:CompactMode=None, file_format=None):
+    """
+    Writes a mesh to a VTK file or to a mesh store
+    :param filename: path to VTK file or store path <file>::<mesh>[/<variant>]
+    :param mesh: mesh
+    :param compact: optional compact mode
+    :param file_format: VTK output format, see VTKOutputFile
+    :return:
+    """
+    if not is_store_path(filename):
+        VTKOutputFile(filename, mesh_to_vtk(mesh, compact), file_format).write()
+        return
+    if compact is not None:
+        mesh = Mesh(compact.values("points", mesh.points), compact.indices(mesh.connectivity), compact.indices(mesh.offsets), mesh.cell_types,
+                    {name: compact.values(name, values) for name, values in mesh.point_data.items()})
+    write_store_mesh(filename, mesh)
@@ -0,0 +1,17 @@
+import numpy as np
+from envt.tools.dedup import deduplicate_points
+
+def test_deduplicate_points_matches_np_unique():
+    rng = np.random.default_rng(0)
+    # corners of a synthetic lon/lat grid shared between cells, perturbed below the rounding precision
+    lon, lat = np.meshgrid(np.linspace(-180.0, 180.0, 25), np.linspace(-90.0, 90.0, 13))
+    grid = np.column_stack((lon.ravel(), lat.ravel()))
+    points = np.concatenate((grid, grid[rng.permutation(grid.shape[0])], rng.uniform(-180.0, 180.0, (100, 2))))
+    points[grid.shape[0]:] += rng.uniform(-1e-10, 1e-10, (points.shape[0] - grid.shape[0], 2))
+
+    unique_points, first_indices, inverse = deduplicate_points(points, 8)
+    expected_points, expected_indices, expected_inverse = np.unique(np.round(points, 8), axis=0, return_index=True, return_inverse=True)
+    assert unique_points.tobytes() == expected_points.tobytes()
+    assert np.array_equal(first_indices, expected_indices)
+    assert np.array_equal(inverse, expected_inverse.ravel())
+    assert unique_points.shape[0] == grid.shape[0] + 100
@@ -0,0 +1,73 @@
+import sys
+import numpy as np
+import pytest
+import envt.vtk_util.eval_functions as evf
+import envt.vtk_util.vtk_wrapper as vtkw
+from envt.main import main
+from envt.mesh_util.mesh import Mesh
+from envt.tools.evaluate import Evaluator
+
+def run_envt(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["envt"] + [str(arg) for arg in args])
+    main()
+
+@pytest.fixture
+def mesh_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("ENVT_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("ENVT_SIDECAR_CACHE", "0")
+    lon, lat = np.meshgrid(np.linspace(-180.0, 180.0, 7), np.linspace(-80.0, 80.0, 5))
+    path = tmp_path / "mesh.vtk"
+    vtkw.write_mesh(str(path), Mesh(np.column_stack((lon.ravel(), lat.ravel(), np.zeros(lon.size)))))
+    return path
+
+def test_single_function_is_suffixed(tmp_path, monkeypatch, mesh_file):
+    # stage 05 of the benchmark expects <output>_<fun>.vtk independent of the number of functions
+    run_envt(monkeypatch, "vtke", mesh_file, "--output", tmp_path / "out.vtk", "-fs", "vortex")
+    assert (tmp_path / "out_vortex.vtk").exists()
+    assert not (tmp_path / "out.vtk").exists()
+
+def test_several_functions_are_suffixed(tmp_path, monkeypatch, mesh_file):
+    run_envt(monkeypatch, "vtke", mesh_file, "--output", tmp_path / "out.vtk", "-fs", "vortex", "sinusoid")
+    assert (tmp_path / "out_vortex.vtk").exists()
+    assert (tmp_path / "out_sinusoid.vtk").exists()
+    assert not (tmp_path / "out.vtk").exists()
+
+@pytest.mark.parametrize("flag", ["-f", "--function"])
+def test_legacy_function_is_not_suffixed(tmp_path, monkeypatch, mesh_file, flag):
+    run_envt(monkeypatch, "vtke", mesh_file, "--output", tmp_path / "out.vtk", flag, "vortex")
+    assert (tmp_path / "out.vtk").exists()
+    assert not (tmp_path / "out_vortex.vtk").exists()
+    single = vtkw.VTKInputFile(str(tmp_path / "out.vtk")).point_data["eval"]
+    run_envt(monkeypatch, "vtke", mesh_file, "--output", tmp_path / "out.vtk", "-fs", "vortex")
+    assert np.array_equal(single, vtkw.VTKInputFile(str(tmp_path / "out_vortex.vtk")).point_data["eval"])
+
+def cached_evaluation(fun_names):
+    lon, lat = np.meshgrid(np.linspace(-180.0, 180.0, 13), np.linspace(-90.0, 90.0, 7))
+    points = np.column_stack((lon.ravel(), lat.ravel(), np.zeros(lon.size)))
+    return points, Evaluator.evaluate_points(points, fun_names, use_cache=True)
+
+def test_cache_hit_matches_fresh_evaluation(monkeypatch, tmp_path):
+    monkeypatch.setenv("ENVT_CACHE_DIR", str(tmp_path / "cache"))
+    fun_names = list(Evaluator.FUNCTIONS.keys())
+    points, stored = cached_evaluation(fun_names)
+    _, loaded = cached_evaluation(fun_names)
+    fresh = Evaluator.evaluate_points(points, fun_names)
+    for fun_name in fun_names:
+        # hits are memory-mapped from the cache
+        assert isinstance(loaded[fun_name].base, np.memmap)
+        assert np.array_equal(stored[fun_name], fresh[fun_name])
+        assert np.array_equal(loaded[fun_name], fresh[fun_name])
+
+def test_cache_is_invalidated_by_function_source(monkeypatch, tmp_path):
+    monkeypatch.setenv("ENVT_CACHE_DIR", str(tmp_path / "cache"))
+    points, fresh = cached_evaluation(["vortex"])
+    # overwrite the cached entry to tell hits from evaluations
+    entries = list((tmp_path / "cache" / Evaluator.ANALYTIC_CACHE).iterdir())
+    assert len(entries) == 1
+    np.save(entries[0] / "values.npy", np.zeros_like(fresh["vortex"]))
+    assert np.all(cached_evaluation(["vortex"])[1]["vortex"] == 0.0)
+
+    source = tmp_path / "eval_functions.py"
+    with open(evf.__file__, "r") as file: source.write_text(file.read() + "\n# changed\n")
+    monkeypatch.setattr(evf, "__file__", str(source))
+    assert np.array_equal(cached_evaluation(["vortex"])[1]["vortex"], fresh["vortex"])
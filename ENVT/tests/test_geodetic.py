@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+import envt.geo_util.geodetic as geod
+from envt.tools.convert import Converter
+
+def geodetic_points():
+    # poles, antimeridian and nonzero heights from below sea level to low orbit
+    lon = np.array([-180.0, -179.999999, -90.0, -45.5, 0.0, 1e-9, 45.5, 90.0, 179.999999, 180.0])
+    lat = np.array([-90.0, -89.999999, -60.0, -1e-9, 0.0, 30.0, 60.0, 89.999999, 90.0])
+    height = np.array([-11000.0, -100.0, 0.0, 100.0, 8848.0, 1e5, 4e5])
+    lon, lat, height = (values.ravel() for values in np.meshgrid(lon, lat, height))
+    return lon, lat, height
+
+def transform(mode, engine, monkeypatch, *values):
+    monkeypatch.setenv(geod.ENGINE_ENV, engine)
+    return [np.asarray(result, dtype=np.float64) for result in mode.transform(*(v.copy() for v in values))]
+
+def test_geodetic_to_geocentric_matches_pyproj(monkeypatch):
+    lon, lat, height = geodetic_points()
+    mode = Converter.Mode2DTO3D()
+    for numpy_value, pyproj_value in zip(transform(mode, "numpy", monkeypatch, lon, lat, height), transform(mode, "pyproj", monkeypatch, lon, lat, height)):
+        assert np.max(np.abs(numpy_value - pyproj_value)) < 1e-6
+
+@pytest.mark.parametrize("max_height, lat_tol, height_tol", [(1e4, 1e-10, 1e-5), (1e6, 1e-7, 1e-2)], ids=["surface", "altitude"])
+def test_geocentric_to_geodetic_matches_pyproj(monkeypatch, max_height, lat_tol, height_tol):
+    lon, lat, height = geodetic_points()
+    selected = np.abs(height) <= max_height
+    lon, lat, height = lon[selected], lat[selected], height[selected]
+    x, y, z = geod.geodetic_to_geocentric(lon, lat, height)
+    mode = Converter.Mode3DTO2D()
+    numpy_lon, numpy_lat, numpy_height = transform(mode, "numpy", monkeypatch, x, y, z)
+    pyproj_lon, pyproj_lat, pyproj_height = transform(mode, "pyproj", monkeypatch, x, y, z)
+    # PROJ iterates to a fixed accuracy, which degrades with altitude, the closed form does not
+    assert np.max(np.abs(numpy_lat - pyproj_lat)) < lat_tol
+    assert np.max(np.abs(numpy_height - pyproj_height)) < height_tol
+    # longitudes are compared modulo 360 degrees, they are undefined at the poles
+    defined = np.abs(lat) < 90.0
+    lon_diff = np.abs(numpy_lon - pyproj_lon)[defined]
+    assert np.max(np.minimum(lon_diff, 360.0 - lon_diff)) < 1e-9
+    # round trip recovers the geodetic input
+    assert np.max(np.abs(numpy_lat - lat)) < 1e-12
+    assert np.max(np.abs(numpy_height - height)) < 1e-8
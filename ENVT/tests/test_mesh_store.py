@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+import envt.vtk_util.vtk_wrapper as vtkw
+from envt.mesh_util.mesh import Mesh, TRIANGLE, QUAD
+from envt.mesh_util.mesh_store import MeshStore
+
+def synthetic_mesh():
+    lon, lat = np.meshgrid(np.linspace(-180.0, 180.0, 7), np.linspace(-80.0, 80.0, 5))
+    points = np.column_stack((lon.ravel(), lat.ravel(), np.zeros(lon.size)))
+    connectivity = np.array([0, 1, 7, 1, 2, 9, 8], dtype=np.int64)
+    offsets = np.array([0, 3, 7], dtype=np.int64)
+    cell_types = np.array([TRIANGLE, QUAD], dtype=np.uint8)
+    return Mesh(points, connectivity, offsets, cell_types, {"eval": np.cos(np.radians(lat.ravel()))})
+
+def assert_meshes_equal(mesh, expected):
+    for name in ("points", "connectivity", "offsets", "cell_types"):
+        assert getattr(mesh, name).dtype == getattr(expected, name).dtype
+        assert np.array_equal(getattr(mesh, name), getattr(expected, name))
+    assert mesh.point_data.keys() == expected.point_data.keys()
+    for name, values in expected.point_data.items(): assert np.array_equal(mesh.point_data[name], values, equal_nan=True)
+
+@pytest.mark.parametrize("path", ["mesh.vtk", "store.nc::grid"])
+def test_mesh_round_trip(tmp_path, monkeypatch, path):
+    monkeypatch.setenv("ENVT_SIDECAR_CACHE", "0")
+    mesh = synthetic_mesh()
+    vtkw.write_mesh(str(tmp_path / path), mesh, file_format="binary")
+    assert_meshes_equal(vtkw.VTKInputFile(str(tmp_path / path)).mesh, mesh)
+
+def test_store_variants(tmp_path):
+    mesh = synthetic_mesh()
+    variant = Mesh(mesh.points, mesh.connectivity, mesh.offsets, mesh.cell_types, {"eval": mesh.point_data["eval"], "mapped": np.arange(mesh.num_points, dtype=np.float64)})
+    vtkw.write_mesh(f"{tmp_path / 'store.nc'}::grid", mesh)
+    vtkw.write_mesh(f"{tmp_path / 'store.nc'}::grid/mapped", variant)
+    assert_meshes_equal(vtkw.VTKInputFile(f"{tmp_path / 'store.nc'}::grid/mapped").mesh, variant)
+    assert_meshes_equal(vtkw.VTKInputFile(f"{tmp_path / 'store.nc'}::grid").mesh, mesh)
+    with MeshStore(str(tmp_path / "store.nc")) as store:
+        # unchanged point data is only stored with the mesh
+        assert list(store.dataset.groups["grid"].groups["mapped"].variables) == ["data.mapped"]
+    other = Mesh(mesh.points + 1.0, mesh.connectivity, mesh.offsets, mesh.cell_types)
+    with pytest.raises(ValueError): vtkw.write_mesh(f"{tmp_path / 'store.nc'}::grid/other", other)
@@ -0,0 +1,48 @@
+import netCDF4
+import numpy as np
+import pytest
+import envt.nc_util.nc_wrapper as ncw
+from envt.tools.nc2vtk import NC2VTK
+
+def write_grid(grid_ds, mask_ds, name, num_lon, num_lat, rng):
+    lon_bounds, lat_bounds = np.linspace(0.0, 360.0, num_lon + 1), np.linspace(-80.0, 80.0, num_lat + 1)
+    for ds in (grid_ds, mask_ds):
+        ds.createDimension(f"x_{name}", num_lon)
+        ds.createDimension(f"y_{name}", num_lat)
+    grid_ds.createDimension(f"crn_{name}", 4)
+    dims = (f"y_{name}", f"x_{name}")
+    lon, lat = np.meshgrid(0.5 * (lon_bounds[:-1] + lon_bounds[1:]), 0.5 * (lat_bounds[:-1] + lat_bounds[1:]))
+    grid_ds.createVariable(f"{name}.lon", "f8", dims)[:] = lon
+    grid_ds.createVariable(f"{name}.lat", "f8", dims)[:] = lat
+    west, south = np.meshgrid(lon_bounds[:-1], lat_bounds[:-1])
+    east, north = np.meshgrid(lon_bounds[1:], lat_bounds[1:])
+    grid_ds.createVariable(f"{name}.clo", "f8", (f"crn_{name}",) + dims)[:] = np.stack((west, east, east, west))
+    grid_ds.createVariable(f"{name}.cla", "f8", (f"crn_{name}",) + dims)[:] = np.stack((south, south, north, north))
+    mask_ds.createVariable(f"{name}.msk", "i4", dims)[:] = (rng.random((num_lat, num_lon)) < 0.3).astype(np.int32)
+
+@pytest.fixture
+def nc_files(tmp_path, monkeypatch):
+    monkeypatch.setenv("ENVT_CACHE_DIR", str(tmp_path / "cache"))
+    grid_path, mask_path = tmp_path / "grids.nc", tmp_path / "masks.nc"
+    with netCDF4.Dataset(grid_path, "w") as grid_ds, netCDF4.Dataset(mask_path, "w") as mask_ds:
+        write_grid(grid_ds, mask_ds, "bggd", 30, 16, np.random.default_rng(0))
+    return str(grid_path), str(mask_path)
+
+def convert(tmp_path, nc_files, name, use_filter, use_triangulation, memory_budget=None, jobs=1):
+    path = tmp_path / f"{name}.vtk"
+    NC2VTK(*nc_files, False, memory_budget, jobs).nc2vtk(ncw.NCVars.BGGD, str(path), use_filter, True, True, use_triangulation)
+    return path.read_bytes()
+
+@pytest.mark.parametrize("use_filter", [False, True])
+@pytest.mark.parametrize("use_triangulation", [False, True])
+def test_memory_budget_matches_serial(tmp_path, nc_files, use_filter, use_triangulation):
+    serial = convert(tmp_path, nc_files, "serial", use_filter, use_triangulation)
+    # a few cells per chunk and merge window
+    assert convert(tmp_path, nc_files, "budget", use_filter, use_triangulation, memory_budget=4096) == serial
+
+@pytest.mark.parametrize("use_filter", [False, True])
+@pytest.mark.parametrize("use_triangulation", [False, True])
+def test_jobs_match_serial(tmp_path, nc_files, use_filter, use_triangulation):
+    serial = convert(tmp_path, nc_files, "serial", use_filter, use_triangulation)
+    assert convert(tmp_path, nc_files, "jobs", use_filter, use_triangulation, jobs=2) == serial
+    assert convert(tmp_path, nc_files, "jobs_budget", use_filter, use_triangulation, memory_budget=4096, jobs=2) == serial
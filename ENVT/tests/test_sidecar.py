@@ -0,0 +1,29 @@
+import os
+import numpy as np
+import envt.vtk_util.vtk_wrapper as vtkw
+from envt.cache_util.sidecar import sidecar_path
+from envt.mesh_util.mesh import Mesh
+
+def test_sidecar_is_stored_on_second_read(tmp_path, monkeypatch):
+    monkeypatch.setenv("ENVT_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("ENVT_SIDECAR_CACHE", "1")
+    mesh_dir = tmp_path / "meshes"
+    mesh_dir.mkdir()
+    path = str(mesh_dir / "mesh.vtk")
+    lon, lat = np.meshgrid(np.linspace(-180.0, 180.0, 7), np.linspace(-80.0, 80.0, 5))
+    vtkw.write_mesh(path, Mesh(np.column_stack((lon.ravel(), lat.ravel(), np.zeros(lon.size))), point_data={"eval": lat.ravel()}))
+
+    first = vtkw.VTKInputFile(path)
+    # files read once leave nothing next to them
+    assert sorted(p.name for p in mesh_dir.iterdir()) == ["mesh.vtk"]
+    vtkw.VTKInputFile(path)
+    assert os.path.isdir(sidecar_path(path))
+    third = vtkw.VTKInputFile(path)
+    # loaded from the memory-mapped sidecar
+    assert isinstance(third.points.base, np.memmap)
+    assert np.array_equal(third.points, first.points)
+    assert np.array_equal(third.point_data["eval"], first.point_data["eval"])
+
+    # writing the file invalidates the sidecar
+    vtkw.write_mesh(path, first.mesh)
+    assert not os.path.exists(sidecar_path(path))
@@ -0,0 +1,23 @@
+import numpy as np
+import envt.geo_util.geodetic as geod
+from envt.tools.dedup import deduplicate_points
+from envt.tools.triangulation import triangulate_polygons, compute_tri_areas
+
+def global_grid(num_lon=36, num_lat=18):
+    # lon/lat cells including a row of cells at each pole, whose pole corners nearly coincide in 3D
+    step_lon, step_lat = 360.0 / num_lon, 180.0 / num_lat
+    lon, lat = np.meshgrid(np.arange(num_lon) * step_lon, np.arange(num_lat) * step_lat - 90.0)
+    corner_lon = np.stack((lon, lon + step_lon, lon + step_lon, lon)).reshape((4, -1))
+    corner_lat = np.stack((lat, lat, lat + step_lat, lat + step_lat)).reshape((4, -1))
+    unique_points, _, inverse = deduplicate_points(np.stack((corner_lon, corner_lat), axis=-1).reshape((-1, 2)), 8)
+    points = np.column_stack(geod.geodetic_to_geocentric(unique_points[:, 0], unique_points[:, 1], np.zeros(unique_points.shape[0])))
+    return points, inverse.reshape((4, -1))
+
+def test_pole_cells_have_no_degenerate_triangles():
+    points, corner_indices = global_grid()
+    tri_indices, tri_cells = triangulate_polygons(points, corner_indices)
+    areas = compute_tri_areas(points[tri_indices])
+    assert np.all(areas > 1e-6 * np.max(areas))
+    # 2 triangles per regular cell, 1 per pole cell
+    assert tri_indices.shape[0] == 36 * 16 * 2 + 36 * 2
+    assert np.array_equal(np.unique(tri_cells), np.arange(corner_indices.shape[1]))
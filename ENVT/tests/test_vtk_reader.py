@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+import envt.vtk_util.vtk_wrapper as vtkw
+from envt.mesh_util.mesh import Mesh, TRIANGLE, QUAD, POLYGON
+
+def synthetic_mesh():
+    rng = np.random.default_rng(0)
+    lon, lat = np.meshgrid(np.linspace(-180.0, 180.0, 9), np.linspace(-80.0, 80.0, 6))
+    points = np.column_stack((lon.ravel(), lat.ravel(), rng.uniform(-1.0, 1.0, lon.size)))
+    # one triangle, one quad and one pentagon
+    connectivity = np.array([0, 1, 9, 1, 2, 11, 10, 2, 3, 4, 13, 12], dtype=np.int64)
+    offsets = np.array([0, 3, 7, 12], dtype=np.int64)
+    cell_types = np.array([TRIANGLE, QUAD, POLYGON], dtype=np.uint8)
+    values = rng.uniform(-1e6, 1e6, lon.size)
+    values[[3, 7]] = np.nan
+    return Mesh(points, connectivity, offsets, cell_types, {"eval": values, "index": np.arange(lon.size, dtype=np.float64)})
+
+@pytest.mark.parametrize("compact", [None, vtkw.CompactMode(), vtkw.CompactMode(use_float32=True)], ids=["float64", "int32", "float32"])
+@pytest.mark.parametrize("with_cells", [True, False])
+def test_legacy_ascii_reader_matches_vtk_reader(tmp_path, monkeypatch, compact, with_cells):
+    monkeypatch.setenv("ENVT_SIDECAR_CACHE", "0")
+    mesh = synthetic_mesh()
+    if not with_cells: mesh = Mesh(mesh.points, point_data=mesh.point_data)
+    path = str(tmp_path / "mesh.vtk")
+    vtkw.write_mesh(path, mesh, compact, "ascii")
+
+    fast = vtkw.VTKInputFile(path, fast_reader=True)
+    reference = vtkw.VTKInputFile(path, fast_reader=False)
+    assert fast.legacy_reader is not None and reference.legacy_reader is None
+    for name in ("points", "connectivity", "offsets", "cell_types"):
+        fast_array, reference_array = getattr(fast.mesh, name), getattr(reference.mesh, name)
+        assert fast_array.dtype == reference_array.dtype
+        assert np.array_equal(fast_array, reference_array)
+    assert fast.point_data.keys() == reference.point_data.keys()
+    for name, values in reference.point_data.items():
+        assert fast.point_data[name].dtype == values.dtype
+        assert np.array_equal(fast.point_data[name], values, equal_nan=True)
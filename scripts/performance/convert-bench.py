@@ -0,0 +1,65 @@
+import argparse
+import os
+import time
+import warnings
+import numpy as np
+from pyproj import Proj, transform
+import envt.geo_util.geodetic as geod
+from envt.tools.convert import Converter, THREADS_ENV
+
+# compares the WGS84 conversion engines against the former per-call pyproj.transform and checks their deviation.
+# pyproj converts heights of geocentric points iteratively with an accuracy of about 1e-6 m, the closed form is more accurate.
+
+
+def time_call(function, repetitions):
+    timings = []
+    result = None
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), np.column_stack(result)
+
+def legacy_transform(src, dst, d0, d1, d2):
+    # conversion as done before, fresh Proj objects and the deprecated pyproj.transform
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=FutureWarning)
+        return transform(Proj(proj=src, datum="WGS84"), Proj(proj=dst, datum="WGS84"), d0, d1, d2)
+
+def engine_transform(engine, mode, d0, d1, d2):
+    os.environ[geod.ENGINE_ENV] = engine
+    return Converter.convert_chunked(mode, (d0, d1, d2), len(d0)).T
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the WGS84 coordinate conversion engines.")
+    parser.add_argument("-n", "--num-points", type=int, help="Number of points.", default=1000000)
+    parser.add_argument("-r", "--repetitions", type=int, help="Repetitions per engine, the minimum is reported.", default=5)
+    parser.add_argument("--height", type=float, help="Maximum absolute ellipsoidal height of the points in meters.", default=10000.0)
+    parser.add_argument("--tolerance", type=float, help="Maximum deviation from pyproj, degrees for lon/lat, meters otherwise.", default=1e-5)
+    parser.add_argument("-t", "--threads", type=int, help="Number of conversion threads, defaults to the number of CPUs.", default=None)
+    args = parser.parse_args()
+    if args.threads is not None: os.environ[THREADS_ENV] = str(args.threads)
+
+    rng = np.random.default_rng(42)
+    lon = rng.uniform(-180.0, 180.0, args.num_points)
+    lat = np.degrees(np.arcsin(rng.uniform(-1.0, 1.0, args.num_points)))
+    height = rng.uniform(-args.height, args.height, args.num_points)
+    lat[:2] = [90.0, -90.0]
+    xyz = legacy_transform("latlong", "geocent", lon, lat, height)
+
+    failed = False
+    print(f"{'conversion':<12} {'engine':<20} {'time (s)':>9} {'speedup':>8} {'max deviation':>14}")
+    for name, mode, src, dst, inputs in (("2D -> 3D", Converter.Mode2DTO3D(), "latlong", "geocent", (lon, lat, height)),
+                                         ("3D -> 2D", Converter.Mode3DTO2D(), "geocent", "latlong", xyz)):
+        time_legacy, reference = time_call(lambda: legacy_transform(src, dst, *inputs), args.repetitions)
+        print(f"{name:<12} {'pyproj.transform':<20} {time_legacy:9.3f} {1.0:8.2f}")
+        for engine in ("pyproj", "numpy"):
+            time_engine, result = time_call(lambda: engine_transform(engine, mode, *inputs), args.repetitions)
+            deviation = np.abs(result - reference).max()
+            failed |= not deviation <= args.tolerance
+            print(f"{name:<12} {engine:<20} {time_engine:9.3f} {time_legacy / time_engine:8.2f} {deviation:14.3e}")
+    if failed: raise SystemExit(f"Deviation exceeds tolerance {args.tolerance}")
+
+
+if __name__ == '__main__':
+    main()
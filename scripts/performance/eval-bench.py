@@ -0,0 +1,56 @@
+import argparse
+import os
+import time
+import numpy as np
+import envt.vtk_util.eval_functions as ef
+from envt.tools.evaluate import Evaluator
+
+# measures the throughput of the test functions in points/s, evaluated in a single chunk on one thread as before,
+# chunk-wise on the evaluation thread pool and chunk-wise in float32, and checks that the evaluation points are not modified.
+
+
+def time_call(function, repetitions):
+    timings = []
+    result = None
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def evaluate(points, functions, dtype, chunk_size, threads):
+    ef.CHUNK_SIZE = chunk_size
+    os.environ[ef.THREADS_ENV] = str(threads)
+    return ef.evaluate_functions(points, functions, dtype)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the test function evaluation.")
+    parser.add_argument("-n", "--num-points", type=int, help="Number of points.", default=2000000)
+    parser.add_argument("-r", "--repetitions", type=int, help="Repetitions per variant, the minimum is reported.", default=5)
+    parser.add_argument("-t", "--threads", type=int, help="Number of evaluation threads, defaults to the number of CPUs.", default=None)
+    args = parser.parse_args()
+    threads = args.threads if args.threads is not None else os.cpu_count() or 1
+    chunk_size = ef.CHUNK_SIZE
+
+    rng = np.random.default_rng(0)
+    points = np.column_stack((rng.uniform(-180.0, 360.0, args.num_points), rng.uniform(-90.0, 90.0, args.num_points), np.zeros(args.num_points)))
+    original = points.copy()
+    functions = dict(Evaluator.KERNELS)
+    functions[Evaluator.ALL_FUNCTIONS] = None
+
+    print(f"{args.num_points} points, chunks of {chunk_size} points on {threads} threads")
+    print(f"{'function':<12} {'single (Mpts/s)':>16} {'chunked (Mpts/s)':>17} {'float32 (Mpts/s)':>17} {'speedup':>8} {'float32 dev':>12}")
+    for name, function in functions.items():
+        selected = list(Evaluator.KERNELS.values()) if function is None else [function]
+        time_single, single = time_call(lambda: evaluate(points, selected, np.float64, args.num_points, 1), args.repetitions)
+        time_chunked, chunked = time_call(lambda: evaluate(points, selected, np.float64, chunk_size, threads), args.repetitions)
+        time_float32, float32 = time_call(lambda: evaluate(points, selected, np.float32, chunk_size, threads), args.repetitions)
+        if not all(np.array_equal(a, b, equal_nan=True) for a, b in zip(single, chunked)): raise RuntimeError(f"Chunked evaluation of {name} differs")
+        deviation = max(np.nanmax(np.abs(a - b)) for a, b in zip(chunked, float32))
+        throughput = [args.num_points / t / 1e6 for t in (time_single, time_chunked, time_float32)]
+        print(f"{name:<12} {throughput[0]:16.2f} {throughput[1]:17.2f} {throughput[2]:17.2f} {time_single / time_chunked:8.2f} {deviation:12.2e}")
+    if not np.array_equal(points, original): raise RuntimeError("Evaluation points were modified")
+
+
+if __name__ == '__main__':
+    main()
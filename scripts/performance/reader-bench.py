@@ -0,0 +1,69 @@
+import argparse
+import glob
+import os
+import time
+import numpy as np
+import vtkmodules.util.numpy_support as vtk_np
+import envt.vtk_util.vtk_wrapper as vtkw
+from envt.cache_util.sidecar import SIDECAR_ENV
+
+# compares the numpy reader for legacy ASCII files against vtkUnstructuredGridReader on the stage 05 outputs
+
+
+def time_reader(path, fast_reader, repetitions):
+    timings = []
+    vtk_file = None
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        vtk_file = vtkw.VTKInputFile(path, fast_reader=fast_reader)
+        timings.append(time.perf_counter() - start)
+    return min(timings), vtk_file.input_grid
+
+def check_equal(grid_a, grid_b):
+    if not np.array_equal(vtk_np.vtk_to_numpy(grid_a.GetPoints().GetData()), vtk_np.vtk_to_numpy(grid_b.GetPoints().GetData())): return False
+    if grid_a.GetNumberOfCells() > 0 or grid_b.GetNumberOfCells() > 0:
+        for array_a, array_b in zip(vtkw.vtk_to_numpy_cells(grid_a.GetCells()), vtkw.vtk_to_numpy_cells(grid_b.GetCells())):
+            if not np.array_equal(array_a, array_b): return False
+    data_a, data_b = grid_a.GetPointData(), grid_b.GetPointData()
+    if data_a.GetNumberOfArrays() != data_b.GetNumberOfArrays(): return False
+    for i in range(data_a.GetNumberOfArrays()):
+        array_a, array_b = data_a.GetArray(i), data_b.GetArray(i)
+        if array_a.GetName() != array_b.GetName(): return False
+        if not np.array_equal(vtk_np.vtk_to_numpy(array_a), vtk_np.vtk_to_numpy(array_b), equal_nan=True): return False
+    return True
+
+def gather_files(path):
+    # stage 05 writes <DS5>/cart/<mapping>/<mesh>.vtk
+    if os.path.isfile(path): return [path]
+    return sorted(glob.glob(os.path.join(path, "**", "*.vtk"), recursive=True))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the legacy ASCII VTK readers.")
+    parser.add_argument("path", type=str, help="VTK file or directory, e.g. <bench>/05_mapped_meshes/TH0_001/cart")
+    parser.add_argument("-r", "--repetitions", type=int, help="Repetitions per file, the minimum is reported.", default=3)
+    parser.add_argument("-n", "--max-files", type=int, help="Maximum number of files.", default=None)
+    args = parser.parse_args()
+    # both readers have to parse the files on every repetition
+    os.environ[SIDECAR_ENV] = "0"
+
+    files = [f for f in gather_files(args.path) if vtkw.is_legacy_ascii_file(f)][:args.max_files]
+    if len(files) == 0:
+        print(f"No legacy ASCII VTK files found in {args.path}")
+        return
+
+    total_vtk, total_fast, total_size = 0.0, 0.0, 0
+    print(f"{'file':<60} {'MB':>8} {'vtk (s)':>9} {'numpy (s)':>9} {'speedup':>8} equal")
+    for path in files:
+        time_vtk, grid_vtk = time_reader(path, False, args.repetitions)
+        time_fast, grid_fast = time_reader(path, True, args.repetitions)
+        size = os.path.getsize(path)
+        total_vtk += time_vtk
+        total_fast += time_fast
+        total_size += size
+        print(f"{os.path.relpath(path, args.path)[-60:]:<60} {size / 2**20:8.1f} {time_vtk:9.3f} {time_fast:9.3f} "
+              f"{time_vtk / time_fast:8.2f} {check_equal(grid_vtk, grid_fast)}")
+    print(f"{'total':<60} {total_size / 2**20:8.1f} {total_vtk:9.3f} {total_fast:9.3f} {total_vtk / total_fast:8.2f}")
+
+
+if __name__ == '__main__':
+    main()
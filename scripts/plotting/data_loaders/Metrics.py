@@ -1,3 +1,4 @@
+import os
 import scripts.plotting.util.io as io
 
 class Metrics:
@@ -29,6 +30,19 @@ class Metrics:
             part_dst = mesh_dst
         return part_src + "_to_" + part_dst
 
+    @staticmethod
+    def load_table(path):
+        # table of envt vtkm, rows are keyed by mapping directory and file name of the mapped mesh
+        rows = io.read_csv_rows(path)
+        if rows is None: return dict()
+        table = dict()
+        for row in rows:
+            mapped = row["mapped"]
+            mapping = os.path.basename(os.path.dirname(mapped))
+            name = os.path.splitext(os.path.basename(mapped))[0]
+            table[(mapping, name)] = {key: float(row[key]) for key in Metrics.blank_data}
+        return table
+
     @staticmethod
     def create_structure(
             resolutions=default_resolutions,
@@ -71,14 +85,16 @@ class Metrics:
         meshes = Metrics.default_meshes if override_meshes is None else override_meshes
 
         def load_mesh_pairs(data_dir, resolution, mapping):
+            # metrics are either in the table of all mappings or, for results of envt vtke --diff, in one file per pair
+            table = Metrics.load_table(os.path.dirname(data_dir) + "/metrics.csv")
             for m1 in meshes:
                 for m2 in meshes:
                     if m1 == m2: continue
 
                     for fun_name in functions:
-                        filename = Metrics.combine(m1, m2) + "_" + fun_name + ".txt"
-                        path = data_dir + "/" + filename
-                        data = io.read_json(path)
+                        name = Metrics.combine(m1, m2) + "_" + fun_name
+                        data = table.get((mapping, name))
+                        if data is None: data = io.read_json(data_dir + "/" + name + ".txt")
                         if data is None: data = Metrics.blank_data
                         buffer[resolution][mapping][fun_name][m1 + "-" + m2] = data
 
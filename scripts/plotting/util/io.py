@@ -1,4 +1,5 @@
 import numpy as np
+import csv
 import json
 import os
 
@@ -13,6 +14,13 @@ def read_json(path):
     except Exception:
         return None
 
+def read_csv_rows(path):
+    try:
+        with open(path, 'r', newline='') as file:
+            return list(csv.DictReader(file))
+    except Exception:
+        return None
+
 def makedirs(path):
     try:
         if not os.path.exists(path): os.makedirs(path)
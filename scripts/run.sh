@@ -12,4 +12,6 @@ echo "[Main Script] Starting Mesh mapping"
 (cd ./sub_scripts && bash ./05_map_meshes.sh)
 echo "[Main Script] Starting Metric computation"
 (cd ./sub_scripts && bash ./06_compute_metrics.sh)
+echo "[Main Script] Removing sidecar caches"
+(cd ./sub_scripts && source ../vars.sh && envt clean "$OUT")
 echo "[Main Script] Done"
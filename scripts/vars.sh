@@ -36,4 +36,9 @@ MPI_ARGS_B="" # set this up for your local environment
 THRESHOLD=0.001
 BAD_TORC=0
 
+# VTK format of files only read by envt: ascii, binary, vtu (zlib) or vtu-lz4
+export ENVT_VTK_FORMAT="ascii"
+# VTK format of files read by precice-aste-run
+ASTE_FORMAT="ascii"
+
 cd $OPWD